@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark da leitura dos informes: csv (cold) vs. cache colunar (warm).
+
+Uso:
+    python benchmarks/bench_cache_informe.py [-meses 12] [-fundos 5000]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+DIR_PATH = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.dirname(DIR_PATH))
+from dados_sinteticos import gera_informes
+from fundosbr import fundosbr
+from fundosbr.fundosbrlib import COLUMNAR_FORMAT
+
+
+def carrega(filenames, *, cache, columns=None):
+    """Carrega os informes e retorna o tempo gasto em segundos."""
+    informe = fundosbr.Informe(cache=cache)
+    informe.filenames = set(filenames)
+    inicio = time.perf_counter()
+    informe.cria_df_informe(columns=list(columns) if columns else None)
+    return time.perf_counter() - inicio, informe.pd_df.shape[0]
+
+
+def main():
+    """Executa o benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-meses", type=int, default=12)
+    parser.add_argument("-fundos", type=int, default=5000)
+    args = parser.parse_args()
+
+    fundosbr.log = logging
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        fundosbr.CSV_FILES_DIR = tmp_dir
+        filenames = gera_informes(tmp_dir, args.meses, args.fundos)
+        tamanho = sum(os.path.getsize(f) for f in filenames) / 1024**2
+        print(
+            "{} meses, {} fundos, {:.1f} MB de csv, formato do cache: {}".format(
+                args.meses, args.fundos, tamanho, COLUMNAR_FORMAT
+            )
+        )
+
+        tempo_csv, linhas = carrega(filenames, cache=False)
+        print("csv (cold):              {:.3f}s ({} linhas)".format(tempo_csv, linhas))
+        tempo_conv, _ = carrega(filenames, cache=True)
+        print("csv + criacao do cache:  {:.3f}s".format(tempo_conv))
+        tempo_cache, _ = carrega(filenames, cache=True)
+        print("cache colunar (warm):    {:.3f}s".format(tempo_cache))
+        tempo_proj, _ = carrega(filenames, cache=True, columns=["VL_QUOTA"])
+        print("cache colunar, VL_QUOTA: {:.3f}s".format(tempo_proj))
+        print("speedup warm vs. cold:   {:.1f}x".format(tempo_csv / tempo_cache))
+
+
+if __name__ == "__main__":
+    main()
+
+# vim: ts=4
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark da concatenacao dos informes mensais: concat por mes vs. concat unico.
+
+Uso:
+    python benchmarks/bench_concat_informe.py [-fundos 200] [-meses 12 60 180]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+DIR_PATH = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.dirname(DIR_PATH))
+from dados_sinteticos import gera_informes
+from fundosbr import fundosbr
+
+import pandas as pd
+
+
+def concat_por_mes(informes):
+    """Implementacao antiga: concatena o DataFrame a cada mes (O(n^2))."""
+    pd_df = pd.DataFrame()
+    for informe_mensal in informes:
+        pd_df = pd.concat([pd_df, informe_mensal])
+    return pd_df
+
+
+def concat_unico(informes):
+    """Implementacao atual: concatena todos os meses uma unica vez."""
+    return pd.concat(informes)
+
+
+def mede(func, informes):
+    """Retorna tempo (s) e pico de memoria alocada (MB) da execucao."""
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    func(informes)
+    tempo = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return tempo, pico / 1024**2
+
+
+def main():
+    """Executa o benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-fundos", type=int, default=200)
+    parser.add_argument("-meses", type=int, nargs="+", default=[12, 60, 180])
+    args = parser.parse_args()
+
+    fundosbr.log = logging
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        fundosbr.CSV_FILES_DIR = tmp_dir
+        filenames = gera_informes(tmp_dir, max(args.meses), args.fundos)
+        informe = fundosbr.Informe()
+        informes = [informe.le_informe_mensal(f) for f in filenames]
+
+        print(
+            "{:>6} {:>10} {:>14} {:>14} {:>14} {:>14}".format(
+                "meses",
+                "linhas",
+                "por mes (s)",
+                "unico (s)",
+                "por mes (MB)",
+                "unico (MB)",
+            )
+        )
+        for meses in sorted(args.meses):
+            tempo_mes, mem_mes = mede(concat_por_mes, informes[:meses])
+            tempo_unico, mem_unico = mede(concat_unico, informes[:meses])
+            print(
+                "{:>6} {:>10} {:>14.3f} {:>14.3f} {:>14.1f} {:>14.1f}".format(
+                    meses,
+                    sum(len(i) for i in informes[:meses]),
+                    tempo_mes,
+                    tempo_unico,
+                    mem_mes,
+                    mem_unico,
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
+
+# vim: ts=4
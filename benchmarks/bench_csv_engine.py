@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Throughput (MB/s) da leitura dos arquivos csv por engine (pandas e pyarrow).
+
+Uso:
+    python benchmarks/bench_csv_engine.py [-fundos 20000] [-repeticoes 3]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+DIR_PATH = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.dirname(DIR_PATH))
+from dados_sinteticos import gera_cadastral
+from dados_sinteticos import gera_informes
+from fundosbr import fundosbr
+from fundosbr.fundosbrlib import csv_engine
+
+
+def le_cadastral(cad_file):
+    """Le o csv cadastral."""
+    cadastral = fundosbr.Cadastral()
+    cadastral.filename = cad_file
+    cadastral.cria_df_cadastral()
+
+
+def throughput(funcao, arquivo, repeticoes):
+    """Retorna o throughput em MB/s da melhor de varias leituras."""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao(arquivo)
+        tempos.append(time.perf_counter() - inicio)
+    return os.path.getsize(arquivo) / 1024**2 / min(tempos)
+
+
+def main():
+    """Executa o benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-fundos", type=int, default=20000)
+    parser.add_argument("-repeticoes", type=int, default=3)
+    args = parser.parse_args()
+
+    engines = sorted({"pandas", csv_engine("pyarrow")})
+    fundosbr.log = logging
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        fundosbr.CSV_FILES_DIR = tmp_dir
+        cad_file = gera_cadastral(tmp_dir, args.fundos)
+        (informe_file,) = gera_informes(tmp_dir, 1, args.fundos)
+        arquivos = [
+            ("cadastral", le_cadastral, cad_file),
+            ("informe", fundosbr.Informe.le_csv_informe, informe_file),
+        ]
+        print(
+            "{:<10} {:>8} ".format("arquivo", "MB")
+            + " ".join("{:>10}".format(engine) for engine in engines)
+        )
+        for nome, funcao, arquivo in arquivos:
+            resultado = []
+            for engine in engines:
+                fundosbr.CSV_ENGINE = engine
+                resultado.append(throughput(funcao, arquivo, args.repeticoes))
+            print(
+                "{:<10} {:>8.1f} ".format(nome, os.path.getsize(arquivo) / 1024**2)
+                + " ".join("{:>10.1f}".format(mbs) for mbs in resultado)
+            )
+        print("(MB/s, melhor de {} leituras)".format(args.repeticoes))
+
+
+if __name__ == "__main__":
+    main()
+
+# vim: ts=4
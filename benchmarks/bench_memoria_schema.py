@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+Relatorio de memoria (bytes por linha) dos DataFrames com e sem schema.
+
+"Sem schema" eh a leitura com tipos inferidos pelo pandas (objetos python
+para texto). "Com schema" usa csv_dtypes e csv_datas de Cadastral e Informe.
+
+Uso:
+    python benchmarks/bench_memoria_schema.py [-fundos 20000]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+
+DIR_PATH = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.dirname(DIR_PATH))
+from dados_sinteticos import gera_cadastral
+from dados_sinteticos import gera_informes
+from fundosbr import fundosbr
+from fundosbr.fundosbrlib import bytes_per_row
+
+import pandas as pd
+
+
+def relatorio(nome, sem_schema, com_schema):
+    """Mostra bytes por linha antes e depois do schema."""
+    antes = bytes_per_row(sem_schema)
+    depois = bytes_per_row(com_schema)
+    print(
+        "{:<10} {:>10} {:>14.1f} {:>14.1f} {:>9.1f}x".format(
+            nome, len(com_schema), antes, depois, antes / depois
+        )
+    )
+
+
+def main():
+    """Executa o benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-fundos", type=int, default=20000)
+    args = parser.parse_args()
+
+    fundosbr.log = logging
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        fundosbr.CSV_FILES_DIR = tmp_dir
+        print(
+            "{:<10} {:>10} {:>14} {:>14} {:>10}".format(
+                "arquivo", "linhas", "sem schema", "com schema", "reducao"
+            )
+        )
+
+        cad_file = gera_cadastral(tmp_dir, args.fundos)
+        sem_schema = pd.read_csv(
+            cad_file, sep=";", encoding="ISO-8859-1", index_col="CNPJ_FUNDO"
+        )
+        cadastral = fundosbr.Cadastral()
+        cadastral.filename = cad_file
+        cadastral.cria_df_cadastral()
+        relatorio("cadastral", sem_schema, cadastral.pd_df)
+
+        (informe_file,) = gera_informes(tmp_dir, 1, args.fundos // 4)
+        sem_schema = pd.read_csv(informe_file, sep=";", encoding="ISO-8859-1")
+        com_schema = fundosbr.Informe.le_csv_informe(informe_file)
+        relatorio("informe", sem_schema, com_schema)
+
+
+if __name__ == "__main__":
+    main()
+
+# vim: ts=4
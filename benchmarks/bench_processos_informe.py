@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark da leitura dos informes em processos (opcao --workers).
+
+Simula a carga do comando rank em 10 anos: le a cota de metade dos fundos
+de todos os meses, a partir dos arquivos csv (sem cache colunar).
+
+Uso:
+    python benchmarks/bench_processos_informe.py [-meses 120] [-fundos 2000]
+                                                 [-workers 1 2 4 8]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+DIR_PATH = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.dirname(DIR_PATH))
+from dados_sinteticos import cnpjs_sinteticos
+from dados_sinteticos import gera_informes
+from fundosbr import fundosbr
+
+
+def carrega(filenames, cnpjs, workers):
+    """Carrega os informes e retorna o tempo gasto em segundos."""
+    informe = fundosbr.Informe(cache=False, workers=workers)
+    informe.filenames = set(filenames)
+    inicio = time.perf_counter()
+    informe.cria_df_informe(cnpj=",".join(cnpjs), columns=["VL_QUOTA"])
+    return time.perf_counter() - inicio
+
+
+def main():
+    """Executa o benchmark."""
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-meses", type=int, default=120)
+    parser.add_argument("-fundos", type=int, default=2000)
+    parser.add_argument(
+        "-workers",
+        type=int,
+        nargs="+",
+        default=sorted({1, 2, 4, 8, 16, 32, cpus} & set(range(1, cpus + 1))),
+    )
+    args = parser.parse_args()
+
+    fundosbr.log = logging
+    fundosbr.msg = lambda *args, **kwargs: None
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        fundosbr.CSV_FILES_DIR = tmp_dir
+        filenames = gera_informes(tmp_dir, args.meses, args.fundos)
+        cnpjs = cnpjs_sinteticos(args.fundos)[::2]
+        tamanho = sum(os.path.getsize(f) for f in filenames) / 1024**2
+        print(
+            "{} meses, {} fundos, {:.1f} MB de csv, {} cpus".format(
+                args.meses, args.fundos, tamanho, cpus
+            )
+        )
+
+        tempo_serial = None
+        for workers in args.workers:
+            tempo = carrega(filenames, cnpjs, workers)
+            tempo_serial = tempo_serial or tempo
+            print(
+                "workers {:>3}: {:7.2f}s  speedup {:5.2f}x".format(
+                    workers, tempo, tempo_serial / tempo
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
+
+# vim: ts=4
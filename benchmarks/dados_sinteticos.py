@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""Gera arquivos csv de informe sinteticos para os benchmarks."""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+INFORME_COLUMNS = [
+    "CNPJ_FUNDO",
+    "DT_COMPTC",
+    "VL_TOTAL",
+    "VL_QUOTA",
+    "VL_PATRIM_LIQ",
+    "CAPTC_DIA",
+    "RESG_DIA",
+    "NR_COTST",
+]
+
+
+def cnpjs_sinteticos(fundos):
+    """Retorna lista com cnpjs (formatados) de "fundos" fundos."""
+    return [
+        "{:02d}.{:03d}.{:03d}/0001-{:02d}".format(
+            num // 1000000 % 100, num // 1000 % 1000, num % 1000, num % 97
+        )
+        for num in range(1, fundos + 1)
+    ]
+
+
+def gera_informes(diretorio, meses, fundos, *, data_inicio="2010-01", seed=0):
+    """
+    Gera arquivos csv de informe no formato da CVM.
+
+    Parametros:
+        diretorio    (str): Diretorio para criar os arquivos
+        meses        (int): Numero de meses (um arquivo por mes)
+        fundos       (int): Numero de fundos em cada arquivo
+
+    Return: Lista com os arquivos criados (ordenada por mes)
+    """
+    rng = np.random.default_rng(seed)
+    cnpjs = np.array(cnpjs_sinteticos(fundos))
+    cota = rng.uniform(1, 100, fundos)
+    arquivos = []
+    for periodo in pd.period_range(data_inicio, periods=meses, freq="M"):
+        dias = pd.bdate_range(periodo.start_time, periodo.end_time)
+        linhas = len(dias) * fundos
+        retorno = rng.normal(0.0003, 0.01, (len(dias), fundos))
+        cotas = cota * np.cumprod(1 + retorno, axis=0)
+        cota = cotas[-1]
+        pl = cotas.ravel() * rng.uniform(1e5, 1e7)
+        informe = pd.DataFrame(
+            {
+                "CNPJ_FUNDO": np.tile(cnpjs, len(dias)),
+                "DT_COMPTC": np.repeat(dias.strftime("%Y-%m-%d"), fundos),
+                "VL_TOTAL": np.round(pl * 1.01, 2),
+                "VL_QUOTA": np.round(cotas.ravel(), 12),
+                "VL_PATRIM_LIQ": np.round(pl, 2),
+                "CAPTC_DIA": np.round(rng.exponential(1e4, linhas), 2),
+                "RESG_DIA": np.round(rng.exponential(1e4, linhas), 2),
+                "NR_COTST": rng.integers(1, 100000, linhas),
+            },
+            columns=INFORME_COLUMNS,
+        )
+        arquivo = os.path.join(
+            diretorio, "inf_diario_fi_{}.csv".format(periodo.strftime("%Y%m"))
+        )
+        informe.to_csv(arquivo, sep=";", index=False, encoding="ISO-8859-1")
+        arquivos.append(arquivo)
+    return arquivos
+
+
+def gera_cadastral(diretorio, fundos, *, seed=0):
+    """
+    Gera arquivo cad_fi.csv no formato da CVM.
+
+    Parametros:
+        diretorio    (str): Diretorio para criar o arquivo
+        fundos       (int): Numero de fundos
+
+    Return: Nome do arquivo criado
+    """
+    rng = np.random.default_rng(seed)
+
+    def escolhe(valores):
+        return rng.choice(valores, fundos)
+
+    def datas():
+        dias = rng.integers(0, 365 * 20, fundos)
+        return (pd.Timestamp("2000-01-01") + pd.to_timedelta(dias, "D")).strftime(
+            "%Y-%m-%d"
+        )
+
+    gestores = ["GESTORA {} LTDA".format(num) for num in range(800)]
+    admins = ["ADMINISTRADORA {} S.A.".format(num) for num in range(150)]
+    cnpjs_admin = ["{:02d}.000.000/0001-00".format(num % 100) for num in range(150)]
+    cadastral = pd.DataFrame(
+        {
+            "CNPJ_FUNDO": cnpjs_sinteticos(fundos),
+            "DENOM_SOCIAL": [
+                "FUNDO {} DE INVESTIMENTO {}".format(num, num % 7)
+                for num in range(fundos)
+            ],
+            "DT_REG": datas(),
+            "DT_CONST": datas(),
+            "DT_CANCEL": datas(),
+            "SIT": escolhe(["EM FUNCIONAMENTO NORMAL", "CANCELADA", "LIQUIDACAO"]),
+            "DT_INI_SIT": datas(),
+            "DT_INI_ATIV": datas(),
+            "DT_INI_EXERC": datas(),
+            "DT_FIM_EXERC": datas(),
+            "CLASSE": escolhe(
+                [
+                    "Fundo de Ações",
+                    "Fundo Multimercado",
+                    "Fundo Cambial",
+                    "Fundo de Renda Fixa",
+                ]
+            ),
+            "DT_INI_CLASSE": datas(),
+            "RENTAB_FUNDO": escolhe(["DI de um dia", "IBOVESPA", "IPCA", "Outros"]),
+            "CONDOM": escolhe(["Aberto", "Fechado"]),
+            "FUNDO_COTAS": escolhe(["S", "N"]),
+            "FUNDO_EXCLUSIVO": escolhe(["S", "N"]),
+            "TRIB_LPRAZO": escolhe(["S", "N", "N/A"]),
+            "INVEST_QUALIF": escolhe(["S", "N"]),
+            "TAXA_PERFM": escolhe([0.0, 10.0, 20.0]),
+            "INF_TAXA_PERFM": escolhe(["", "20% do que exceder o CDI"]),
+            "TAXA_ADM": np.round(rng.uniform(0, 3, fundos), 2),
+            "INF_TAXA_ADM": escolhe(["", "Taxa maxima de 2%"]),
+            "VL_PATRIM_LIQ": np.round(rng.uniform(1e5, 1e10, fundos), 2),
+            "DT_PATRIM_LIQ": datas(),
+            "DIRETOR": escolhe(["DIRETOR {}".format(num) for num in range(500)]),
+            "CNPJ_ADMIN": escolhe(cnpjs_admin),
+            "ADMIN": escolhe(admins),
+            "PF_PJ_GESTOR": escolhe(["PF", "PJ"]),
+            "CPF_CNPJ_GESTOR": escolhe(
+                ["{:02d}.111.111/0001-11".format(num % 100) for num in range(800)]
+            ),
+            "GESTOR": escolhe(gestores),
+            "CNPJ_AUDITOR": escolhe(cnpjs_admin[:30]),
+            "AUDITOR": escolhe(["AUDITOR {}".format(num) for num in range(30)]),
+            "CNPJ_CUSTODIANTE": escolhe(cnpjs_admin[:40]),
+            "CUSTODIANTE": escolhe(admins[:40]),
+            "CNPJ_CONTROLADOR": escolhe(cnpjs_admin[:40]),
+            "CONTROLADOR": escolhe(admins[:40]),
+        }
+    )
+    arquivo = os.path.join(diretorio, "cad_fi.csv")
+    cadastral.to_csv(arquivo, sep=";", index=False, encoding="ISO-8859-1")
+    return arquivo
+
+
+# vim: ts=4
@@ -7,31 +7,157 @@ Todos os dados usados sao baixados direto do site da CVM.
 """
 
 import argparse
+import collections
+import concurrent.futures
 import datetime
+import glob
+import json
 import logging
 import os
+import re
 import sys
+import threading
+import unicodedata
+import urllib.parse
+import warnings
+import zlib
 
 
 DIR_PATH = os.path.dirname(os.path.realpath(__file__))
 sys.path.append(DIR_PATH)
+from fundosbrlib import COLUMNAR_FORMAT
+from fundosbrlib import DownloadScheduler
+from fundosbrlib import FileLock
+from fundosbrlib import CSV_ENGINES
+from fundosbrlib import archive_member
+from fundosbrlib import archive_members
+from fundosbrlib import cache_lock
 from fundosbrlib import create_dir
-from fundosbrlib import download_file
+from fundosbrlib import csv_engine
+from fundosbrlib import columnar_file_name
+from fundosbrlib import compress_file
+from fundosbrlib import download_failures
+from fundosbrlib import file_meta_name
+from fundosbrlib import file_checksum
+from fundosbrlib import lock_file_name
+from fundosbrlib import read_config
+from fundosbrlib import is_file_immutable
+from fundosbrlib import lazy_import
+from fundosbrlib import mark_file_immutable
+from fundosbrlib import read_columnar
+from fundosbrlib import read_csv
+from fundosbrlib import read_csv_chunks
+from fundosbrlib import read_file_meta
+from fundosbrlib import read_json
+from fundosbrlib import read_pickle
 from fundosbrlib import msg
 from fundosbrlib import setup_logging
-
-import pandas as pd
+from fundosbrlib import split_archive_member
+from fundosbrlib import touch_access
+from fundosbrlib import write_columnar
+from fundosbrlib import write_columnar_chunks
+from fundosbrlib import write_json
+from fundosbrlib import write_pickle
+
+# Importados apenas no primeiro uso. Ajuda (-h), validacao dos parametros e
+# comandos que nao usam esses modulos nao pagam o tempo de import
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
 
 URL_CADASTRAL_DIARIO = "http://dados.cvm.gov.br/dados/FI/CAD/DADOS"
 URL_INFORME_DIARIO = "http://dados.cvm.gov.br/dados/FI/DOC/INF_DIARIO/DADOS"
 
-# Diretorio para guardar os arquivos csv
-CSV_FILES_DIR = "/tmp/fundosbr_dados"
+# Arquivo de configuracao opcional (formato ini). As opcoes da secao
+# [fundosbr] podem ser substituidas pelas variaveis de ambiente
+# FUNDOSBR_<OPCAO> e pelas opcoes da linha de comando. Exemplo:
+#   [fundosbr]
+#   dados = /var/cache/fundosbr
+#   workers = 4
+CONFIG_FILE = os.environ.get("FUNDOSBR_CONFIG") or os.path.join(
+    os.environ.get("XDG_CONFIG_HOME") or os.path.expanduser("~/.config"),
+    "fundosbr",
+    "fundosbr.ini",
+)
+CONFIG = read_config(
+    CONFIG_FILE,
+    "fundosbr",
+    {
+        "dados": "/tmp/fundosbr_dados",
+        "csv_engine": "auto",
+        "workers": 1,
+        "limite_download": 0,
+        "limite_cache": 0,
+    },
+    env_prefix="FUNDOSBR_",
+)
+
+# Diretorio para guardar os arquivos csv. Pode ser compartilhado por varios
+# processos: downloads e caches sao criados com lock (ver FileLock).
+# Opcao --dados
+CSV_FILES_DIR = os.path.expanduser(CONFIG["dados"])
+
+# Numero maximo de downloads simultaneos (em todas as threads)
+DOWNLOAD_WORKERS = 4
+
+# Downloads: novas tentativas em falhas temporarias, espera inicial entre as
+# tentativas (dobra a cada tentativa), timeouts de conexao e leitura
+# (segundos) e limite de KB/s de todos os downloads (0 sem limite). Opcao
+# --limite-download
+DOWNLOAD_TENTATIVAS = 4
+DOWNLOAD_ESPERA = 2.0
+DOWNLOAD_TIMEOUT = (10, 120)
+DOWNLOAD_LIMITE = CONFIG["limite_download"]
+# Agendador dos downloads, criado no primeiro uso (ver agendador_downloads)
+AGENDADOR = None
+
+# Tamanho maximo (MB) do diretorio de dados (0 sem limite). Os itens usados
+# ha mais tempo sao compactados e removidos (ver CacheDados). Opcao -limite
+# do comando cache
+CACHE_LIMITE = CONFIG["limite_cache"]
+
+# Numero de linhas lidas por vez na leitura de um csv filtrando cnpjs
+CSV_CHUNKSIZE = 100000
+
+# Engine para ler os arquivos csv (auto, pandas ou pyarrow). "auto" usa o
+# leitor multithread do pyarrow, se instalado. Opcao --csv-engine
+CSV_ENGINE = CONFIG["csv_engine"]
+
+# Numero de processos para ler os arquivos de informe. Com 1, os meses sao
+# lidos em sequencia no processo principal. Opcao --workers
+INFORME_WORKERS = CONFIG["workers"]
+
+# Comando serve: meses de informe mantidos em memoria e intervalo (segundos)
+# entre as verificacoes de arquivos novos no site da CVM
+SERVE_MESES = 12
+SERVE_INTERVALO = 3600
+
+# Metricas de risco: dias uteis usados para anualizar e taxa diaria (fracao)
+# do benchmark usada no Sharpe e Sortino. Opcao -taxa dos comandos rank e
+# compara
+DIAS_UTEIS_ANO = 252
+TAXA_DIARIA_BENCHMARK = 0.0
 
 
 ##############################################################################
 # Parse da linha de comando
 ##############################################################################
+def adiciona_opcoes_risco(subparser):
+    """Adiciona as opcoes das metricas de risco no subcomando."""
+    subparser.add_argument(
+        "-taxa",
+        type=float,
+        dest="taxa",
+        default=TAXA_DIARIA_BENCHMARK * 100,
+        help="Taxa diaria do benchmark em %% para Sharpe e Sortino"
+        " (ex: 0.04 para CDI de ~10.6%% ao ano) (default: %(default)s)",
+    )
+    subparser.add_argument(
+        "-referencia",
+        dest="referencia",
+        help="CNPJ do fundo de referencia para o beta",
+    )
+
+
 def parse_parameters():
     """Command line parser."""
     epilog = """
@@ -51,6 +177,36 @@ def parse_parameters():
     parser.add_argument(
         "-d", "--debug", action="store_true", dest="debug", help="debug flag"
     )
+    parser.add_argument(
+        "--dados",
+        dest="dados",
+        default=CSV_FILES_DIR,
+        metavar="DIR",
+        help="Diretorio dos arquivos baixados e caches (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--csv-engine",
+        dest="csv_engine",
+        choices=CSV_ENGINES,
+        default=CSV_ENGINE,
+        help="Engine para ler os arquivos csv (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        dest="workers",
+        default=INFORME_WORKERS,
+        help="Processos para ler os arquivos de informe (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--limite-download",
+        type=int,
+        dest="limite_download",
+        default=DOWNLOAD_LIMITE,
+        metavar="KBPS",
+        help="Limite de KB/s de todos os downloads (default: %(default)s, sem limite)",
+    )
     # Adiciona opcoes dos subcomandos
     subparsers = parser.add_subparsers(title="Comandos", dest="command")
 
@@ -84,7 +240,14 @@ def parse_parameters():
         action="store_true",
         help="Mostra estatistica mensal",
     )
-    informe_parser.add_argument("cnpj", help="CNPJ do fundo")
+    informe_parser.add_argument(
+        "-arquivo",
+        dest="arquivo",
+        help="Arquivo com os CNPJs dos fundos (um por linha)",
+    )
+    informe_parser.add_argument(
+        "cnpj", nargs="*", help="CNPJ do(s) fundo(s). Separados por espaco ou ','"
+    )
     informe_parser.set_defaults(func=cmd_informes_fundo)
 
     # Compara fundos
@@ -102,6 +265,7 @@ def parse_parameters():
         action="store_true",
         help="Mostra estatistica mensal",
     )
+    adiciona_opcoes_risco(compara_parser)
     compara_parser.add_argument("cnpj", help="CNPJ do fundo")
     compara_parser.set_defaults(func=cmd_compara_fundo)
 
@@ -109,8 +273,8 @@ def parse_parameters():
     rank_parser = subparsers.add_parser("rank", help="Rank fundos")
     rank_parser.add_argument(
         "tipo",
-        choices=["acoes", "multimercado", "cambial", "rendafixa"],
-        help="Tipo do fundo",
+        choices=["acoes", "multimercado", "cambial", "rendafixa", "todos"],
+        help="Tipo do fundo (todos: rank de cada tipo)",
     )
     rank_parser.add_argument(
         "-top", type=int, default=10, dest="top", help="Numero de fundos para retornar"
@@ -143,8 +307,97 @@ def parse_parameters():
         action="store_true",
         help="Rank por rentabilidade da cota",
     )
+    rank_type_group.add_argument(
+        "-a",
+        "--all",
+        dest="todas",
+        action="store_true",
+        help="Rank por cotistas, patrimonio liquido e rentabilidade",
+    )
+    rank_type_group.add_argument(
+        "-s",
+        "--risco",
+        dest="risco",
+        metavar="METRICA",
+        choices=[
+            "volatilidade",
+            "drawdown",
+            "duracao_drawdown",
+            "sharpe",
+            "sortino",
+            "beta",
+        ],
+        help="Rank por uma metrica de risco: %(choices)s",
+    )
+    adiciona_opcoes_risco(rank_parser)
+    rank_parser.add_argument(
+        "-o", dest="output", help="Grava os ranks no arquivo (formato json)"
+    )
     rank_parser.set_defaults(func=cmd_rank_fundo)
 
+    # Servidor de consultas
+    serve_parser = subparsers.add_parser(
+        "serve", help="Servidor http com api json (busca, informe, compara e rank)"
+    )
+    serve_parser.add_argument(
+        "-host",
+        dest="host",
+        default="127.0.0.1",
+        help="Endereco (default: %(default)s)",
+    )
+    serve_parser.add_argument(
+        "-port",
+        type=int,
+        dest="port",
+        default=8080,
+        help="Porta (default: %(default)s)",
+    )
+    serve_parser.add_argument(
+        "-socket", dest="socket", help="Usa um unix socket no lugar de host e porta"
+    )
+    serve_parser.add_argument(
+        "-meses",
+        type=int,
+        dest="meses",
+        default=SERVE_MESES,
+        help="Meses de informe mantidos em memoria (default: %(default)s)",
+    )
+    serve_parser.add_argument(
+        "-intervalo",
+        type=int,
+        dest="intervalo",
+        default=SERVE_INTERVALO,
+        help="Segundos entre as atualizacoes dos dados (default: %(default)s)",
+    )
+    serve_parser.set_defaults(func=cmd_serve)
+
+    # Cache do diretorio de dados
+    cache_parser = subparsers.add_parser(
+        "cache", help="Uso de disco, limite de tamanho e preparo do cache"
+    )
+    cache_parser.add_argument(
+        "-limite",
+        type=int,
+        dest="limite",
+        default=CACHE_LIMITE,
+        metavar="MB",
+        help="Compacta e remove os meses usados ha mais tempo ate o diretorio "
+        "ficar abaixo do limite (default: %(default)s, sem limite)",
+    )
+    cache_parser.add_argument(
+        "-aquece",
+        dest="aquece",
+        action="store_true",
+        help="Baixa e prepara os informes do periodo (-datainicio e -datafim)",
+    )
+    cache_parser.add_argument(
+        "-datainicio", type=int, dest="datainicio", help="Data inicio (YYYYMM)"
+    )
+    cache_parser.add_argument(
+        "-datafim", type=int, dest="datafim", help="Data fim (YYYYMM)"
+    )
+    cache_parser.set_defaults(func=cmd_cache)
+
     if len(sys.argv) < 2:
         parser.print_help()
         sys.exit(0)
@@ -152,6 +405,170 @@ def parse_parameters():
     return parser.parse_args()
 
 
+def agendador_downloads():
+    """
+    Retorna o agendador usado por todos os downloads do processo.
+
+    O numero de downloads simultaneos (DOWNLOAD_WORKERS) e o limite de KB
+    por segundo (DOWNLOAD_LIMITE) valem para todos os downloads, inclusive
+    os feitos pela thread de atualizacao do serve.
+    """
+    global AGENDADOR
+
+    if AGENDADOR is None:
+        AGENDADOR = DownloadScheduler(
+            max_concurrent=DOWNLOAD_WORKERS,
+            max_bytes_per_sec=DOWNLOAD_LIMITE * 1024 or None,
+            retries=DOWNLOAD_TENTATIVAS,
+            backoff=DOWNLOAD_ESPERA,
+            timeout=DOWNLOAD_TIMEOUT,
+        )
+    return AGENDADOR
+
+
+def diretorio_locks():
+    """Retorna o diretorio dos arquivos de lock dos caches."""
+    return os.path.join(CSV_FILES_DIR, "locks")
+
+
+class IndiceNomes:
+    """
+    Indice para busca textual no nome dos fundos.
+
+    Os nomes sao normalizados (minusculas e sem acentos) e indexados por
+    palavra e por trigramas. A busca por parte do nome so verifica os
+    fundos que contem todos os trigramas da consulta.
+    """
+
+    # Versao do estado persistido. Deve mudar quando a normalizacao ou a
+    # estrutura do indice (palavras e trigramas) mudar
+    versao_schema = 1
+
+    def __init__(self, nomes):
+        """
+        Initialize IndiceNomes class.
+
+        Parametros:
+            nomes   (iter): Nomes dos fundos. A posicao de cada nome eh o
+                            identificador retornado pela busca
+        """
+        self.nomes = [self.normaliza(nome) for nome in nomes]
+        palavras = collections.defaultdict(list)
+        trigramas = collections.defaultdict(list)
+        for pos, nome in enumerate(self.nomes):
+            for palavra in set(nome.split()):
+                palavras[palavra].append(pos)
+            for trigrama in self.trigramas(nome):
+                trigramas[trigrama].append(pos)
+
+        self.palavras = {k: np.array(v, dtype=np.int32) for k, v in palavras.items()}
+        self.indice_trigramas = {
+            k: np.array(v, dtype=np.int32) for k, v in trigramas.items()
+        }
+
+    @classmethod
+    def de_estado(cls, estado):
+        """Cria o indice a partir do estado retornado por "estado"."""
+        indice = cls.__new__(cls)
+        indice.__dict__.update(estado)
+        return indice
+
+    def estado(self):
+        """
+        Retorna o estado do indice para persistir.
+
+        Return: dict com a lista de nomes normalizados e os dicts de palavras
+                e trigramas (arrays numpy com a posicao dos nomes)
+        """
+        return dict(self.__dict__)
+
+    @staticmethod
+    def normaliza(texto):
+        """Retorna texto em minusculas, sem acentos e apenas com letras e numeros."""
+        if not isinstance(texto, str):
+            return ""
+        texto = unicodedata.normalize("NFKD", texto)
+        texto = "".join(c for c in texto if not unicodedata.combining(c)).lower()
+        return " ".join(re.sub(r"[^0-9a-z]+", " ", texto).split())
+
+    @staticmethod
+    def trigramas(texto):
+        """Retorna o conjunto de trigramas do texto."""
+        return {a + b + c for a, b, c in zip(texto, texto[1:], texto[2:])}
+
+    def candidatos(self, palavra):
+        """Retorna array com a posicao dos nomes que podem conter a palavra."""
+        if len(palavra) >= 3:
+            postings = [
+                self.indice_trigramas.get(trigrama, np.array([], dtype=np.int32))
+                for trigrama in self.trigramas(palavra)
+            ]
+            postings.sort(key=len)
+            candidatos = postings[0]
+            for posting in postings[1:]:
+                candidatos = np.intersect1d(candidatos, posting, assume_unique=True)
+            return candidatos
+
+        # Palavras curtas: procura no vocabulario, que eh bem menor que os nomes
+        postings = [pos for k, pos in self.palavras.items() if palavra in k]
+        if not postings:
+            return np.array([], dtype=np.int32)
+        return np.unique(np.concatenate(postings))
+
+    def busca(self, consulta, limite=None):
+        """
+        Busca os nomes que contem todas as palavras da consulta.
+
+        Os resultados sao ordenados por relevancia: palavra completa vale
+        mais que inicio de palavra, que vale mais que parte da palavra. A
+        consulta completa aparecer no nome (ou no inicio do nome) tambem
+        aumenta a relevancia.
+
+        Parametros:
+            consulta   (str): Texto a ser buscado
+            limite     (int): Numero maximo de resultados. Default todos
+
+        Return: Lista com a posicao dos nomes encontrados
+        """
+        palavras = self.normaliza(consulta).split()
+        if not palavras:
+            return []
+
+        candidatos = None
+        for palavra in sorted(palavras, key=len, reverse=True):
+            pos = self.candidatos(palavra)
+            if candidatos is None:
+                candidatos = pos
+            else:
+                candidatos = np.intersect1d(candidatos, pos, assume_unique=True)
+            if not len(candidatos):
+                return []
+
+        frase = " ".join(palavras)
+        resultado = []
+        for pos in candidatos.tolist():
+            nome = self.nomes[pos]
+            if not all(palavra in nome for palavra in palavras):
+                continue
+            tokens = nome.split()
+            relevancia = 0
+            for palavra in palavras:
+                if palavra in tokens:
+                    relevancia += 3
+                elif any(token.startswith(palavra) for token in tokens):
+                    relevancia += 2
+                else:
+                    relevancia += 1
+            if len(palavras) > 1 and frase in nome:
+                relevancia += 2
+            if nome.startswith(frase):
+                relevancia += 1
+            resultado.append((-relevancia, len(nome), pos))
+
+        resultado.sort()
+        return [pos for _, _, pos in resultado[:limite]]
+
+
 class Cadastral:
     """Class com informacoes cadastral dos fundos."""
 
@@ -194,49 +611,245 @@ class Cadastral:
         "CONTROLADOR": "Nome do Controlador",
     }
 
+    # Tipos das colunas do csv. Colunas com poucos valores distintos sao
+    # categoricas. Colunas com datas (csv_datas) sao convertidas depois da leitura
+    csv_dtypes = {
+        "CNPJ_FUNDO": "object",
+        "DENOM_SOCIAL": "object",
+        "SIT": "category",
+        "CLASSE": "category",
+        "RENTAB_FUNDO": "category",
+        "CONDOM": "category",
+        "FUNDO_COTAS": "category",
+        "FUNDO_EXCLUSIVO": "category",
+        "TRIB_LPRAZO": "category",
+        "INVEST_QUALIF": "category",
+        "TAXA_PERFM": "float32",
+        "INF_TAXA_PERFM": "object",
+        "TAXA_ADM": "float32",
+        "INF_TAXA_ADM": "object",
+        "VL_PATRIM_LIQ": "float64",
+        "DIRETOR": "category",
+        "CNPJ_ADMIN": "category",
+        "ADMIN": "category",
+        "PF_PJ_GESTOR": "category",
+        "CPF_CNPJ_GESTOR": "category",
+        "GESTOR": "category",
+        "CNPJ_AUDITOR": "category",
+        "AUDITOR": "category",
+        "CNPJ_CUSTODIANTE": "category",
+        "CUSTODIANTE": "category",
+        "CNPJ_CONTROLADOR": "category",
+        "CONTROLADOR": "category",
+    }
+    csv_datas = [
+        "DT_REG",
+        "DT_CONST",
+        "DT_CANCEL",
+        "DT_INI_SIT",
+        "DT_INI_ATIV",
+        "DT_INI_EXERC",
+        "DT_FIM_EXERC",
+        "DT_INI_CLASSE",
+        "DT_PATRIM_LIQ",
+    ]
+    # Versao do schema. Invalida o cache criado com outro schema
+    versao_schema = 1
+
+    # Classes dos fundos (opcao -t do busca e tipo do rank)
+    classes = {
+        "acoes": "Fundo de Ações",
+        "multimercado": "Fundo Multimercado",
+        "cambial": "Fundo Cambial",
+        "rendafixa": "Fundo de Renda Fixa",
+    }
+
     def __init__(self):
         """Initialize cadastral class."""
         self.pd_df = None
+        self.df_unico = None
+        self.indice_nomes = None
         self.filename = None
 
     def download_inf_cadastral(self):
-        """Download do arquivo cadastral."""
+        """
+        Download do arquivo cadastral.
+
+        O arquivo cadastral eh atualizado diariamente pela CVM. Se ja existir
+        localmente, faz um request condicional e o arquivo so eh baixado
+        novamente se foi modificado no servidor.
+        """
         file_name = "cad_fi.csv"
         url = "{}/{}".format(URL_CADASTRAL_DIARIO, file_name)
         local_file = "{}/{}".format(CSV_FILES_DIR, file_name)
 
-        if os.path.exists(local_file):
-            log.debug("Arquivo cadastral '%s' ja existe localmente", file_name)
-            self.filename = local_file
-        else:
-            log.debug("Tentando baixar arquivo: %s", url)
-            res = download_file(url, local_file)
-            if res.status_code == 404:
-                log.debug("Arquivo nao encontrado no site da cvm")
+        log.debug("Tentando baixar arquivo: %s", url)
+        res = agendador_downloads().download(url, local_file, conditional=True)
+        if res.status_code is None:
+            if not os.path.exists(local_file):
                 msg(
                     "red",
-                    "Erro: Arquivo cadastral encontrado no site da CVM. {}".format(url),
+                    "Erro: Falha ao baixar arquivo {}: {}".format(url, res.error),
                     1,
                 )
-            elif res.status_code == 200:
-                log.debug("Arquivo baixado com sucesso: %s", file_name)
-                self.filename = local_file
+            msg("yellow", "Falha ao verificar arquivo cadastral. Usando copia local")
+            self.filename = local_file
+            return
+
+        if res.status_code == 404:
+            log.debug("Arquivo nao encontrado no site da cvm")
+            msg(
+                "red",
+                "Erro: Arquivo cadastral encontrado no site da CVM. {}".format(url),
+                1,
+            )
+        elif res.status_code == 200:
+            log.debug("Arquivo baixado com sucesso: %s", file_name)
+            self.filename = local_file
+        elif res.status_code == 304:
+            log.debug("Arquivo cadastral '%s' local esta atualizado", file_name)
+            self.filename = local_file
+        elif os.path.exists(local_file):
+            log.debug("download response: %s. Usando copia local", res)
+            msg(
+                "yellow",
+                "Falha ao verificar arquivo cadastral (status {}, {} tentativas). "
+                "Usando copia local".format(res.status_code, res.attempts),
+            )
+            self.filename = local_file
+        else:
+            msg(
+                "red",
+                "Erro: Falha ao baixar arquivo {}: status {} ({} tentativas)".format(
+                    url, res.status_code, res.attempts
+                ),
+                1,
+            )
 
     def cria_df_cadastral(self):
         """Cria o DataFrame com o arquivo csv de cadastro."""
         log.debug("Carregando csv cadastral")
-        create_dir(CSV_FILES_DIR)
-        self.download_inf_cadastral()
-        self.pd_df = pd.read_csv(
-            self.filename, sep=";", encoding="ISO-8859-1", index_col="CNPJ_FUNDO"
+        if self.filename is None:
+            create_dir(CSV_FILES_DIR)
+            self.download_inf_cadastral()
+        pd_df = read_csv(
+            self.filename,
+            dtype=self.csv_dtypes,
+            dates=self.csv_datas,
+            engine=CSV_ENGINE,
+        )
+        self.pd_df = pd_df.set_index("CNPJ_FUNDO")
+
+    @staticmethod
+    def seleciona_cadastro_unico(pd_df):
+        """
+        Seleciona um registro por cnpj do DataFrame cadastral.
+
+        No arquivo cadastral alguns fundos tem o mesmo cnpj (ex: fundo
+        cancelado e registrado novamente). Prevalece o registro que nao esta
+        cancelado e, entre eles, o de registro (DT_REG) mais recente.
+
+        Parametros:
+            pd_df    (DataFrame): DataFrame cadastral com index CNPJ_FUNDO
+
+        Return: DataFrame com index CNPJ_FUNDO unico e ordenado
+        """
+        cadastro = pd_df.reset_index()
+        cadastro["_CANCELADA"] = cadastro["SIT"] == "CANCELADA"
+        cadastro.sort_values(
+            ["CNPJ_FUNDO", "_CANCELADA", "DT_REG"],
+            ascending=[True, True, False],
+            na_position="last",
+            kind="mergesort",
+            inplace=True,
         )
+        cadastro.drop_duplicates("CNPJ_FUNDO", keep="first", inplace=True)
+        return cadastro.drop(columns="_CANCELADA").set_index("CNPJ_FUNDO")
+
+    def cria_df_cadastral_unico(self):
+        """
+        Cria o DataFrame cadastral com um registro por cnpj.
+
+        O DataFrame eh persistido no diretorio de cache e so eh criado
+        novamente quando o arquivo cadastral muda. O index eh unico e
+        ordenado, entao as buscas por cnpj nao percorrem o DataFrame.
+        """
+        if self.filename is None:
+            create_dir(CSV_FILES_DIR)
+            self.download_inf_cadastral()
+
+        cache_dir = os.path.join(CSV_FILES_DIR, "cache")
+        create_dir(cache_dir)
+        cache_file = columnar_file_name(
+            self.filename, cache_dir, name="cad_fi_unico", version=self.versao_schema
+        )
+        if not os.path.exists(cache_file):
+            with cache_lock(cache_file, diretorio_locks()):
+                # Outro processo pode ter criado o cache enquanto aguardava
+                if not os.path.exists(cache_file):
+                    if not isinstance(self.pd_df, pd.DataFrame):
+                        self.cria_df_cadastral()
+                    self.df_unico = self.seleciona_cadastro_unico(self.pd_df)
+                    log.debug("Criando cadastro unico: %s", cache_file)
+                    write_columnar(self.df_unico.reset_index(), cache_file)
+                    return
+        log.debug("Carregando cadastro unico: %s", cache_file)
+        self.df_unico = read_columnar(cache_file).set_index("CNPJ_FUNDO")
+
+    def cria_indice_nomes(self):
+        """
+        Cria o indice de busca nos nomes dos fundos (DENOM_SOCIAL).
+
+        O indice eh persistido no diretorio de cache e so eh criado novamente
+        quando o arquivo cadastral ou a versao do indice
+        (IndiceNomes.versao_schema) muda.
+        """
+        if not isinstance(self.pd_df, pd.DataFrame):
+            self.cria_df_cadastral()
+
+        cache_dir = os.path.join(CSV_FILES_DIR, "cache")
+        create_dir(cache_dir)
+        cache_file = columnar_file_name(
+            self.filename,
+            cache_dir,
+            name="cad_fi_indice_nomes",
+            extension="pkl",
+            version=IndiceNomes.versao_schema,
+        )
+        if not os.path.exists(cache_file):
+            with cache_lock(cache_file, diretorio_locks()):
+                if not os.path.exists(cache_file):
+                    log.debug("Criando indice de nomes: %s", cache_file)
+                    self.indice_nomes = IndiceNomes(self.pd_df["DENOM_SOCIAL"])
+                    write_pickle(self.indice_nomes.estado(), cache_file)
+                    return
+        log.debug("Carregando indice de nomes: %s", cache_file)
+        self.indice_nomes = IndiceNomes.de_estado(read_pickle(cache_file))
+
+    def sugere_nomes(self, texto, limite=10):
+        """
+        Retorna os fundos com nome mais relevante para o texto.
+
+        Util para busca interativa (autocomplete).
+
+        Parametros:
+            texto      (str): Parte do nome do fundo (sem distinguir acentos)
+            limite     (int): Numero maximo de fundos
+
+        Return: Series com index CNPJ_FUNDO e o nome social
+        """
+        if self.indice_nomes is None:
+            self.cria_indice_nomes()
+
+        return self.pd_df["DENOM_SOCIAL"].iloc[self.indice_nomes.busca(texto, limite)]
 
     def busca_fundos(self, name=None, fundo_classe=None, all_situacoes=False):
         """
         Busca informacoes sobre o fundos.
 
         Parametros:
-            name                  (str): Parte do nome do fundo
+            name                  (str): Parte do nome do fundo. Busca todas as
+                                         palavras, sem distinguir acentos
             fundo_classe          (str): Classe do fundo (acoes, mm, fixa e cambial)
             all_situacoes  (True/False): Remove fundos com situacao cancelada
 
@@ -245,23 +858,17 @@ class Cadastral:
         if not isinstance(self.pd_df, pd.DataFrame):
             self.cria_df_cadastral()
 
-        # Filtra fundo pelo nome
+        # Filtra fundo pelo nome, ordenado por relevancia
         if name:
-            fundo_df = self.pd_df[
-                self.pd_df["DENOM_SOCIAL"].str.contains(name, na=False, case=False)
-            ]
+            if self.indice_nomes is None:
+                self.cria_indice_nomes()
+            fundo_df = self.pd_df.iloc[self.indice_nomes.busca(name)]
         else:
             fundo_df = self.pd_df
 
-        f_classe_dic = {
-            "acoes": "Fundo de Ações",
-            "multimercado": "Fundo Multimercado",
-            "cambial": "Fundo Cambial",
-            "rendafixa": "Fundo de Renda Fixa",
-        }
         # Filtra fundo por classe
         if fundo_classe:
-            fundo_df = fundo_df.loc[fundo_df["CLASSE"] == f_classe_dic[fundo_classe]]
+            fundo_df = fundo_df.loc[fundo_df["CLASSE"] == self.classes[fundo_classe]]
 
         # Remove fundos cancelados
         if not all_situacoes:
@@ -269,20 +876,61 @@ class Cadastral:
 
         return fundo_df
 
+    def cnpjs_em_funcionamento(self, fundo_classe=None):
+        """
+        Retorna os cnpjs dos fundos em funcionamento normal.
+
+        Parametros:
+            fundo_classe    (str): Classe do fundo (acoes, multimercado,
+                                   cambial e rendafixa). Default todas
+
+        Return: Index com os cnpjs
+        """
+        fundo_df = self.busca_fundos(fundo_classe=fundo_classe)
+        em_funcionamento = fundo_df["SIT"] == "EM FUNCIONAMENTO NORMAL"
+        return fundo_df.index[em_funcionamento.to_numpy()].unique()
+
+    def classe_fundos_em_funcionamento(self):
+        """
+        Retorna a classe dos fundos em funcionamento normal.
+
+        Return: Series com a classe (chave de Cadastral.classes) de cada
+                fundo (index CNPJ_FUNDO). Fundos de outras classes nao
+                sao incluidos
+        """
+        fundo_df = self.busca_fundos()
+        fundo_df = fundo_df[fundo_df["SIT"] == "EM FUNCIONAMENTO NORMAL"]
+        tipos = {classe: tipo for tipo, classe in self.classes.items()}
+        classe = fundo_df["CLASSE"].astype(object).map(tipos).dropna()
+        return classe[~classe.index.duplicated()].rename("Classe")
+
     def busca_fundo_cnpj(self, cnpj):
         """Retorna dataframe de um fundo."""
-        if not isinstance(self.pd_df, pd.DataFrame):
-            self.cria_df_cadastral()
+        if not isinstance(self.df_unico, pd.DataFrame):
+            self.cria_df_cadastral_unico()
 
-        # No arquivo cadastral alguns fundos tem o mesmo cnpj.
-        # Retorna o primeiro encontrado
-        fundo_df = self.pd_df.loc[[cnpj], :]
-        return fundo_df.iloc[0, :]
+        return self.df_unico.loc[cnpj]
 
     def fundo_social_nome(self, cnpj):
         """Retorna o nome social do fundo."""
         return self.busca_fundo_cnpj(cnpj)["DENOM_SOCIAL"]
 
+    def nomes_por_cnpj(self, cnpjs):
+        """
+        Retorna o nome social de varios fundos.
+
+        Parametros:
+            cnpjs    (list): Cnpjs dos fundos (lista, array ou Index)
+
+        Return: Series com index CNPJ_FUNDO (cnpjs unicos) e o nome social.
+                NaN para cnpjs nao encontrados no arquivo cadastral
+        """
+        if not isinstance(self.df_unico, pd.DataFrame):
+            self.cria_df_cadastral_unico()
+
+        cnpjs = pd.Index(cnpjs, name="CNPJ_FUNDO").unique()
+        return self.df_unico["DENOM_SOCIAL"].reindex(cnpjs)
+
     def fundo_gestor_nome(self, cnpj):
         """Retorna o nome do gestor do fundo."""
         return self.busca_fundo_cnpj(cnpj)["GESTOR"]
@@ -296,14 +944,23 @@ class Cadastral:
 
         fundo_df.rename(index=self.csv_columns, inplace=True)
         for col in fundo_df.index:
+            valor = fundo_df.loc[col]
+            if isinstance(valor, pd.Timestamp):
+                valor = valor.strftime("%Y-%m-%d")
             msg("cyan", col, end=": ")
-            msg("nocolor", fundo_df.loc[col])
+            msg("nocolor", valor)
 
 
 class Informe:
     """Class com os informes diario do fundo."""
 
     reais_format = "R${:,.2f}"
+    # Medidas do saldo do periodo e formato de cada uma
+    saldo_format = {
+        "Saldo cotista": "{:.0f}",
+        "Rentabilidade cota": "{:.2f}%",
+        "Saldo entre captacao e resgate": reais_format,
+    }
     csv_columns = {
         "CNPJ_FUNDO": "CNPJ do fundo",
         "DT_COMPTC": "Data de competencia do documento",
@@ -315,10 +972,109 @@ class Informe:
         "NR_COTST": "Numero cotistas",
     }
 
-    def __init__(self):
-        """Initialize informe class."""
+    # Tipos das colunas do csv. Valores monetarios e cota precisam de float64.
+    # Numero de cotistas eh exato em float32 (ate 16 milhoes)
+    csv_dtypes = {
+        "CNPJ_FUNDO": "category",
+        "VL_TOTAL": "float64",
+        "VL_QUOTA": "float64",
+        "VL_PATRIM_LIQ": "float64",
+        "CAPTC_DIA": "float64",
+        "RESG_DIA": "float64",
+        "NR_COTST": "float32",
+    }
+    csv_datas = ["DT_COMPTC"]
+    # Versao do schema. Invalida o cache criado com outro schema
+    versao_schema = 1
+
+    # Formatos dos arquivos de informe, na ordem em que sao procurados: zip
+    # mensal, csv mensal e zip anual (diretorio HIST, com o csv de cada mes)
+    formatos = ["zip", "csv", "anual"]
+
+    def __init__(self, *, cache=True, workers=None, memoria=None):
+        """
+        Initialize informe class.
+
+        Parametros:
+            cache   (True/False): Usa cache colunar dos arquivos csv de informe
+            workers        (int): Numero de processos para ler os informes.
+                                  Default INFORME_WORKERS
+            memoria       (dict): Informes ja carregados, usados no lugar dos
+                                  arquivos ({arquivo csv: DataFrame com index
+                                  CNPJ_FUNDO e DT_COMPTC}). Usado pelo serve
+        """
         self.pd_df = pd.DataFrame()
         self.filenames = set()
+        self.cache = cache
+        self.workers = INFORME_WORKERS if workers is None else workers
+        self.memoria = memoria or {}
+        # Resumo das falhas do ultimo download (ver download_failures)
+        self.falhas_download = []
+
+    @staticmethod
+    def arquivo_informe_mensal(data, formato="csv"):
+        """
+        Retorna url e arquivo local do informe mensal.
+
+        Parametros:
+            data     (int): Data do arquivo no formato da CVM (YYYYMM)
+            formato  (str): Formato do arquivo (Informe.formatos). O arquivo
+                            anual contem os informes de todos os meses do ano
+
+        Return: Tupla (url, arquivo local)
+        """
+        if formato == "anual":
+            # Informes antigos, em um zip por ano no subdiretorio HIST
+            file_name = "inf_diario_fi_{}.zip".format(str(data)[:4])
+            url = "{}/HIST/{}".format(URL_INFORME_DIARIO, file_name)
+        else:
+            file_name = "inf_diario_fi_{}.{}".format(data, formato)
+            url = "{}/{}".format(URL_INFORME_DIARIO, file_name)
+        local_file = "{}/{}".format(CSV_FILES_DIR, file_name)
+        return url, local_file
+
+    @staticmethod
+    def arquivo_do_mes(local_file, data, formato):
+        """
+        Retorna o arquivo usado para ler o informe do mes.
+
+        O informe de um mes dentro do zip anual eh lido direto do zip (ver
+        fundosbrlib.archive_member). Os demais formatos sao o proprio arquivo.
+
+        Return: Nome do arquivo ou None se o mes nao esta no zip anual
+        """
+        if formato != "anual":
+            return local_file
+        membros = [
+            membro
+            for membro in archive_members(local_file)
+            if Informe.data_informe(membro) == str(data)
+        ]
+        return archive_member(local_file, membros[0]) if membros else None
+
+    @staticmethod
+    def data_informe(file_mes):
+        """Retorna a data (YYYYMM) do arquivo de informe."""
+        arquivo, membro = split_archive_member(file_mes)
+        return re.search(r"(\d{6})", os.path.basename(membro or arquivo)).group(1)
+
+    @staticmethod
+    def mes_encerrado(data, momento=None):
+        """
+        Verifica se o mes do informe ja havia terminado em um momento.
+
+        Arquivos de meses passados baixados (ou validados) depois do final do
+        mes nao mudam mais, entao nao precisam ser verificados novamente.
+
+        Parametros:
+            data           (int): Data do arquivo no formato da CVM (YYYYMM)
+            momento   (datetime): Momento a ser verificado. Default agora
+
+        Return: True/False
+        """
+        ano, mes = divmod(int(data), 100)
+        inicio_mes_seguinte = datetime.datetime(ano + mes // 12, mes % 12 + 1, 1)
+        return (momento or datetime.datetime.now()) >= inicio_mes_seguinte
 
     def download_informe_mensal(self, data):
         """
@@ -327,33 +1083,347 @@ class Informe:
         Parametros:
             data     (int): Data para baixar o arquivo.
                             formato do arquivo da CVM (YYYYMM)
+
+        Return: True se o arquivo esta disponivel localmente
+        """
+        status = self.download_informes_mensais([data], max_workers=1)[data]
+        return status in ("local", 200, 304)
+
+    def download_informes_mensais(self, datas, *, max_workers=DOWNLOAD_WORKERS):
+        """
+        Download concorrente dos arquivos de informe mensal.
+
+        Os formatos de arquivo sao procurados na ordem de Informe.formatos.
+        Arquivos zip nao sao extraidos: os csv sao lidos direto do zip e
+        apenas a copia compactada fica em disco. O zip anual eh baixado uma
+        unica vez para todos os meses do ano.
+
+        Arquivos de meses passados ja completos sao imutaveis e nunca sao
+        verificados novamente. Os demais (ex: mes corrente) sao verificados
+        com um request condicional (ETag/Last-Modified) e so sao baixados
+        se foram modificados no servidor. Os downloads compartilham a mesma
+        sessao http (conexoes keep-alive).
+
+        Parametros:
+            datas        (list): Lista de datas no formato da CVM (YYYYMM)
+            max_workers   (int): Numero maximo de downloads simultaneos
+
+        Return: Dicionario com o resultado de cada mes:
+                    key: data (YYYYMM)
+                    value: "local" se o arquivo local eh imutavel, codigo http
+                           do download (304 se nao modificado) ou None se
+                           houve erro na conexao
         """
         create_dir(CSV_FILES_DIR)
 
-        file_name = "inf_diario_fi_{}.csv".format(data)
+        relatorio = {}
+        falhas = []
+        # Formatos ainda nao tentados de cada mes
+        pendentes = {}
+        # Formatos com copia local de cada mes (usadas se o download falhar)
+        locais = {}
+        for data in datas:
+            formatos = [
+                formato
+                for formato in self.formatos
+                if os.path.exists(self.arquivo_informe_mensal(data, formato)[1])
+            ]
+            for formato in formatos:
+                local_file = self.arquivo_informe_mensal(data, formato)[1]
+                self.marca_arquivo_antigo(local_file, data, formato)
+                arquivo = None
+                if is_file_immutable(local_file):
+                    arquivo = self.arquivo_do_mes(local_file, data, formato)
+                if arquivo:
+                    log.debug("Arquivo informe '%s' ja existe localmente", arquivo)
+                    self.filenames.add(arquivo)
+                    relatorio[data] = "local"
+                    break
+            else:
+                # Revalida a copia local. Se o mes nao estiver mais nela,
+                # procura nos outros formatos
+                locais[data] = formatos
+                pendentes[data] = formatos + [
+                    formato for formato in self.formatos if formato not in formatos
+                ]
+
+        while pendentes:
+            downloads = {}
+            for data, formatos in pendentes.items():
+                url_local = self.arquivo_informe_mensal(data, formatos[0])
+                downloads.setdefault(url_local, []).append(data)
+
+            log.debug("Verificando %s arquivos de informe", len(downloads))
+            results = agendador_downloads().download_all(
+                list(downloads), max_workers=max_workers, conditional=True
+            )
+            falhas.extend(download_failures(results))
+            proximos = {}
+            for res, datas_arquivo in zip(results, downloads.values()):
+                for data in datas_arquivo:
+                    formato = pendentes[data][0]
+                    relatorio[data] = res.status_code
+                    if res.status_code in (200, 304):
+                        arquivo = self.arquivo_do_mes(res.local_file, data, formato)
+                        if arquivo:
+                            log.debug(
+                                "Arquivo atualizado: %s (%s)", arquivo, res.status_code
+                            )
+                            self.filenames.add(arquivo)
+                            if self.mes_encerrado(self.ultimo_mes(data, formato)):
+                                mark_file_immutable(res.local_file)
+                            continue
+                        log.debug("Mes %s nao encontrado em %s", data, res.url)
+                        relatorio[data] = 404
+                    elif res.status_code == 404:
+                        log.debug("Arquivo nao encontrado no site da cvm: %s", res.url)
+
+                    if relatorio[data] == 404 and len(pendentes[data]) > 1:
+                        proximos[data] = pendentes[data][1:]
+                        continue
+                    # Mes nao encontrado em nenhum formato ou falha no
+                    # download. Usa a copia local, se existir
+                    arquivo = self.copia_local(data, locais.get(data, [formato]))
+                    if arquivo:
+                        log.debug("Usando copia local: %s", arquivo)
+                        self.filenames.add(arquivo)
+            pendentes = proximos
+
+        # Os meses selecionados sao os ultimos removidos do cache (LRU)
+        for arquivo in self.filenames:
+            touch_access(arquivo)
+        if CACHE_LIMITE:
+            CacheDados().aplica_limite(
+                CACHE_LIMITE * 1024 * 1024,
+                protegidos={CacheDados.chave(f) for f in self.filenames},
+            )
 
-        url = "{}/{}".format(URL_INFORME_DIARIO, file_name)
-        local_file = "{}/{}".format(CSV_FILES_DIR, file_name)
+        self.falhas_download = falhas
+        for falha in falhas:
+            msg(
+                "yellow",
+                "Erro ao baixar arquivo {}: {} ({} tentativas)".format(
+                    falha["url"],
+                    falha["error"] or falha["status_code"],
+                    falha["attempts"],
+                ),
+            )
+        log.debug("Resultado dos downloads: %s", relatorio)
+        return relatorio
 
-        if os.path.exists(local_file):
-            log.debug("Arquivo informe '%s' ja existe localmente", file_name)
-            self.filenames.add(local_file)
-            return True
+    def copia_local(self, data, formatos):
+        """
+        Retorna o arquivo local do mes no primeiro formato disponivel.
 
-        log.debug("Tentando baixar arquivo do dia: %s", file_name)
-        res = download_file(url, local_file)
-        if res.status_code == 404:
-            log.debug("Arquivo nao encontrado no site da cvm")
-        elif res.status_code == 200:
-            log.debug("Arquivo baixado com sucesso: %s", file_name)
-            self.filenames.add(local_file)
-            return True
+        Parametros:
+            data       (str): Data (YYYYMM)
+            formatos  (list): Formatos (Informe.formatos) a procurar
+
+        Return: Arquivo (ver Informe.filenames) ou None
+        """
+        for formato in formatos:
+            local_file = self.arquivo_informe_mensal(data, formato)[1]
+            if os.path.exists(local_file):
+                arquivo = self.arquivo_do_mes(local_file, data, formato)
+                if arquivo:
+                    return arquivo
+        return None
+
+    @staticmethod
+    def ultimo_mes(data, formato):
+        """Retorna o ultimo mes (YYYYMM) com informes no arquivo."""
+        if formato == "anual":
+            return "{}12".format(str(data)[:4])
+        return data
+
+    def marca_arquivo_antigo(self, local_file, data, formato):
+        """
+        Marca como imutavel um arquivo baixado sem metadados.
+
+        Arquivos baixados por versoes antigas nao tem metadados. Se foram
+        baixados depois do final do periodo do arquivo, nao mudam mais.
+        Arquivos com metadados invalidos (ex: download corrompido) nao sao
+        marcados e sao baixados novamente.
+        """
+        if is_file_immutable(local_file):
+            return
+        if os.path.exists(file_meta_name(local_file)):
+            meta = read_file_meta(local_file)
+            if not meta or "url" in meta:
+                return
+        if self.mes_encerrado(
+            self.ultimo_mes(data, formato),
+            datetime.datetime.fromtimestamp(os.path.getmtime(local_file)),
+        ):
+            mark_file_immutable(local_file)
+
+    @classmethod
+    def le_csv_informe(cls, file_mes, columns=None, cnpjs=None):
+        """
+        Le o arquivo csv de informe.
+
+        Parametros:
+            file_mes    (str): Arquivo csv do informe
+            columns    (list): Colunas para carregar. Default todas
+            cnpjs      (list): Carrega apenas as linhas destes cnpjs. Com o
+                               engine pandas, o csv eh lido em blocos e filtrado
+                               durante a leitura, entao a memoria usada depende
+                               apenas dos fundos selecionados. Default todos
+
+        Return: DataFrame (sem index)
+        """
+        log.debug("read_csv arquivo: %s (engine %s)", file_mes, CSV_ENGINE)
+        filters = None if cnpjs is None else [("CNPJ_FUNDO", "in", list(cnpjs))]
+        return read_csv(
+            file_mes,
+            columns,
+            cls.csv_dtypes,
+            cls.csv_datas,
+            filters,
+            engine=CSV_ENGINE,
+            chunksize=CSV_CHUNKSIZE,
+        )
+
+    @classmethod
+    def cria_cache_informe(cls, file_mes, cache_file):
+        """
+        Cria o cache colunar do arquivo csv de informe.
+
+        Com o engine pandas, o csv eh lido e gravado em blocos, entao a
+        memoria usada nao depende do tamanho do informe. O engine pyarrow le
+        o arquivo completo (em varias threads).
+
+        Parametros:
+            file_mes    (str): Arquivo csv do informe
+            cache_file  (str): Arquivo do cache (ver columnar_file_name)
+        """
+        if csv_engine(CSV_ENGINE) == "pyarrow":
+            write_columnar(cls.le_csv_informe(file_mes), cache_file)
+            return
+        write_columnar_chunks(
+            read_csv_chunks(
+                file_mes, None, cls.csv_dtypes, cls.csv_datas, chunksize=CSV_CHUNKSIZE
+            ),
+            cache_file,
+        )
+
+    def le_informe_mensal(self, file_mes, columns=None, cnpjs=None):
+        """
+        Carrega o informe de um mes.
+
+        Na primeira leitura, o csv eh convertido para um arquivo colunar no
+        diretorio de cache. As leituras seguintes usam esse arquivo, que eh
+        identificado pelo checksum do csv (uma nova versao do csv gera um
+        novo cache).
+
+        Parametros:
+            file_mes    (str): Arquivo csv do informe
+            columns    (list): Colunas para carregar. Default todas
+            cnpjs      (list): Carrega apenas as linhas destes cnpjs.
+                               Default todos
+
+        Return: DataFrame com index CNPJ_FUNDO e DT_COMPTC
+        """
+        filters = None if cnpjs is None else [("CNPJ_FUNDO", "in", list(cnpjs))]
+        if not self.cache:
+            informe_mensal = self.le_csv_informe(file_mes, columns, cnpjs)
         else:
-            log.debug("download resposnse: %s", res)
+            cache_dir = os.path.join(CSV_FILES_DIR, "cache")
+            create_dir(cache_dir)
+            cache_file = columnar_file_name(
+                file_mes, cache_dir, version=self.versao_schema
+            )
+            if not os.path.exists(cache_file):
+                # Apenas um processo converte o arquivo. Os outros aguardam
+                # o lock e leem o cache criado
+                with cache_lock(cache_file, diretorio_locks()):
+                    if not os.path.exists(cache_file):
+                        # Converte o arquivo completo para que o cache sirva
+                        # para qualquer projecao de colunas e cnpjs
+                        log.debug("Criando cache colunar: %s", cache_file)
+                        self.cria_cache_informe(file_mes, cache_file)
+            log.debug("Carregando cache colunar: %s", cache_file)
+            informe_mensal = read_columnar(cache_file, columns, filters)
+
+        # O index MultiIndex ja armazena os cnpjs de forma compacta. Um level
+        # categorico faria o groupby retornar tambem cnpjs nao selecionados
+        informe_mensal["CNPJ_FUNDO"] = informe_mensal["CNPJ_FUNDO"].astype(object)
+        return informe_mensal.set_index(["CNPJ_FUNDO", "DT_COMPTC"])
+
+    def informes_mensais(self, columns=None, cnpjs=None, armazem=None):
+        """
+        Gera os informes de cada mes, em ordem de data.
+
+        Parametros:
+            columns    (list): Colunas para carregar. Default todas
+            cnpjs      (list): Carrega apenas as linhas destes cnpjs.
+                               Default todos
+            armazem     (obj): Instancia de ArmazemCnpj. Se especificado (e
+                               cnpjs tambem), le apenas a particao dos cnpjs
+
+        Return: Generator de tuplas (arquivo csv, DataFrame do mes)
+        """
+        if self.filenames and self.filenames <= set(self.memoria):
+            for file_mes in sorted(self.filenames):
+                yield file_mes, self.projeta(self.memoria[file_mes], columns, cnpjs)
+            return
+
+        if armazem is None or cnpjs is None:
+            filenames = sorted(self.filenames)
+            workers = min(self.workers, len(filenames))
+            if workers <= 1:
+                for file_mes in filenames:
+                    yield file_mes, self.le_informe_mensal(file_mes, columns, cnpjs)
+                return
+
+            # Cada processo le, projeta e filtra um mes. Apenas as linhas e
+            # colunas selecionadas sao enviadas de volta
+            log.debug("Lendo %s informes com %s processos", len(filenames), workers)
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=inicia_processo,
+                initargs=(CSV_FILES_DIR, CSV_ENGINE),
+            ) as pool:
+                informes = pool.map(
+                    le_informe_processo,
+                    filenames,
+                    [columns] * len(filenames),
+                    [cnpjs] * len(filenames),
+                    [self.cache] * len(filenames),
+                )
+                yield from zip(filenames, informes)
+            return
+
+        armazem.atualiza(self.filenames, self)
+        historico = armazem.historico(
+            cnpjs, [self.data_informe(f) for f in self.filenames], columns
+        )
+        meses = historico.index.get_level_values("DT_COMPTC").strftime("%Y%m")
+        for file_mes in sorted(self.filenames):
+            yield file_mes, historico[meses == self.data_informe(file_mes)]
+
+    @staticmethod
+    def projeta(informe_mensal, columns=None, cnpjs=None):
+        """
+        Seleciona colunas e cnpjs de um informe ja carregado.
+
+        Parametros:
+            informe_mensal (DataFrame): Informe com index CNPJ_FUNDO e DT_COMPTC
+            columns             (list): Colunas. Default todas
+            cnpjs               (list): Cnpjs dos fundos. Default todos
 
-        return False
+        Return: DataFrame com index CNPJ_FUNDO e DT_COMPTC
+        """
+        if cnpjs is not None:
+            fundos = informe_mensal.index.get_level_values("CNPJ_FUNDO")
+            informe_mensal = informe_mensal[fundos.isin(cnpjs)]
+        if columns:
+            informe_mensal = informe_mensal[
+                [col for col in informe_mensal.columns if col in columns]
+            ]
+        return informe_mensal
 
-    def cria_df_informe(self, *, cnpj=None, columns=None):
+    def cria_df_informe(self, *, cnpj=None, cnpjs=None, columns=None, armazem=None):
         """
         Cria DataFrame com os dados dos arquivos csv de informe.
 
@@ -361,8 +1431,14 @@ class Informe:
             cnpj      (str): Cnpj do(s) fundo(s) para criar o DataFrame.
                              Cnpj(s) devem ser separados pelo caractere ','
                              Se nao especificado, cria com todos
+            cnpjs   (Index): Alternativa ao cnpj para muitos fundos (ex: rank).
+                             Index ou array com os cnpjs. Cnpjs nao
+                             encontrados nos informes sao ignorados
             columns  (list): Lista com as colunas a serem adicionadas no DataFrame
                              Se, nao especificado, adiciona todas
+            armazem   (obj): Instancia de ArmazemCnpj. Se especificado, os
+                             informes dos cnpjs sao lidos do armazenamento
+                             particionado por cnpj
 
         Return:
                 1     - dataframe criado com sucesso e todos os cnpjs
@@ -371,44 +1447,30 @@ class Informe:
                         nao foram encontrados nos arquivos de informe.
         """
         ret_code = 1
-        cnpj_list = []
+        cnpj_list = None
         if cnpj:
-            cnpj_list.extend(cnpj.split(","))
+            cnpj_list = pd.Index(cnpj.split(",")).unique()
+        elif cnpjs is not None:
+            cnpj_list = pd.Index(cnpjs).unique()
         #        log.debug("cnpj: %s", cnpj_list)
 
         if columns:
             columns.extend(["CNPJ_FUNDO", "DT_COMPTC"])
             log.debug("Carregando apenas colunas %s", columns)
 
-        for file_mes in self.filenames:
-            log.debug("pandas read_csv arquivo: %s", file_mes)
-            informe_mensal = pd.read_csv(
-                file_mes,
-                sep=";",
-                encoding="ISO-8859-1",
-                index_col=["CNPJ_FUNDO", "DT_COMPTC"],
-                usecols=columns,
-                parse_dates=True,
-            )
+        # DataFrames de cada mes. Sao concatenados uma unica vez no final
+        informes = []
+        for file_mes, informe_mensal in self.informes_mensais(
+            columns, cnpj_list, armazem
+        ):
             log.debug("Arquivo carregado com sucesso")
-            if cnpj_list:
+            if cnpj:
                 # Garante que os cnpjs passados existam no informe
-                val_cnpjs = list(
-                    set(cnpj_list).intersection(
-                        set(
-                            informe_mensal.index.get_level_values("CNPJ_FUNDO").tolist()
-                        )
-                    )
-                )
-                inval_cnpjs = set(cnpj_list) - set(
-                    informe_mensal.index.get_level_values("CNPJ_FUNDO").tolist()
+                encontrados = pd.Index(cnpj_list).isin(
+                    informe_mensal.index.get_level_values("CNPJ_FUNDO")
                 )
+                inval_cnpjs = set(cnpj_list[~encontrados])
                 log.debug("cnpjs nao encontrados no informe diario: %s", inval_cnpjs)
-                try:
-                    self.pd_df = pd.concat([self.pd_df, informe_mensal.loc[val_cnpjs]])
-                except KeyError as error:
-                    log.debug("Erro: cnpj(s) '%s' nao encontrado", error)
-                    ret_code = 0
                 if inval_cnpjs:
                     msg(
                         "yellow",
@@ -417,47 +1479,67 @@ class Informe:
                         ),
                     )
                     ret_code = 0
-            else:
-                self.pd_df = pd.concat([self.pd_df, informe_mensal])
+            informes.append(informe_mensal)
 
-            log.debug("DataFrame criado")
+        if informes:
+            if not self.pd_df.empty:
+                informes.insert(0, self.pd_df)
+            self.pd_df = pd.concat(informes)
+        log.debug("DataFrame criado")
         return ret_code
 
-    def remove_index_cnpj(self):
+    def remove_index_cnpj(self, fundo_df=None):
+        """
+        Retorna dataframe sem cnpj no index quando ha apenas um fundo.
+
+        Com varios fundos, o dataframe eh retornado com o cnpj no index. O
+        dataframe original nao eh alterado.
+
+        Parametro: DataFrame com o cnpj no index. Default self.pd_df
         """
-        Retorna dataframe sem cnpj no index.
+        if fundo_df is None:
+            fundo_df = self.pd_df
+
+        if (
+            "CNPJ_FUNDO" in fundo_df.index.names
+            and fundo_df.index.unique(level="CNPJ_FUNDO").size == 1
+        ):
+            fundo_df = fundo_df.reset_index(level="CNPJ_FUNDO", drop=True)
+
+        return fundo_df
 
-        Os methods dessa classe que mostram dados dos informes nao
-        suportam mais de um cnpj. Retorna dataframe com apenas data de index
+    def informe_diario(self):
         """
-        fundo_df = self.pd_df
+        Calcula rentabilidade diaria e acumulada da cota de todos os fundos.
 
-        if "CNPJ_FUNDO" in fundo_df.index.names:
-            if fundo_df.index.unique(level="CNPJ_FUNDO").size > 1:
-                msg("red", "Erro: Este method nao suporta mais de um fundo", 1)
-            fundo_df.reset_index(level="CNPJ_FUNDO", drop=True, inplace=True)
+        Return: DataFrame com as colunas do informe e as colunas
+                Rent. cota dia e Rent. acumulada (index CNPJ_FUNDO e
+                DT_COMPTC, ordenado)
+        """
+        fundo_df = self.pd_df.sort_index()
 
+        rent_dia = fundo_df.groupby(level="CNPJ_FUNDO")["VL_QUOTA"].pct_change()
+        fundo_df["Rent. cota dia"] = rent_dia * 100
+        fundo_df["Rent. acumulada"] = (
+            (1 + rent_dia).groupby(level="CNPJ_FUNDO").cumprod() - 1
+        ) * 100
         return fundo_df
 
     def mostra_informe_fundo(self):
         """
-        Mostra os informes de um fundo.
+        Mostra os informes dos fundos.
 
-        Adiciona no dataframe rentabilidade diaria e acumulada da cota
+        Adiciona no dataframe rentabilidade diaria e acumulada da cota. Com
+        varios fundos, os informes sao agrupados por cnpj
 
         Return   Dataframe como string
         """
-        fundo_df = self.remove_index_cnpj()
+        fundo_df = self.remove_index_cnpj(self.informe_diario())
+        fundo_df = fundo_df.rename_axis(index={"DT_COMPTC": "Data"})
 
-        fundo_df.index.names = ["Data"]
-        fundo_df.sort_index(inplace=True)
-
-        # Adiciona no dataframe informacoes da rentabilidade diaria e acumulada da cota
-        fundo_df["Rent. cota dia"] = fundo_df["VL_QUOTA"].pct_change()
-        fundo_df["Rent. acumulada"] = (
-            (1 + fundo_df["Rent. cota dia"]).cumprod() - 1
-        ) * 100
-        fundo_df["Rent. cota dia"] = fundo_df["Rent. cota dia"] * 100
+        if "NR_COTST" in fundo_df.columns:
+            # Numero de cotistas eh float32 no schema do csv
+            fundo_df["NR_COTST"] = fundo_df["NR_COTST"].round().astype("Int64")
 
         return fundo_df.rename(columns=self.csv_columns).to_string(
             formatters={
@@ -470,101 +1552,1558 @@ class Informe:
             }
         )
 
+    def saldo_periodo(self):
+        """
+        Calcula saldo do periodo (cota, cotista e captacao/resgate) dos fundos.
+
+        Return: DataFrame com as colunas de Informe.saldo_format (index
+                CNPJ_FUNDO)
+        """
+        fundo_df = self.pd_df.sort_index()
+        gp = fundo_df.groupby(level="CNPJ_FUNDO")
+        primeiro = gp[["NR_COTST", "VL_QUOTA"]].first()
+        ultimo = gp[["NR_COTST", "VL_QUOTA"]].last()
+
+        saldo_df = pd.DataFrame(
+            {
+                "Saldo cotista": ultimo["NR_COTST"] - primeiro["NR_COTST"],
+                "Rentabilidade cota": (
+                    (ultimo["VL_QUOTA"] - primeiro["VL_QUOTA"]) / primeiro["VL_QUOTA"]
+                )
+                * 100,
+                "Saldo entre captacao e resgate": gp["CAPTC_DIA"].sum()
+                - gp["RESG_DIA"].sum(),
+            }
+        )
+        log.debug("saldo: %s", saldo_df)
+        return saldo_df
+
     def calc_saldo_periodo(self):
         """
-        Calcula saldo do periodo (cota, cotista e captacao/resgate).
+        Calcula saldo do periodo (cota, cotista e captacao/resgate) de um fundo.
+
+        Para varios fundos, ver Informe.saldo_periodo
 
         Return: Dicionario:
                     key: nome da medida
                     value: valor da medida
         """
-        fundo_df = self.remove_index_cnpj()
+        saldo_s = self.saldo_periodo().iloc[0]
+        calc = {
+            medida: formato.format(saldo_s[medida])
+            for medida, formato in self.saldo_format.items()
+        }
 
-        fundo_df.index.names = ["Data"]
-        fundo_df.sort_index(inplace=True)
+        log.debug("calc: %s", calc)
+        return calc
 
-        cota = fundo_df["NR_COTST"].iloc[-1] - fundo_df["NR_COTST"].iloc[0]
-        rent = (
-            (fundo_df["VL_QUOTA"].iloc[-1] - fundo_df["VL_QUOTA"].iloc[0])
-            / fundo_df["VL_QUOTA"].iloc[0]
-        ) * 100
-        capt_resg = fundo_df["CAPTC_DIA"].sum() - fundo_df["RESG_DIA"].sum()
+    def estatistica_mensal(self):
+        """
+        Calcula estatistica mensal dos fundos.
 
-        calc = {
-            "Saldo cotista": "{}".format(cota),
-            "Rentabilidade cota": "{:.2f}%".format(rent),
-            "Saldo entre captacao e resgate": "R${:,.2f}".format(capt_resg),
+        Return:  DataFrame com as colunas Rentabilidade, Dif. Cotistas e
+                 Captacao (index ano e mes, precedido do cnpj quando ha
+                 varios fundos)
+        """
+        fundo_df = self.pd_df.sort_index()
+        datas = fundo_df.index.get_level_values("DT_COMPTC")
+
+        gp = fundo_df.groupby(
+            [
+                fundo_df.index.get_level_values("CNPJ_FUNDO"),
+                datas.year.rename("ano"),
+                datas.month.rename("mes"),
+            ]
+        )
+
+        # Calcula rentabilidade da cota e entre o ultimo dia de cada mes, ie
+        # final do mes com o final do mes anterior
+        ultimo_df = gp[["VL_QUOTA", "NR_COTST"]].last()
+        por_fundo = ultimo_df.groupby(level="CNPJ_FUNDO")
+        cota_s = por_fundo["VL_QUOTA"].pct_change() * 100
+        dif_cotista_s = por_fundo["NR_COTST"].diff()
+        # Para fazer o calculo entre o primeiro e o ultimo dia de cada mes
+        # cota_s = ((gp["VL_QUOTA"].last() /  gp["VL_QUOTA"].first()) - 1) * 100
+        # dif_cotista_s = gp["NR_COTST"].last() - gp["NR_COTST"].first()
+
+        # Saldo entre captacao e resgate
+        captacao_s = gp["CAPTC_DIA"].sum() - gp["RESG_DIA"].sum()
+
+        mes_df = pd.DataFrame(
+            {
+                "Rentabilidade": cota_s,
+                "Dif. Cotistas": dif_cotista_s,
+                "Captacao": captacao_s,
+            }
+        )
+        mes_df.dropna(inplace=True)
+        return self.remove_index_cnpj(mes_df)
+
+    def calc_estatistica_mensal(self):
+        """
+        Mostra estatistica mensal dos fundos.
+
+        Return:  DataFrame como string
+        """
+        mes_df = self.estatistica_mensal()
+        if mes_df.empty:
+            msg(
+                "red",
+                "Dados insuficientes para exibir dados mensais. "
+                "Aumente o intervalo requisitado",
+                1,
+            )
+
+        return mes_df.to_string(
+            justify="center",
+            formatters={
+                "Rentabilidade": "{:.2f}%".format,
+                "Dif. Cotistas": "{:.0f}".format,
+                "Captacao": self.reais_format.format,
+            },
+        )
+
+
+def inicia_processo(csv_files_dir, csv_engine):
+    """
+    Configura um processo criado para ler informes.
+
+    Parametros:
+        csv_files_dir (str): Diretorio dos arquivos csv (CSV_FILES_DIR)
+        csv_engine    (str): Engine para ler os arquivos csv (CSV_ENGINE)
+    """
+    global log, CSV_FILES_DIR, CSV_ENGINE
+
+    log = logging
+    CSV_FILES_DIR = csv_files_dir
+    CSV_ENGINE = csv_engine
+
+
+def le_informe_processo(file_mes, columns, cnpjs, cache):
+    """
+    Le o informe de um mes em um processo (ver Informe.le_informe_mensal).
+
+    Return: DataFrame com index CNPJ_FUNDO e DT_COMPTC
+    """
+    return Informe(cache=cache, workers=1).le_informe_mensal(file_mes, columns, cnpjs)
+
+
+class ArmazemCnpj:
+    """
+    Informes diarios particionados por cnpj.
+
+    Os informes mensais sao reparticionados em buckets pelo hash do cnpj.
+    Cada bucket tem um arquivo colunar por mes, ordenado por cnpj e data.
+    Para buscar o historico de um fundo, apenas o bucket do fundo eh lido.
+    O indice (indice.json) guarda o checksum do csv de cada mes ingerido.
+    """
+
+    buckets = 64
+
+    def __init__(self, diretorio=None):
+        """
+        Initialize ArmazemCnpj class.
+
+        Parametros:
+            diretorio   (str): Diretorio do armazenamento.
+                               Default CSV_FILES_DIR/por_cnpj
+        """
+        self.diretorio = diretorio or os.path.join(CSV_FILES_DIR, "por_cnpj")
+        self.indice_file = os.path.join(self.diretorio, "indice.json")
+        self.lock_file = lock_file_name(self.indice_file)
+
+    def bucket(self, cnpj):
+        """Retorna o bucket do cnpj."""
+        return zlib.crc32(cnpj.encode()) % self.buckets
+
+    def arquivo_bucket(self, bucket, data):
+        """Retorna o arquivo de um bucket para o mes data (YYYYMM)."""
+        return os.path.join(
+            self.diretorio,
+            "{:02d}".format(bucket),
+            "{}.{}".format(data, COLUMNAR_FORMAT),
+        )
+
+    def carrega_indice(self):
+        """Retorna o indice do armazenamento."""
+        indice = read_json(self.indice_file)
+        if (
+            indice.get("buckets") != self.buckets
+            or indice.get("versao_schema") != Informe.versao_schema
+        ):
+            return {
+                "buckets": self.buckets,
+                "versao_schema": Informe.versao_schema,
+                "meses": {},
+            }
+        return indice
+
+    def ingere_informe(self, file_mes, informe):
+        """
+        Particiona o informe de um mes nos buckets.
+
+        Parametros:
+            file_mes    (str): Arquivo csv do informe
+            informe     (obj): Instancia da classe Informe usada para ler o csv
+        """
+        data = Informe.data_informe(file_mes)
+        log.debug("Particionando informe %s por cnpj", file_mes)
+        informe_mensal = informe.le_informe_mensal(file_mes).reset_index()
+
+        cnpjs = informe_mensal["CNPJ_FUNDO"].astype("category")
+        bucket_cnpj = [self.bucket(cnpj) for cnpj in cnpjs.cat.categories]
+        informe_mensal["CNPJ_FUNDO"] = cnpjs
+        informe_mensal.sort_values(["CNPJ_FUNDO", "DT_COMPTC"], inplace=True)
+        buckets = pd.Series(bucket_cnpj).take(cnpjs.cat.codes).to_numpy()
+
+        for bucket in range(self.buckets):
+            create_dir(os.path.join(self.diretorio, "{:02d}".format(bucket)))
+            arquivo = self.arquivo_bucket(bucket, data)
+            particao = informe_mensal[buckets == bucket]
+            if particao.empty:
+                # Bucket sem fundos neste mes
+                if os.path.exists(arquivo):
+                    os.remove(arquivo)
+                continue
+            particao = particao.assign(
+                CNPJ_FUNDO=particao["CNPJ_FUNDO"].cat.remove_unused_categories()
+            )
+            write_columnar(particao, arquivo)
+
+    def atualiza(self, filenames, informe=None):
+        """
+        Ingere os informes que ainda nao estao no armazenamento.
+
+        Um informe eh ingerido novamente se o csv mudou (ex: mes corrente).
+
+        Parametros:
+            filenames   (iter): Arquivos csv de informe
+            informe      (obj): Instancia da classe Informe usada para ler os csv
+
+        Return: Lista com as datas (YYYYMM) ingeridas
+        """
+        informe = informe or Informe()
+        create_dir(self.diretorio)
+        checksums = {file_mes: file_checksum(file_mes) for file_mes in filenames}
+        indice = self.carrega_indice()
+        if all(
+            indice["meses"].get(Informe.data_informe(file_mes)) == checksum
+            for file_mes, checksum in checksums.items()
+        ):
+            return []
+
+        ingeridos = []
+        with FileLock(self.lock_file):
+            # Le o indice novamente, outro processo pode ter ingerido meses
+            indice = self.carrega_indice()
+            for file_mes in sorted(checksums):
+                data = Informe.data_informe(file_mes)
+                if indice["meses"].get(data) == checksums[file_mes]:
+                    continue
+                self.ingere_informe(file_mes, informe)
+                indice["meses"][data] = checksums[file_mes]
+                write_json(self.indice_file, indice)
+                ingeridos.append(data)
+
+        log.debug("Informes particionados por cnpj: %s", ingeridos)
+        return ingeridos
+
+    def historico(self, cnpjs, datas, columns=None):
+        """
+        Retorna o historico dos fundos lendo apenas os buckets dos cnpjs.
+
+        Parametros:
+            cnpjs      (list): Cnpjs dos fundos
+            datas      (list): Datas (YYYYMM) dos meses
+            columns    (list): Colunas para carregar. Default todas
+
+        Return: DataFrame com index CNPJ_FUNDO e DT_COMPTC
+        """
+        if columns:
+            columns = ["CNPJ_FUNDO", "DT_COMPTC"] + [
+                col for col in columns if col not in ("CNPJ_FUNDO", "DT_COMPTC")
+            ]
+        indice = self.carrega_indice()
+        filters = [("CNPJ_FUNDO", "in", list(cnpjs))]
+        informes = []
+        for bucket in sorted({self.bucket(cnpj) for cnpj in cnpjs}):
+            for data in sorted(datas):
+                arquivo = self.arquivo_bucket(bucket, data)
+                if data not in indice["meses"] or not os.path.exists(arquivo):
+                    continue
+                informes.append(read_columnar(arquivo, columns, filters))
+
+        if not informes:
+            informes.append(
+                pd.DataFrame(
+                    {
+                        "CNPJ_FUNDO": pd.Series(dtype=object),
+                        "DT_COMPTC": pd.Series(dtype="datetime64[ns]"),
+                    }
+                )
+            )
+
+        fundo_df = pd.concat(informes, ignore_index=True)
+        fundo_df["CNPJ_FUNDO"] = fundo_df["CNPJ_FUNDO"].astype(object)
+        return fundo_df.set_index(["CNPJ_FUNDO", "DT_COMPTC"]).sort_index()
+
+
+class TabelaRetornos:
+    """
+    Tabela com os retornos diarios das cotas de todos os fundos.
+
+    Para cada fundo e dia sao guardados a cota, o retorno, o log do retorno e
+    um indice acumulado da cota (1.0 no primeiro dia do fundo na tabela).
+    Cada mes eh um arquivo colunar. Como o indice eh acumulado, a
+    rentabilidade entre duas datas eh a divisao do indice nas duas datas.
+
+    A tabela eh atualizada de forma incremental. Quando um mes novo (ou uma
+    nova versao do mes corrente) eh adicionado, apenas ele e os meses
+    seguintes sao recalculados. Se faltar um mes na tabela, o retorno do
+    primeiro dia depois do buraco fica sem valor.
+    """
+
+    versao_schema = 1
+
+    def __init__(self, diretorio=None):
+        """
+        Initialize TabelaRetornos class.
+
+        Parametros:
+            diretorio   (str): Diretorio da tabela.
+                               Default CSV_FILES_DIR/retornos
+        """
+        self.diretorio = diretorio or os.path.join(CSV_FILES_DIR, "retornos")
+        self.indice_file = os.path.join(self.diretorio, "indice.json")
+        self.lock_file = lock_file_name(self.indice_file)
+
+    def arquivo_mes(self, data):
+        """Retorna o arquivo da tabela para o mes data (YYYYMM)."""
+        return os.path.join(self.diretorio, "{}.{}".format(data, COLUMNAR_FORMAT))
+
+    def arquivo_fechamento(self, data):
+        """Retorna o arquivo com o fechamento acumulado ate o mes data (YYYYMM)."""
+        return os.path.join(
+            self.diretorio, "fechamento", "{}.{}".format(data, COLUMNAR_FORMAT)
+        )
+
+    def carrega_indice(self):
+        """Retorna o indice da tabela."""
+        versao = [Informe.versao_schema, self.versao_schema]
+        indice = read_json(self.indice_file)
+        if indice.get("versao_schema") != versao:
+            return {"versao_schema": versao, "meses": {}}
+        return indice
+
+    @staticmethod
+    def mes_anterior(data):
+        """Retorna o mes (YYYYMM) anterior ao mes data."""
+        return (pd.Period(data, freq="M") - 1).strftime("%Y%m")
+
+    @staticmethod
+    def calcula_mes(informe_mensal, fechamento=None, contiguo=True):
+        """
+        Calcula os retornos diarios de um mes.
+
+        Parametros:
+            informe_mensal (DataFrame): Colunas CNPJ_FUNDO, DT_COMPTC e VL_QUOTA
+            fechamento     (DataFrame): Ultima cota e indice (VL_QUOTA e INDICE)
+                                        de cada fundo no mes anterior, com
+                                        index CNPJ_FUNDO
+            contiguo            (bool): Se False, o fechamento eh de um mes
+                                        anterior ao mes anterior. O indice
+                                        continua acumulado, mas o primeiro
+                                        retorno de cada fundo fica sem valor
+
+        Return: DataFrame com as colunas CNPJ_FUNDO, DT_COMPTC, VL_QUOTA,
+                RETORNO, LOG_RETORNO e INDICE
+        """
+        mes_df = informe_mensal[["CNPJ_FUNDO", "DT_COMPTC", "VL_QUOTA"]]
+        # Cotas zeradas ou sem valor nao tem retorno
+        mes_df = mes_df[mes_df["VL_QUOTA"] > 0.0]
+        mes_df = mes_df.assign(CNPJ_FUNDO=mes_df["CNPJ_FUNDO"].astype(object))
+        mes_df = mes_df.sort_values(["CNPJ_FUNDO", "DT_COMPTC"], kind="mergesort")
+        mes_df = mes_df.reset_index(drop=True)
+
+        cnpjs = mes_df["CNPJ_FUNDO"]
+        cota_anterior = mes_df.groupby("CNPJ_FUNDO")["VL_QUOTA"].shift(1)
+        # Base do indice: fechamento do mes anterior ou o primeiro dia do fundo
+        base = mes_df.groupby("CNPJ_FUNDO")["VL_QUOTA"].transform("first")
+        base_indice = pd.Series(1.0, index=mes_df.index)
+        if fechamento is not None and not fechamento.empty:
+            cota_fechamento = cnpjs.map(fechamento["VL_QUOTA"])
+            if contiguo:
+                cota_anterior = cota_anterior.fillna(cota_fechamento)
+            base = cota_fechamento.fillna(base)
+            base_indice = cnpjs.map(fechamento["INDICE"]).fillna(1.0)
+
+        retorno = mes_df["VL_QUOTA"] / cota_anterior - 1
+        return mes_df.assign(
+            RETORNO=retorno,
+            LOG_RETORNO=np.log1p(retorno),
+            INDICE=base_indice * mes_df["VL_QUOTA"] / base,
+        )
+
+    @staticmethod
+    def fechamento(mes_df, anterior=None):
+        """
+        Retorna a ultima cota e indice de cada fundo ate o fim do mes.
+
+        Parametros:
+            mes_df     (DataFrame): Mes da tabela
+            anterior   (DataFrame): Fechamento do mes anterior. Mantem os
+                                    fundos sem cota no mes
+
+        Return: DataFrame com as colunas VL_QUOTA e INDICE (index CNPJ_FUNDO)
+        """
+        fechamento = mes_df.groupby("CNPJ_FUNDO")[["VL_QUOTA", "INDICE"]].last()
+        if anterior is not None:
+            fechamento = fechamento.combine_first(anterior)
+        return fechamento
+
+    def le_mes(self, data, columns=None, cnpjs=None):
+        """
+        Le um mes da tabela.
+
+        Parametros:
+            data        (str): Mes (YYYYMM)
+            columns    (list): Colunas para carregar. Default todas
+            cnpjs      (list): Carrega apenas as linhas destes cnpjs.
+                               Default todos
+
+        Return: DataFrame (sem index)
+        """
+        filters = None if cnpjs is None else [("CNPJ_FUNDO", "in", list(cnpjs))]
+        return read_columnar(self.arquivo_mes(data), columns, filters)
+
+    def atualiza(self, filenames, informe=None):
+        """
+        Adiciona na tabela os informes novos ou modificados.
+
+        Os meses seguintes ao primeiro mes modificado sao recalculados a
+        partir das cotas ja guardadas na tabela, pois o indice eh acumulado.
+
+        Parametros:
+            filenames   (iter): Arquivos csv de informe
+            informe      (obj): Instancia da classe Informe usada para ler os csv
+
+        Return: Lista com as datas (YYYYMM) recalculadas
+        """
+        informe = informe or Informe()
+        create_dir(self.diretorio)
+        indice = self.carrega_indice()
+        arquivos = {Informe.data_informe(f): f for f in filenames}
+        checksums = {data: file_checksum(f) for data, f in arquivos.items()}
+        modificados = sorted(
+            data for data in arquivos if indice["meses"].get(data) != checksums[data]
+        )
+        if not modificados:
+            return []
+
+        with FileLock(self.lock_file):
+            # Le o indice novamente, outro processo pode ter atualizado a tabela
+            indice = self.carrega_indice()
+            modificados = sorted(
+                data
+                for data in arquivos
+                if indice["meses"].get(data) != checksums[data]
+            )
+            if not modificados:
+                return []
+
+            create_dir(os.path.join(self.diretorio, "fechamento"))
+            anteriores = sorted(d for d in indice["meses"] if d < modificados[0])
+            fechamento = None
+            data_anterior = anteriores[-1] if anteriores else None
+            if anteriores:
+                fechamento = read_columnar(
+                    self.arquivo_fechamento(anteriores[-1])
+                ).set_index("CNPJ_FUNDO")
+
+            recalculados = sorted(
+                d
+                for d in set(indice["meses"]) | set(modificados)
+                if d >= modificados[0]
+            )
+            colunas = ["CNPJ_FUNDO", "DT_COMPTC", "VL_QUOTA"]
+            for data in recalculados:
+                if data in modificados:
+                    log.debug("Calculando retornos do informe %s", arquivos[data])
+                    informe_mensal = informe.le_informe_mensal(
+                        arquivos[data], columns=colunas
+                    ).reset_index()
+                else:
+                    informe_mensal = self.le_mes(data, columns=colunas)
+                # Nao encadeia o retorno diario entre meses que nao sao seguidos
+                contiguo = data_anterior == self.mes_anterior(data)
+                if data_anterior is not None and not contiguo:
+                    log.debug("Mes %s sem o mes anterior na tabela", data)
+                mes_df = self.calcula_mes(informe_mensal, fechamento, contiguo)
+                fechamento = self.fechamento(mes_df, fechamento)
+                data_anterior = data
+                write_columnar(mes_df, self.arquivo_mes(data))
+                write_columnar(fechamento.reset_index(), self.arquivo_fechamento(data))
+
+            # O indice eh gravado apenas no final. Se a atualizacao for
+            # interrompida, todos os meses sao recalculados na proxima
+            indice["meses"].update((data, checksums[data]) for data in modificados)
+            write_json(self.indice_file, indice)
+
+        log.debug("Retornos recalculados: %s", recalculados)
+        return recalculados
+
+    def retornos(self, cnpjs, datas, columns=None):
+        """
+        Retorna os retornos diarios dos fundos.
+
+        Parametros:
+            cnpjs      (list): Cnpjs dos fundos. Se None, todos
+            datas      (list): Datas (YYYYMM) dos meses
+            columns    (list): Colunas para carregar. Default todas
+
+        Return: DataFrame com index CNPJ_FUNDO e DT_COMPTC
+        """
+        if columns:
+            columns = ["CNPJ_FUNDO", "DT_COMPTC"] + [
+                col for col in columns if col not in ("CNPJ_FUNDO", "DT_COMPTC")
+            ]
+        meses = self.carrega_indice()["meses"]
+        retornos = [
+            self.le_mes(data, columns, cnpjs) for data in sorted(datas) if data in meses
+        ]
+        if not retornos:
+            return pd.DataFrame(
+                columns=["RETORNO", "LOG_RETORNO", "INDICE"],
+                index=pd.MultiIndex.from_tuples([], names=["CNPJ_FUNDO", "DT_COMPTC"]),
+            )
+        return pd.concat(retornos).set_index(["CNPJ_FUNDO", "DT_COMPTC"]).sort_index()
+
+    def busca_indice(self, meses, cnpjs, posicao):
+        """
+        Busca o primeiro ou ultimo indice de cada fundo nos meses.
+
+        Os meses sao lidos em ordem ate encontrar todos os cnpjs. Normalmente
+        apenas um mes eh lido.
+
+        Parametros:
+            meses      (list): Datas (YYYYMM) em ordem de busca
+            cnpjs     (Index): Cnpjs dos fundos. Se None, todos os fundos do
+                               primeiro mes
+            posicao     (str): first ou last
+
+        Return: Series com o indice de cada fundo (index CNPJ_FUNDO)
+        """
+        encontrados = []
+        faltando = None if cnpjs is None else pd.Index(cnpjs).unique()
+        for data in meses:
+            mes_df = self.le_mes(data, ["CNPJ_FUNDO", "INDICE"], faltando)
+            mes_df["CNPJ_FUNDO"] = mes_df["CNPJ_FUNDO"].astype(object)
+            indice = mes_df.groupby("CNPJ_FUNDO")["INDICE"].agg(posicao)
+            encontrados.append(indice)
+            if faltando is None:
+                break
+            faltando = faltando.difference(indice.index)
+            if faltando.empty:
+                break
+        if not encontrados:
+            return pd.Series(dtype="float64", name="INDICE")
+        return pd.concat(encontrados)
+
+    def rentabilidade_periodo(self, cnpjs, datas):
+        """
+        Calcula a rentabilidade dos fundos no periodo.
+
+        A rentabilidade eh a razao entre o indice da ultima cota e o indice
+        da primeira cota de cada fundo nos meses.
+
+        Parametros:
+            cnpjs      (list): Cnpjs dos fundos. Se None, todos
+            datas      (list): Datas (YYYYMM) dos meses do periodo
+
+        Return: DataFrame com a coluna Rentabilidade (index CNPJ_FUNDO)
+        """
+        meses = sorted(d for d in datas if d in self.carrega_indice()["meses"])
+        inicio = self.busca_indice(meses, cnpjs, "first")
+        fim = self.busca_indice(meses[::-1], inicio.index, "last")
+        rent_s = (fim / inicio.reindex(fim.index) - 1) * 100
+        rent_s.index.name = "CNPJ_FUNDO"
+        return rent_s.sort_index().to_frame(name="Rentabilidade")
+
+
+class MatrizCotas:
+    """
+    Matrizes densas (datas x fundos) de cota e patrimonio liquido.
+
+    Cada mes eh guardado em arquivos .npy: uma matriz float64 por coluna
+    (NaN nos dias sem informe do fundo), o vetor de cnpjs (ordenado) e o
+    vetor de datas. Os arquivos sao abertos com memory map, entao
+    selecionar fundos le apenas as paginas necessarias e varios processos
+    compartilham as mesmas paginas do cache do sistema operacional.
+
+    O nome dos arquivos tem o checksum do informe, assim um leitor nunca
+    mistura versoes diferentes de um mes. O indice (indice.json) guarda o
+    checksum de cada mes.
+    """
+
+    colunas = ["VL_QUOTA", "VL_PATRIM_LIQ"]
+    versao_schema = 1
+
+    def __init__(self, diretorio=None):
+        """
+        Initialize MatrizCotas class.
+
+        Parametros:
+            diretorio   (str): Diretorio das matrizes.
+                               Default CSV_FILES_DIR/matriz
+        """
+        self.diretorio = diretorio or os.path.join(CSV_FILES_DIR, "matriz")
+        self.indice_file = os.path.join(self.diretorio, "indice.json")
+        self.lock_file = lock_file_name(self.indice_file)
+
+    def arquivo(self, data, checksum, nome):
+        """Retorna o arquivo de uma matriz ou vetor (nome) do mes data (YYYYMM)."""
+        return os.path.join(
+            self.diretorio, "{}.{}.{}.npy".format(data, checksum[:16], nome)
+        )
+
+    def carrega_indice(self):
+        """Retorna o indice das matrizes."""
+        versao = [Informe.versao_schema, self.versao_schema]
+        indice = read_json(self.indice_file)
+        if indice.get("versao_schema") != versao:
+            return {"versao_schema": versao, "meses": {}}
+        return indice
+
+    @classmethod
+    def calcula_mes(cls, informe_mensal):
+        """
+        Cria as matrizes de um mes.
+
+        Parametro: DataFrame com as colunas CNPJ_FUNDO, DT_COMPTC e as
+                   colunas de MatrizCotas.colunas
+
+        Return: dict com os vetores cnpjs e datas e uma matriz por coluna
+        """
+        cnpjs, fundo = np.unique(
+            informe_mensal["CNPJ_FUNDO"].to_numpy(str), return_inverse=True
+        )
+        datas, dia = np.unique(
+            informe_mensal["DT_COMPTC"].to_numpy("datetime64[D]"), return_inverse=True
+        )
+        mes = {"cnpjs": cnpjs, "datas": datas}
+        for coluna in cls.colunas:
+            matriz = np.full((len(datas), len(cnpjs)), np.nan)
+            matriz[dia, fundo] = informe_mensal[coluna].to_numpy("float64")
+            mes[coluna] = matriz
+        return mes
+
+    def grava_mes(self, data, checksum, mes):
+        """Grava as matrizes e vetores de um mes e remove as versoes antigas."""
+        for nome, valores in mes.items():
+            arquivo = self.arquivo(data, checksum, nome)
+            tmp_file = "{}.{}.tmp".format(arquivo, os.getpid())
+            with open(tmp_file, "wb") as fd:
+                np.save(fd, valores)
+            os.replace(tmp_file, arquivo)
+
+    def remove_versoes(self, data, checksum):
+        """Remove os arquivos do mes criados a partir de outros checksums."""
+        atual = "{}.{}.".format(data, checksum[:16])
+        padrao = os.path.join(glob.escape(self.diretorio), "{}.*.npy".format(data))
+        for arquivo in glob.glob(padrao):
+            if not os.path.basename(arquivo).startswith(atual):
+                log.debug("Removendo matriz antiga: %s", arquivo)
+                os.remove(arquivo)
+
+    def atualiza(self, filenames, informe=None):
+        """
+        Cria as matrizes dos informes novos ou modificados.
+
+        Parametros:
+            filenames   (iter): Arquivos csv de informe
+            informe      (obj): Instancia da classe Informe usada para ler os csv
+
+        Return: Lista com as datas (YYYYMM) criadas
+        """
+        informe = informe or Informe()
+        create_dir(self.diretorio)
+        arquivos = {Informe.data_informe(f): f for f in filenames}
+        checksums = {data: file_checksum(f) for data, f in arquivos.items()}
+        indice = self.carrega_indice()
+        if all(indice["meses"].get(d) == c for d, c in checksums.items()):
+            return []
+
+        criados = []
+        with FileLock(self.lock_file):
+            # Le o indice novamente, outro processo pode ter criado os meses
+            indice = self.carrega_indice()
+            for data in sorted(arquivos):
+                if indice["meses"].get(data) == checksums[data]:
+                    continue
+                log.debug("Criando matrizes do informe %s", arquivos[data])
+                informe_mensal = informe.le_informe_mensal(
+                    arquivos[data], columns=["CNPJ_FUNDO", "DT_COMPTC"] + self.colunas
+                ).reset_index()
+                self.grava_mes(data, checksums[data], self.calcula_mes(informe_mensal))
+                indice["meses"][data] = checksums[data]
+                write_json(self.indice_file, indice)
+                self.remove_versoes(data, checksums[data])
+                criados.append(data)
+
+        log.debug("Matrizes criadas: %s", criados)
+        return criados
+
+    def completo(self, filenames):
+        """Retorna True se as matrizes de todos os informes ja foram criadas."""
+        meses = self.carrega_indice()["meses"]
+        return all(
+            meses.get(Informe.data_informe(f)) == file_checksum(f) for f in filenames
+        )
+
+    def carrega_mes(self, data, checksum):
+        """
+        Abre as matrizes e vetores de um mes com memory map.
+
+        Return: dict com os vetores cnpjs e datas e uma matriz (np.memmap)
+                por coluna
+        """
+        return {
+            nome: np.load(self.arquivo(data, checksum, nome), mmap_mode="r")
+            for nome in ["cnpjs", "datas"] + self.colunas
         }
 
-        log.debug("calc: %s", calc)
-        return calc
+    @staticmethod
+    def dataframe(valores, datas, cnpjs):
+        """Retorna a matriz como DataFrame (index DT_COMPTC, colunas CNPJ_FUNDO)."""
+        return pd.DataFrame(
+            valores,
+            index=pd.DatetimeIndex(datas.astype("datetime64[ns]"), name="DT_COMPTC"),
+            columns=pd.Index(cnpjs.astype(object), name="CNPJ_FUNDO"),
+            copy=False,
+        )
+
+    def matriz(self, coluna, datas, cnpjs=None):
+        """
+        Retorna a matriz de uma coluna nos meses.
+
+        A matriz de um unico mes, sem selecao de fundos, eh usada direto do
+        arquivo (sem copia). Nos demais casos apenas as colunas dos fundos
+        selecionados sao lidas e copiadas.
+
+        Parametros:
+            coluna      (str): Coluna (MatrizCotas.colunas)
+            datas      (list): Datas (YYYYMM) dos meses
+            cnpjs      (list): Cnpjs dos fundos. Default todos
+
+        Return: DataFrame com index DT_COMPTC e uma coluna por CNPJ_FUNDO
+                (ordenadas)
+        """
+        for tentativa in range(2):
+            indice = self.carrega_indice()
+            try:
+                meses = [
+                    self.carrega_mes(data, indice["meses"][data])
+                    for data in sorted(set(datas))
+                    if data in indice["meses"]
+                ]
+                break
+            except FileNotFoundError:
+                # Outro processo gravou uma nova versao do mes. Le o indice de novo
+                if tentativa:
+                    raise
+        if not meses:
+            return self.dataframe(
+                np.empty((0, 0)), np.array([], "datetime64[D]"), np.array([], str)
+            )
+        if cnpjs is None:
+            if len(meses) == 1:
+                return self.dataframe(
+                    meses[0][coluna], meses[0]["datas"], meses[0]["cnpjs"]
+                )
+            cnpjs = np.unique(np.concatenate([mes["cnpjs"] for mes in meses]))
+        else:
+            cnpjs = np.unique(np.asarray(list(cnpjs), dtype=str))
+
+        valores = np.full((sum(len(mes["datas"]) for mes in meses), len(cnpjs)), np.nan)
+        inicio = 0
+        for mes in meses:
+            fim = inicio + len(mes["datas"])
+            if len(mes["cnpjs"]):
+                posicao = np.searchsorted(mes["cnpjs"], cnpjs)
+                posicao[posicao == len(mes["cnpjs"])] = 0
+                encontrado = mes["cnpjs"][posicao] == cnpjs
+                valores[inicio:fim, encontrado] = mes[coluna][:, posicao[encontrado]]
+            inicio = fim
+        return self.dataframe(
+            valores, np.concatenate([mes["datas"] for mes in meses]), cnpjs
+        )
+
+    @staticmethod
+    def de_informe(informe_df, coluna):
+        """
+        Cria a matriz de uma coluna a partir de um DataFrame de informe.
+
+        Parametros:
+            informe_df (DataFrame): Informe com index CNPJ_FUNDO e DT_COMPTC
+                                    (ex: Informe.pd_df)
+            coluna           (str): Coluna do informe
+
+        Return: DataFrame com index DT_COMPTC e uma coluna por CNPJ_FUNDO
+        """
+        return (
+            informe_df[coluna]
+            .groupby(level=["DT_COMPTC", "CNPJ_FUNDO"])
+            .last()
+            .unstack("CNPJ_FUNDO")
+            .astype("float64")
+        )
+
+    @staticmethod
+    def ultimo_valor(matriz):
+        """
+        Retorna o ultimo valor (nao NaN) de cada fundo.
+
+        Parametro: DataFrame com index de datas e uma coluna por fundo
+
+        Return: Series com index CNPJ_FUNDO
+        """
+        valores = matriz.to_numpy()
+        valido = ~np.isnan(valores)
+        linha = len(valores) - 1 - np.argmax(valido[::-1], axis=0)
+        ultimo = valores[linha, np.arange(valores.shape[1])] if len(valores) else linha
+        return pd.Series(
+            np.where(valido.any(axis=0), ultimo, np.nan), index=matriz.columns
+        )
+
+
+class CacheDados:
+    """
+    Uso de disco do diretorio de dados (CSV_FILES_DIR).
+
+    Cada informe baixado da CVM e os arquivos derivados dele (cache colunar,
+    particoes por cnpj, tabela de retornos e matrizes de cotas) formam um item do cache,
+    identificado pelo mes (YYYYMM). O item de um informe anual (YYYY) inclui
+    os derivados dos meses lidos dele. O ultimo acesso de um item eh o
+    atime do informe, atualizado sempre que o mes eh selecionado por um
+    comando (ver Informe.download_informes_mensais).
+
+    Para manter o diretorio abaixo de um limite de tamanho, primeiro os
+    informes csv de meses passados (imutaveis) sao compactados em zip e
+    depois os itens usados ha mais tempo sao removidos (LRU). O cadastro
+    nunca eh removido.
+    """
+
+    # Padroes (caminho relativo ao diretorio) dos arquivos de cada item
+    padroes = [
+        (
+            re.compile(r"inf_diario_fi_(\d{6}|\d{4})\.(csv|zip)(\.part)?(\.meta)?$"),
+            "informe",
+        ),
+        (re.compile(r"(cad_fi)\.csv(\.part)?(\.meta)?$"), "informe"),
+        (re.compile(r"cache/inf_diario_fi_(\d{6})\."), "derivado"),
+        (re.compile(r"cache/(cad_fi)_"), "derivado"),
+        (re.compile(r"por_cnpj/\d+/(\d{6})\."), "derivado"),
+        (re.compile(r"retornos/(?:fechamento/)?(\d{6})\."), "derivado"),
+        (re.compile(r"matriz/(\d{6})\."), "derivado"),
+    ]
+    colunas = ["Informe", "Derivados", "Ultimo acesso", "Imutavel", "Compactado"]
+
+    def __init__(self, diretorio=None):
+        """
+        Initialize CacheDados class.
+
+        Parametros:
+            diretorio   (str): Diretorio de dados. Default CSV_FILES_DIR
+        """
+        self.diretorio = diretorio or CSV_FILES_DIR
+
+    @staticmethod
+    def chave(file_mes):
+        """Retorna o item do cache do arquivo de informe (ver Informe.filenames)."""
+        arquivo = split_archive_member(file_mes)[0]
+        return re.search(r"(\d{6}|\d{4})\.", os.path.basename(arquivo)).group(1)
+
+    def arquivos(self):
+        """
+        Retorna os arquivos de cada item do cache.
+
+        Return: Dicionario {item: {"informe": [arquivos], "derivado": [arquivos]}}
+        """
+        itens = {}
+        for raiz, _, nomes in os.walk(self.diretorio):
+            for nome in nomes:
+                caminho = os.path.join(raiz, nome)
+                relativo = os.path.relpath(caminho, self.diretorio).replace(os.sep, "/")
+                for padrao, tipo in self.padroes:
+                    encontrado = padrao.match(relativo)
+                    if encontrado:
+                        chave = encontrado.group(1).replace("cad_fi", "cadastral")
+                        item = itens.setdefault(chave, {"informe": [], "derivado": []})
+                        item[tipo].append(caminho)
+                        break
+
+        # Derivados dos meses lidos do informe anual
+        for chave in [c for c in itens if len(c) == 6 and c.isdigit()]:
+            if not itens[chave]["informe"] and itens.get(chave[:4], {}).get("informe"):
+                itens[chave[:4]]["derivado"] += itens.pop(chave)["derivado"]
+        return itens
+
+    @staticmethod
+    def arquivos_informe(arquivos):
+        """Retorna os arquivos de informe do item, sem metadados e downloads parciais."""
+        return [a for a in arquivos["informe"] if a.endswith((".csv", ".zip"))]
+
+    def itens(self):
+        """
+        Retorna tamanho e ultimo acesso de cada item do cache.
+
+        Return: DataFrame com index Item e colunas Informe e Derivados (bytes),
+                Ultimo acesso, Imutavel e Compactado
+        """
+        linhas = {}
+        for chave, arquivos in self.arquivos().items():
+            informes = self.arquivos_informe(arquivos)
+            acessos = [
+                os.stat(arquivo).st_atime
+                for arquivo in informes or arquivos["informe"] + arquivos["derivado"]
+            ]
+            linhas[chave] = [
+                sum(os.path.getsize(arquivo) for arquivo in arquivos["informe"]),
+                sum(os.path.getsize(arquivo) for arquivo in arquivos["derivado"]),
+                datetime.datetime.fromtimestamp(max(acessos)),
+                any(is_file_immutable(arquivo) for arquivo in informes),
+                bool(informes)
+                and all(arquivo.endswith(".zip") for arquivo in informes),
+            ]
+        itens = pd.DataFrame.from_dict(linhas, orient="index", columns=self.colunas)
+        itens.index.name = "Item"
+        return itens.sort_index()
+
+    def compacta(self, chave):
+        """
+        Compacta em zip o informe csv de um mes.
+
+        O cache colunar do mes continua valido, pois o checksum do csv eh
+        mantido no arquivo compactado (ver fundosbrlib.compress_file).
+
+        Parametros:
+            chave       (str): Item do cache (YYYYMM)
+
+        Return: Bytes liberados
+        """
+        csv_file = os.path.join(self.diretorio, "inf_diario_fi_{}.csv".format(chave))
+        zip_file = "{}.zip".format(os.path.splitext(csv_file)[0])
+        with FileLock(lock_file_name(csv_file)):
+            if not os.path.exists(csv_file) or os.path.exists(zip_file):
+                return 0
+            tamanho = os.path.getsize(csv_file)
+            log.debug("Compactando informe %s", csv_file)
+            tamanho -= compress_file(csv_file, zip_file)
+
+        cache_dir = os.path.join(self.diretorio, "cache")
+        padrao = os.path.join(glob.escape(cache_dir), os.path.basename(csv_file) + ".*")
+        for cache_file in glob.glob(padrao):
+            os.replace(cache_file, cache_file.replace(".csv.", ".zip.", 1))
+        return tamanho
+
+    def remove(self, chave):
+        """
+        Remove os arquivos de um item do cache.
+
+        Os meses do item tambem sao removidos dos indices do armazenamento
+        por cnpj, da tabela de retornos e das matrizes de cotas. Se forem usados novamente, sao
+        baixados e processados de novo.
+
+        Parametros:
+            chave       (str): Item do cache (YYYYMM ou YYYY)
+
+        Return: Bytes liberados
+        """
+        if len(chave) == 4:
+            meses = {"{}{:02d}".format(chave, mes) for mes in range(1, 13)}
+        else:
+            meses = {chave}
+        for armazem in [
+            ArmazemCnpj(os.path.join(self.diretorio, "por_cnpj")),
+            TabelaRetornos(os.path.join(self.diretorio, "retornos")),
+            MatrizCotas(os.path.join(self.diretorio, "matriz")),
+        ]:
+            if not os.path.exists(armazem.indice_file):
+                continue
+            with FileLock(armazem.lock_file):
+                indice = read_json(armazem.indice_file)
+                if meses & set(indice.get("meses", {})):
+                    for mes in meses:
+                        indice["meses"].pop(mes, None)
+                    write_json(armazem.indice_file, indice)
+
+        arquivos = self.arquivos().get(chave, {"informe": [], "derivado": []})
+        liberado = 0
+        for arquivo in arquivos["informe"] + arquivos["derivado"]:
+            log.debug("Removendo arquivo do cache: %s", arquivo)
+            liberado += os.path.getsize(arquivo)
+            os.remove(arquivo)
+        return liberado
+
+    def aplica_limite(self, limite, protegidos=()):
+        """
+        Mantem o tamanho do diretorio de dados abaixo de um limite.
+
+        Os itens sao processados do acesso mais antigo para o mais recente.
+        Primeiro compacta os informes csv imutaveis e, se nao for
+        suficiente, remove itens. Os meses selecionados por um comando tem
+        o acesso atualizado, entao sao os ultimos a serem removidos, mesmo
+        por outro processo.
+
+        Parametros:
+            limite      (int): Tamanho maximo (bytes)
+            protegidos (iter): Itens que nao devem ser removidos
+
+        Return: Lista de tuplas (acao, item, bytes liberados)
+        """
+        itens = self.itens()
+        total = int(itens[["Informe", "Derivados"]].to_numpy().sum())
+        acoes = []
+        if total <= limite:
+            return acoes
+
+        candidatos = itens.drop(
+            index=["cadastral", *protegidos], errors="ignore"
+        ).sort_values("Ultimo acesso", kind="mergesort")
+        compactaveis = candidatos[candidatos["Imutavel"] & ~candidatos["Compactado"]]
+        for chave in compactaveis.index:
+            liberado = self.compacta(chave)
+            if liberado:
+                acoes.append(("compactado", chave, liberado))
+                total -= liberado
+                if total <= limite:
+                    return acoes
+
+        for chave in candidatos.index:
+            liberado = self.remove(chave)
+            acoes.append(("removido", chave, liberado))
+            total -= liberado
+            if total <= limite:
+                break
+        return acoes
+
+    def aquece(self, datas):
+        """
+        Baixa e prepara os informes dos meses para consultas rapidas.
+
+        Cria o cache colunar de cada mes, as particoes por cnpj, a tabela de
+        retornos, as matrizes de cotas e os caches do cadastro.
+
+        Parametros:
+            datas      (list): Datas (YYYYMM) dos meses
+
+        Return: Lista com os arquivos de informe preparados
+        """
+        inf_cadastral = Cadastral()
+        inf_cadastral.cria_df_cadastral_unico()
+        inf_cadastral.cria_indice_nomes()
+
+        informe = Informe()
+        informe.download_informes_mensais(datas)
+        for file_mes in sorted(informe.filenames):
+            log.debug("Preparando informe %s", file_mes)
+            informe.le_informe_mensal(file_mes, columns=["VL_QUOTA"])
+        ArmazemCnpj().atualiza(informe.filenames, informe)
+        TabelaRetornos().atualiza(informe.filenames, informe)
+        MatrizCotas().atualiza(informe.filenames, informe)
+        return sorted(informe.filenames)
+
+
+class MetricasRisco:
+    """
+    Calcula metricas de risco de muitos fundos de uma vez.
+
+    As cotas ficam em uma matriz (datas x fundos) e cada metrica eh
+    calculada com operacoes do numpy sobre todas as colunas, sem loop por
+    fundo. Dias sem cota de um fundo ficam como NaN e sao ignorados; o
+    retorno do dia seguinte eh calculado sobre a ultima cota conhecida.
+    """
+
+    # Metricas calculadas e coluna de cada uma no DataFrame de resultado
+    colunas = {
+        "rentabilidade": "Rentabilidade",
+        "volatilidade": "Volatilidade",
+        "drawdown": "Max drawdown",
+        "duracao_drawdown": "Duracao drawdown",
+        "sharpe": "Sharpe",
+        "sortino": "Sortino",
+        "beta": "Beta",
+    }
+
+    def __init__(self, cotas):
+        """
+        Initialize metricas de risco class.
+
+        Parametros:
+            cotas (DataFrame): Cotas dos fundos. Index com as datas e uma
+                               coluna por cnpj. Cotas zeradas sao ignoradas
+        """
+        cotas = cotas.sort_index().astype("float64")
+        self.cotas = cotas.where(cotas > 0.0)
+
+    @classmethod
+    def de_informe(cls, informe_df):
+        """
+        Cria a matriz de cotas a partir de um DataFrame de informe.
+
+        Parametro: DataFrame com a coluna VL_QUOTA e index CNPJ_FUNDO e
+                   DT_COMPTC (ex: Informe.pd_df)
+
+        Return: Instancia da classe MetricasRisco
+        """
+        cotas = (
+            informe_df["VL_QUOTA"]
+            .groupby(level=["DT_COMPTC", "CNPJ_FUNDO"])
+            .last()
+            .unstack("CNPJ_FUNDO")
+        )
+        return cls(cotas)
+
+    def retornos(self):
+        """
+        Calcula a matriz de retornos diarios.
+
+        Return: numpy array (datas x fundos). NaN nos dias sem cota
+        """
+        valores = self.cotas.to_numpy()
+        anterior = np.empty_like(valores)
+        anterior[0] = np.nan
+        anterior[1:] = self.cotas.ffill().to_numpy()[:-1]
+        return valores / anterior - 1
+
+    def taxa_por_data(self, taxa_diaria):
+        """
+        Retorna a taxa do benchmark de cada data como vetor coluna.
+
+        Parametro: taxa_diaria (float ou Series): Taxa diaria (fracao). Uma
+                   Series (index data) permite usar a taxa de cada dia,
+                   ex: CDI diario
+
+        Return: numpy array (datas x 1)
+        """
+        if isinstance(taxa_diaria, pd.Series):
+            taxa = taxa_diaria.sort_index().reindex(self.cotas.index, method="ffill")
+            return taxa.fillna(0.0).to_numpy(dtype="float64")[:, np.newaxis]
+        return np.full((len(self.cotas.index), 1), float(taxa_diaria))
+
+    def drawdown(self):
+        """
+        Calcula o maior drawdown e sua duracao de cada fundo.
+
+        A duracao eh o maior periodo, em dias corridos, entre um pico da cota
+        e o ultimo dia abaixo dele (ou a ultima data, se nao recuperou).
+
+        Return: tuple com dois numpy arrays (drawdown em fracao, duracao)
+        """
+        cotas = self.cotas.ffill().to_numpy()
+        pico = np.fmax.accumulate(cotas, axis=0)
+        queda = cotas / pico - 1
+        abaixo = queda < 0.0
+
+        # Linha do ultimo pico de cada dia: os dias abaixo do pico herdam a
+        # linha anterior no maximo acumulado
+        linhas = np.arange(len(cotas))[:, np.newaxis]
+        ultimo_pico = np.maximum.accumulate(np.where(abaixo, 0, linhas), axis=0)
+        datas = self.cotas.index.to_numpy(dtype="datetime64[D]")
+        dias = (datas[:, np.newaxis] - datas[ultimo_pico]).astype("int64")
+        duracao = np.where(abaixo, dias, 0).max(axis=0, initial=0)
+        # np.nanmin so aceita initial no numpy >= 1.22
+        drawdown = np.where(np.isnan(queda), 0.0, queda).min(axis=0, initial=0.0)
+        return drawdown, duracao
+
+    def beta(self, retornos, referencia):
+        """
+        Calcula o beta de cada fundo em relacao a um fundo de referencia.
+
+        Apenas os dias com retorno do fundo e da referencia sao usados.
+
+        Parametros:
+            retornos   (array): Matriz de retornos diarios (datas x fundos)
+            referencia   (str): Cnpj do fundo de referencia
+
+        Return: numpy array com o beta de cada fundo
+        """
+        if referencia not in self.cotas.columns:
+            raise KeyError(referencia)
+        ref = retornos[:, [self.cotas.columns.get_loc(referencia)]]
+        pares = ~np.isnan(retornos) & ~np.isnan(ref)
+        fundo = np.where(pares, retornos, np.nan)
+        ref = np.where(pares, ref, np.nan)
+        fundo = fundo - np.nanmean(fundo, axis=0)
+        ref = ref - np.nanmean(ref, axis=0)
+        return np.nanmean(fundo * ref, axis=0) / np.nanmean(ref * ref, axis=0)
+
+    def calcula(self, taxa_diaria=TAXA_DIARIA_BENCHMARK, referencia=None):
+        """
+        Calcula as metricas de risco de todos os fundos.
+
+        Parametros:
+            taxa_diaria (float ou Series): Taxa diaria (fracao) do benchmark
+                                           usado no Sharpe e Sortino
+            referencia             (str): Cnpj do fundo de referencia para o
+                                          beta. Se None, beta nao eh calculado
+
+        Return: DataFrame com as colunas de MetricasRisco.colunas (index
+                CNPJ_FUNDO). Rentabilidade, volatilidade e drawdown em %
+                e duracao do drawdown em dias. Sem cotas, todas as metricas
+                ficam com NaN
+        """
+        if self.cotas.empty:
+            return pd.DataFrame(
+                np.nan,
+                index=pd.Index(self.cotas.columns, name="CNPJ_FUNDO"),
+                columns=[
+                    coluna
+                    for nome, coluna in self.colunas.items()
+                    if nome != "beta" or referencia is not None
+                ],
+            ).sort_index()
+
+        anual = np.sqrt(DIAS_UTEIS_ANO)
+        retornos = self.retornos()
+        excesso = retornos - self.taxa_por_data(taxa_diaria)
+        negativo = np.where(excesso < 0.0, excesso, 0.0)
+        negativo[np.isnan(excesso)] = np.nan
+        drawdown, duracao = self.drawdown()
+        sem_cota = self.cotas.isna().all().to_numpy()
+
+        # Fundos sem retornos suficientes ficam com NaN
+        with warnings.catch_warnings(), np.errstate(divide="ignore", invalid="ignore"):
+            warnings.simplefilter("ignore", RuntimeWarning)
+            media = np.nanmean(excesso, axis=0)
+            desvio = np.nanstd(excesso, axis=0, ddof=1)
+            risco_queda = np.sqrt(np.nanmean(negativo * negativo, axis=0))
+            metricas = {
+                "rentabilidade": (
+                    self.cotas.ffill().iloc[-1] / self.cotas.bfill().iloc[0] - 1
+                ).to_numpy()
+                * 100,
+                "volatilidade": np.nanstd(retornos, axis=0, ddof=1) * anual * 100,
+                "drawdown": np.where(sem_cota, np.nan, drawdown * 100),
+                "duracao_drawdown": np.where(sem_cota, np.nan, duracao),
+                "sharpe": np.where(desvio > 0.0, media / desvio * anual, np.nan),
+                "sortino": np.where(
+                    risco_queda > 0.0, media / risco_queda * anual, np.nan
+                ),
+            }
+            if referencia is not None:
+                metricas["beta"] = self.beta(retornos, referencia)
+
+        risco_df = pd.DataFrame(
+            {self.colunas[nome]: valores for nome, valores in metricas.items()},
+            index=pd.Index(self.cotas.columns, name="CNPJ_FUNDO"),
+        )
+        return risco_df.sort_index()
+
+
+class JanelasMoveis:
+    """
+    Calcula retorno, volatilidade e captacao liquida em janelas moveis.
+
+    As janelas sao contadas em dias uteis (datas dos informes). Uma janela
+    so tem valor quando o fundo tem dados em todos os dias dela.
+
+    O calculo completo (calcula) usa rolling sobre as matrizes datas x
+    fundos. A versao incremental (atualiza) guarda as ultimas cotas e as
+    somas de cada janela e atualiza apenas com os dias novos, sem recalcular
+    o historico. Uma nova versao do ultimo mes eh refeita a partir do
+    primeiro dia do mes, desde que os dias anteriores ainda estejam no
+    buffer (JanelasMoveis.dias_revisao).
+    """
+
+    # Tamanho das janelas em dias uteis (1, 3 e 12 meses)
+    janelas = (21, 63, 252)
+
+    # Dias extras no buffer para refazer os dias de um mes revisado
+    dias_revisao = 31
+
+    def __init__(self, janelas=None):
+        """
+        Initialize janelas moveis class (versao incremental).
+
+        Parametros:
+            janelas  (list): Tamanho das janelas. Default JanelasMoveis.janelas
+        """
+        self.janelas = tuple(sorted(janelas or JanelasMoveis.janelas))
+        # Buffer circular com as ultimas linhas (dias) de cada matriz
+        self.tamanho = self.janelas[-1] + 1 + self.dias_revisao
+        self.cnpjs = pd.Index([], dtype=object, name="CNPJ_FUNDO")
+        self.ultima_data = None
+        self.linhas = 0
+        self.datas = [None] * self.tamanho
+        self.buffer = {
+            nome: np.full((self.tamanho, 0), np.nan)
+            for nome in ["cota", "retorno", "captacao"]
+        }
+        # Somas de cada janela (uma linha por janela)
+        self.somas = {
+            nome: np.zeros((len(self.janelas), 0))
+            for nome in ["retorno", "retorno2", "n_retorno", "captacao", "n_captacao"]
+        }
+
+    @staticmethod
+    def matrizes(informe_df):
+        """
+        Retorna as matrizes de cota e captacao liquida (datas x fundos).
+
+        Parametro: DataFrame com as colunas VL_QUOTA, CAPTC_DIA e RESG_DIA e
+                   index CNPJ_FUNDO e DT_COMPTC (ex: Informe.pd_df)
+
+        Return: tuple com dois DataFrames (cotas, captacao liquida)
+        """
+        dados_df = (
+            informe_df[["VL_QUOTA", "CAPTC_DIA", "RESG_DIA"]]
+            .groupby(level=["DT_COMPTC", "CNPJ_FUNDO"])
+            .last()
+        )
+        cotas = dados_df["VL_QUOTA"].unstack("CNPJ_FUNDO")
+        captacao = (dados_df["CAPTC_DIA"] - dados_df["RESG_DIA"]).unstack("CNPJ_FUNDO")
+        return cotas.where(cotas > 0.0), captacao
+
+    @staticmethod
+    def nomes_colunas(janela):
+        """Retorna o nome das colunas de retorno, volatilidade e captacao."""
+        return [
+            "Retorno {}d".format(janela),
+            "Volatilidade {}d".format(janela),
+            "Captacao {}d".format(janela),
+        ]
+
+    @classmethod
+    def calcula(cls, cotas, captacao, janelas=None):
+        """
+        Calcula as janelas moveis de todas as datas.
+
+        Parametros:
+            cotas     (DataFrame): Matriz de cotas (datas x fundos)
+            captacao  (DataFrame): Matriz de captacao liquida (datas x fundos)
+            janelas        (list): Tamanho das janelas. Default
+                                   JanelasMoveis.janelas
+
+        Return: dict {coluna: DataFrame datas x fundos}. Retorno e
+                volatilidade anualizada em %
+        """
+        retornos = cotas / cotas.shift(1) - 1
+        matrizes = {}
+        for janela in sorted(janelas or cls.janelas):
+            retorno, volatilidade, capt = cls.nomes_colunas(janela)
+            matrizes[retorno] = (cotas / cotas.shift(janela) - 1) * 100
+            matrizes[volatilidade] = (
+                retornos.rolling(janela, min_periods=janela).std()
+                * np.sqrt(DIAS_UTEIS_ANO)
+                * 100
+            )
+            matrizes[capt] = captacao.rolling(janela, min_periods=janela).sum()
+        return matrizes
+
+    def adiciona_fundos(self, cnpjs):
+        """Adiciona colunas no estado para os cnpjs ainda nao vistos."""
+        novos = pd.Index(cnpjs).difference(self.cnpjs)
+        if novos.empty:
+            return
+        self.cnpjs = self.cnpjs.append(novos)
+        for nome, valores in self.buffer.items():
+            vazio = np.full((self.tamanho, len(novos)), np.nan)
+            self.buffer[nome] = np.hstack([valores, vazio])
+        for nome, valores in self.somas.items():
+            vazio = np.zeros((len(self.janelas), len(novos)))
+            self.somas[nome] = np.hstack([valores, vazio])
+
+    def linha(self, valores_s):
+        """Retorna os valores da Series (index cnpj) na ordem de self.cnpjs."""
+        linha = np.full(len(self.cnpjs), np.nan)
+        linha[self.cnpjs.get_indexer(valores_s.index)] = valores_s.to_numpy()
+        return linha
+
+    def soma(self, janela, nome, valores, sinal):
+        """Soma (sinal 1) ou subtrai (sinal -1) os valores da janela."""
+        validos = ~np.isnan(valores)
+        valores = np.where(validos, valores, 0.0)
+        self.somas[nome][janela] += sinal * valores
+        self.somas["n_" + nome][janela] += sinal * validos
+        if nome == "retorno":
+            self.somas["retorno2"][janela] += sinal * valores * valores
+
+    def adiciona_dia(self, data, cotas_s, captacao_s):
+        """
+        Atualiza as janelas com um dia novo.
+
+        Parametros:
+            data         (Timestamp): Data do dia
+            cotas_s         (Series): Cota de cada fundo (index cnpj)
+            captacao_s      (Series): Captacao liquida de cada fundo
+        """
+        self.adiciona_fundos(cotas_s.index.union(captacao_s.index))
+        cota = self.linha(cotas_s)
+        cota[cota <= 0.0] = np.nan
+        captacao = self.linha(captacao_s)
+        anterior = self.buffer["cota"][(self.linhas - 1) % self.tamanho]
+        retorno = cota / anterior - 1
+
+        for posicao, janela in enumerate(self.janelas):
+            saida = self.linhas - janela
+            if saida >= 0:
+                saida %= self.tamanho
+                self.soma(posicao, "retorno", self.buffer["retorno"][saida], -1)
+                self.soma(posicao, "captacao", self.buffer["captacao"][saida], -1)
+            self.soma(posicao, "retorno", retorno, 1)
+            self.soma(posicao, "captacao", captacao, 1)
+
+        atual = self.linhas % self.tamanho
+        self.buffer["cota"][atual] = cota
+        self.buffer["retorno"][atual] = retorno
+        self.buffer["captacao"][atual] = captacao
+        self.datas[atual] = data
+        self.linhas += 1
+        self.ultima_data = data
+
+    def recalcula_somas(self):
+        """Recalcula as somas de cada janela com as linhas do buffer."""
+        for valores in self.somas.values():
+            valores[:] = 0.0
+        for posicao, janela in enumerate(self.janelas):
+            for linha in range(max(0, self.linhas - janela), self.linhas):
+                linha %= self.tamanho
+                self.soma(posicao, "retorno", self.buffer["retorno"][linha], 1)
+                self.soma(posicao, "captacao", self.buffer["captacao"][linha], 1)
+
+    def volta(self, data):
+        """
+        Remove do estado os dias a partir de data.
+
+        Parametro: data (Timestamp): Primeiro dia removido
 
-    def calc_estatistica_mensal(self):
+        Raise ValueError se os dias anteriores a data ja sairam do buffer
         """
-        Mostra estatistica mensal do fundo.
+        linhas = self.linhas
+        while linhas > 0 and self.datas[(linhas - 1) % self.tamanho] >= data:
+            linhas -= 1
+            if self.linhas - linhas > self.dias_revisao:
+                raise ValueError(
+                    "Dias anteriores a {} fora do buffer das janelas".format(data)
+                )
+        if linhas == self.linhas:
+            return
+        self.linhas = linhas
+        self.ultima_data = self.datas[(linhas - 1) % self.tamanho] if linhas else None
+        self.recalcula_somas()
 
-        Return:  DataFrame como string
+    def atualiza(self, informe_df, revisao=False):
         """
-        fundo_df = self.remove_index_cnpj()
-
-        fundo_df.index.names = ["Data"]
-        fundo_df.sort_index(inplace=True)
+        Atualiza as janelas com os dias novos de um informe.
 
-        gp = fundo_df.groupby(
-            [fundo_df.index.year.rename("ano"), fundo_df.index.month.rename("mes")]
-        )
+        Apenas os dias posteriores ao ultimo dia ja processado sao usados.
+        Com revisao, os dias a partir do primeiro dia do informe sao
+        removidos e calculados novamente.
 
-        # Calcula rentabilidade da cota e entre o ultimo dia de cada mes, ie
-        # final do mes com o final do mes anterior
-        cota_s = gp["VL_QUOTA"].last().pct_change().dropna() * 100
-        dif_cotista_s = gp["NR_COTST"].last().diff().dropna()
-        # Para fazer o calculo entre o primeiro e o ultimo dia de cada mes
-        # cota_s = ((gp["VL_QUOTA"].last() /  gp["VL_QUOTA"].first()) - 1) * 100
-        # dif_cotista_s = gp["NR_COTST"].last() - gp["NR_COTST"].first()
+        Parametros:
+            informe_df (DataFrame): Colunas VL_QUOTA, CAPTC_DIA e RESG_DIA e
+                                    index CNPJ_FUNDO e DT_COMPTC
+            revisao         (bool): Informe eh uma nova versao de um mes ja
+                                    processado
 
-        # Saldo entre captacao e resgate
-        captacao_s = gp["CAPTC_DIA"].sum() - gp["RESG_DIA"].sum()
+        Raise ValueError se a revisao precisa de dias que ja sairam do buffer
 
-        mes_df = pd.concat(
-            [cota_s, dif_cotista_s, captacao_s.to_frame(name="Captacao")],
-            axis="columns",
-            sort=True,
-        )
-        mes_df.dropna(inplace=True)
-        if mes_df.empty:
-            msg(
-                "red",
-                "Dados insuficientes para exibir dados mensais. "
-                "Aumente o intervalo requisitado",
-                1,
+        Return: Lista com as datas adicionadas
+        """
+        cotas, captacao = self.matrizes(informe_df)
+        if revisao and not cotas.empty:
+            self.volta(cotas.index[0])
+        if self.ultima_data is not None:
+            cotas = cotas[cotas.index > self.ultima_data]
+        datas = cotas.index.to_list()
+        for data in datas:
+            self.adiciona_dia(
+                data, cotas.loc[data].dropna(), captacao.loc[data].dropna()
             )
+        return datas
 
-        return mes_df.rename(
-            columns={"VL_QUOTA": "Rentabilidade", "NR_COTST": "Dif. Cotistas"}
-        ).to_string(
-            justify="center",
-            formatters={
-                "Rentabilidade": "{:.2f}%".format,
-                "Dif. Cotistas": "{:.0f}".format,
-                "Captacao": self.reais_format.format,
-            },
-        )
+    def resultado(self):
+        """
+        Retorna as janelas moveis do ultimo dia processado.
+
+        Return: DataFrame com as colunas de cada janela (index CNPJ_FUNDO)
+        """
+        atual = (self.linhas - 1) % self.tamanho
+        cota = self.buffer["cota"][atual]
+        colunas = {}
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for posicao, janela in enumerate(self.janelas):
+                retorno, volatilidade, capt = self.nomes_colunas(janela)
+                base = np.full(len(self.cnpjs), np.nan)
+                if self.linhas - 1 - janela >= 0:
+                    base = self.buffer["cota"][
+                        (self.linhas - 1 - janela) % self.tamanho
+                    ]
+                colunas[retorno] = (cota / base - 1) * 100
+
+                soma = self.somas["retorno"][posicao]
+                variancia = (self.somas["retorno2"][posicao] - soma * soma / janela) / (
+                    janela - 1
+                )
+                colunas[volatilidade] = np.where(
+                    self.somas["n_retorno"][posicao] == janela,
+                    np.sqrt(np.maximum(variancia, 0.0) * DIAS_UTEIS_ANO) * 100,
+                    np.nan,
+                )
+                colunas[capt] = np.where(
+                    self.somas["n_captacao"][posicao] == janela,
+                    self.somas["captacao"][posicao],
+                    np.nan,
+                )
+        return pd.DataFrame(
+            colunas, index=pd.Index(self.cnpjs, name="CNPJ_FUNDO")
+        ).sort_index()
 
 
 class Compara:
     """Class para comparar performance dos fundos."""
 
-    def __init__(self, cadastral, informe):
+    # Metricas do rank e coluna usada em cada uma
+    metricas = {
+        "cotistas": "NR_COTST",
+        "patrimonio": "VL_PATRIM_LIQ",
+        "rentabilidade": "Rentabilidade",
+    }
+
+    # Metricas de risco (calculadas por MetricasRisco) e coluna de cada uma
+    metricas_risco = {
+        nome: coluna
+        for nome, coluna in MetricasRisco.colunas.items()
+        if nome != "rentabilidade"
+    }
+
+    # Metricas em que o menor valor fica no topo do rank
+    menor_melhor = {"volatilidade", "duracao_drawdown"}
+
+    def __init__(self, cadastral, informe, retornos=None, matrizes=None):
         """
         Initialize cadastral class.
 
         Parametros:
             cadastral (obj): Instancia da classe Cadastral
             informe   (obj): Instancia da classe Informe
+            retornos  (obj): Instancia da classe TabelaRetornos. Se
+                             especificado, o rank por rentabilidade usa a
+                             tabela de retornos em vez dos informes
+            matrizes  (obj): Instancia da classe MatrizCotas. Se
+                             especificado, cotas e patrimonio dos fundos em
+                             self.cnpjs sao lidos das matrizes em vez dos
+                             informes
         """
         self.informe = informe
         self.cadastral = cadastral
+        self.retornos = retornos
+        self.matrizes = matrizes
         self.cnpjs = None
+        # Benchmark do Sharpe/Sortino e fundo de referencia do beta
+        self.taxa_diaria = TAXA_DIARIA_BENCHMARK
+        self.referencia = None
 
     def adiciona_denom_social(self, fundo_df):
         """
@@ -574,15 +3113,11 @@ class Compara:
 
         Return: DataFrame
         """
-        denom_social = {}
-        for cnpj in fundo_df.index.values:
-            denom_social[cnpj] = self.cadastral.fundo_social_nome(cnpj)
+        cnpjs = fundo_df.index.get_level_values("CNPJ_FUNDO")
+        nomes = self.cadastral.nomes_por_cnpj(cnpjs.unique())
 
-        #        log.debug("denom social: %s", denom_social)
         # Adiciona coluna com nome social dos fundos
-        fundo_df["Denominacao social"] = fundo_df.index.map(
-            mapper=(lambda x: denom_social[x])
-        )
+        fundo_df["Denominacao social"] = nomes.reindex(cnpjs).to_numpy()
 
         return fundo_df
 
@@ -590,8 +3125,19 @@ class Compara:
         """
         Calcula rentabilidade total do periodo.
 
+        Com a tabela de retornos, a rentabilidade dos fundos em self.cnpjs eh
+        calculada com o indice acumulado no inicio e no fim do periodo. Sem
+        ela, usa as cotas ja carregadas em self.informe.pd_df.
+
         Return: Dataframe
         """
+        if self.retornos is not None:
+            self.retornos.atualiza(self.informe.filenames, self.informe)
+            return self.retornos.rentabilidade_periodo(
+                self.cnpjs,
+                [self.informe.data_informe(f) for f in self.informe.filenames],
+            )
+
         # Coloca cpnj como coluna
         fundo_df = self.informe.pd_df.reset_index(level="CNPJ_FUNDO")
         fundo_df.sort_index(level="DT_COMPTC", inplace=True)
@@ -609,26 +3155,129 @@ class Compara:
 
         return rent_df.rename(columns={"VL_QUOTA": "Rentabilidade"})
 
+    def matriz(self, coluna, cnpjs=None):
+        """
+        Retorna uma coluna do informe como matriz datas x fundos.
+
+        Com MatrizCotas, apenas as colunas dos fundos selecionados sao lidas
+        das matrizes do periodo. Sem ela, a matriz eh criada a partir do
+        self.informe.pd_df. Se o self.informe.pd_df ja foi carregado e as
+        matrizes do periodo ainda nao existem, elas nao sao criadas: a
+        matriz dos fundos selecionados vem do self.informe.pd_df.
+
+        Parametros:
+            coluna      (str): Coluna (MatrizCotas.colunas)
+            cnpjs      (list): Cnpjs dos fundos. Default todos
+
+        Return: DataFrame com index DT_COMPTC e uma coluna por CNPJ_FUNDO
+        """
+        if self.matrizes is None:
+            return MatrizCotas.de_informe(self.informe.pd_df, coluna)
+        pd_df = self.informe.pd_df
+        if (
+            pd_df is not None
+            and coluna in pd_df.columns
+            and not self.matrizes.completo(self.informe.filenames)
+        ):
+            # Nao cria as matrizes de todo o mercado para poucos fundos
+            matriz = MatrizCotas.de_informe(pd_df, coluna)
+            if cnpjs is None:
+                return matriz
+            return matriz.reindex(
+                columns=pd.Index(np.unique(np.asarray(list(cnpjs), dtype=str)))
+                .astype(object)
+                .rename("CNPJ_FUNDO")
+            )
+        self.matrizes.atualiza(self.informe.filenames, self.informe)
+        return self.matrizes.matriz(
+            coluna,
+            [self.informe.data_informe(f) for f in self.informe.filenames],
+            cnpjs,
+        )
+
     def calc_rentabilidade_mensal(self):
         """
         Calcula rentabilidade mensal dos fundos.
 
+        Com a tabela de retornos, usa apenas o indice acumulado dos fundos em
+        self.cnpjs.
+
         Return: Dataframe
         """
-        fundo_df = self.informe.pd_df.reset_index(level="CNPJ_FUNDO")
-        fundo_df.sort_index(level="DT_COMPTC", inplace=True)
-        mes_ts = (
-            fundo_df.groupby("CNPJ_FUNDO")["VL_QUOTA"].resample("M").last().pct_change()
-            * 100
-        )
-        mes_df = mes_ts.to_frame(name="Rentabilidade")
-        mes_df = mes_df.pivot_table(
-            index="DT_COMPTC", columns="CNPJ_FUNDO", values="Rentabilidade"
-        )
+        if self.retornos is not None:
+            self.retornos.atualiza(self.informe.filenames, self.informe)
+            cotas = self.retornos.retornos(
+                self.cnpjs,
+                [self.informe.data_informe(f) for f in self.informe.filenames],
+                ["INDICE"],
+            )["INDICE"].unstack("CNPJ_FUNDO")
+        else:
+            cotas = self.matriz("VL_QUOTA", self.cnpjs)
+        mes_df = cotas.resample("M").last().pct_change() * 100
         mes_df.index.name = "Data"
 
         return mes_df.dropna()
 
+    def calc_metricas_risco(self):
+        """
+        Calcula as metricas de risco dos fundos.
+
+        Com as matrizes (ou a tabela de retornos), as cotas dos fundos em
+        self.cnpjs sao lidas delas. Sem elas, usa as cotas ja carregadas em
+        self.informe.pd_df.
+
+        Return: DataFrame com as colunas de MetricasRisco.colunas (index
+                CNPJ_FUNDO)
+        """
+        cnpjs = self.cnpjs
+        if cnpjs is not None and self.referencia is not None:
+            cnpjs = pd.Index(cnpjs).union([self.referencia])
+        if self.matrizes is not None:
+            risco = MetricasRisco(self.matriz("VL_QUOTA", cnpjs))
+        elif self.retornos is not None:
+            self.retornos.atualiza(self.informe.filenames, self.informe)
+            cotas_df = self.retornos.retornos(
+                cnpjs,
+                [self.informe.data_informe(f) for f in self.informe.filenames],
+                ["VL_QUOTA"],
+            )
+            risco = MetricasRisco.de_informe(cotas_df)
+        else:
+            risco = MetricasRisco.de_informe(self.informe.pd_df)
+
+        log.debug("Calculando metricas de risco")
+        return risco.calcula(self.taxa_diaria, self.referencia)
+
+    def calc_janelas_moveis(self, janelas=None):
+        """
+        Calcula retorno, volatilidade e captacao liquida em janelas moveis.
+
+        Usa as cotas, captacoes e resgates ja carregados em self.informe.pd_df.
+
+        Parametro: janelas (list): Tamanho das janelas em dias uteis. Default
+                                   JanelasMoveis.janelas
+
+        Return: DataFrame com as colunas de cada janela no ultimo dia do
+                periodo (index CNPJ_FUNDO)
+        """
+        log.debug("Calculando janelas moveis")
+        if self.informe.pd_df.empty:
+            colunas = [
+                coluna
+                for janela in sorted(janelas or JanelasMoveis.janelas)
+                for coluna in JanelasMoveis.nomes_colunas(janela)
+            ]
+            return pd.DataFrame(
+                columns=colunas, index=pd.Index([], name="CNPJ_FUNDO"), dtype="float64"
+            )
+        cotas, captacao = JanelasMoveis.matrizes(self.informe.pd_df)
+        matrizes = JanelasMoveis.calcula(cotas, captacao, janelas)
+        janelas_df = pd.DataFrame(
+            {coluna: matriz.iloc[-1] for coluna, matriz in matrizes.items()}
+        )
+        janelas_df.index.name = "CNPJ_FUNDO"
+        return janelas_df
+
     def compara_fundos(self):
         """Compara performance entre fundos."""
         msg("cyan", "Rentabilidade do periodo:")
@@ -640,30 +3289,199 @@ class Compara:
         rent_mensal_df = self.calc_rentabilidade_mensal()
         print(rent_mensal_df.to_string(float_format="{:.2f}%".format))
 
-    def rank_simples(self, top, col_filtro):
+        msg("cyan", "\nMetricas de risco:")
+        risco_df = self.calc_metricas_risco().drop(columns="Rentabilidade")
+        print(
+            risco_df.to_string(
+                formatters={
+                    "Volatilidade": "{:.2f}%".format,
+                    "Max drawdown": "{:.2f}%".format,
+                    "Duracao drawdown": "{:.0f} dias".format,
+                },
+                float_format="{:.2f}".format,
+            )
+        )
+
+        msg("cyan", "\nJanelas moveis (dias uteis):")
+        janelas_df = self.calc_janelas_moveis()
+        print(
+            janelas_df.to_string(
+                formatters={
+                    coluna: (
+                        self.informe.reais_format.format
+                        if coluna.startswith("Captacao")
+                        else "{:.2f}%".format
+                    )
+                    for coluna in janelas_df.columns
+                }
+            )
+        )
+
+    def calc_rank_simples(self, top, col_filtro):
         """
-        Retorna rank dos fundos considerando apenas o ultima posicao no informe.
+        Calcula o rank dos fundos pelo ultimo valor de uma coluna do informe.
+
+        Apenas as linhas dos cnpjs em self.cnpjs sao carregadas dos informes
+        (ou apenas as colunas deles, se a coluna estiver nas matrizes).
 
         Parametros:
-            tipo_fundo      (str): Classe do fundo (acoes, mm, fixa e cambial)
             top             (int): Numero de fundos no rank
             col_filtro      (str): Coluna do informe para fazer o rank
+
+        Return: DataFrame com a coluna col_filtro (index CNPJ_FUNDO)
         """
-        # Cria dataframe do informe com os cnpj
-        self.informe.cria_df_informe(
-            cnpj=",".join(set(self.cnpjs)), columns=[col_filtro]
-        )
+        if self.matrizes is not None and col_filtro in MatrizCotas.colunas:
+            log.debug("Calculando rank por %s", col_filtro)
+            ultimo = MatrizCotas.ultimo_valor(self.matriz(col_filtro, self.cnpjs))
+            return ultimo.dropna().nlargest(top).to_frame(col_filtro)
 
-        log.debug("Filtrando os cnpj no informe")
-        fundo_df = self.informe.pd_df.reset_index(level="CNPJ_FUNDO")
-        fundo_df.sort_index(level="DT_COMPTC", inplace=True)
-        fundo_df = (
-            fundo_df.groupby("CNPJ_FUNDO")
-            .last()
-            .sort_values(by=col_filtro, ascending=False)
-            .head(top)
+        self.informe.cria_df_informe(cnpjs=self.cnpjs, columns=[col_filtro])
+
+        log.debug("Calculando rank por %s", col_filtro)
+        fundo_df = self.informe.pd_df.sort_index(
+            level="DT_COMPTC", sort_remaining=False, kind="mergesort"
         )
+        ultimo = fundo_df.groupby(level="CNPJ_FUNDO")[col_filtro].last()
+        return ultimo.nlargest(top).to_frame()
+
+    def calc_rank_rentabilidade(self, top):
+        """
+        Calcula o rank dos fundos pela rentabilidade da cota no periodo.
+
+        Parametros:
+            top             (int): Numero de fundos no rank. Se None, todos
+
+        Return: DataFrame com a coluna Rentabilidade (index CNPJ_FUNDO)
+        """
+        if self.retornos is None:
+            self.informe.cria_df_informe(cnpjs=self.cnpjs, columns=["VL_QUOTA"])
+        fundo_df = self.calc_rentabilidade_periodo()
+        if top is None:
+            return fundo_df
+        return fundo_df["Rentabilidade"].nlargest(top).to_frame()
+
+    def calc_rank_classes(self, top, metricas=None, classes=None):
+        """
+        Calcula o rank de varias classes e metricas de uma vez.
+
+        Os informes sao carregados uma unica vez, com os fundos em
+        funcionamento de todas as classes. O top de cada classe eh
+        calculado com groupby.
+
+        Parametros:
+            top             (int): Numero de fundos no rank de cada classe
+            metricas       (list): Metricas (chaves de Compara.metricas ou
+                                   Compara.metricas_risco). Default todas
+                                   de Compara.metricas
+            classes        (list): Classes (chaves de Cadastral.classes).
+                                   Default todas
+
+        Return: DataFrame com as colunas Classe, Metrica, Posicao, CNPJ_FUNDO,
+                Valor e Denominacao social
+        """
+        metricas = metricas or list(self.metricas)
+        classe_s = self.cadastral.classe_fundos_em_funcionamento()
+        if classes:
+            classe_s = classe_s[classe_s.isin(classes)]
+        self.cnpjs = classe_s.index
+
+        rentabilidade = "rentabilidade" in metricas
+        risco = [m for m in metricas if m in self.metricas_risco]
+        if "beta" in risco and self.referencia is None:
+            raise ValueError("Rank por beta precisa de um fundo de referencia")
+        colunas = [
+            self.metricas[m]
+            for m in metricas
+            if m != "rentabilidade" and m not in self.metricas_risco
+        ]
+        valores = []
+        if self.matrizes is not None:
+            for coluna in [c for c in colunas if c in MatrizCotas.colunas]:
+                colunas.remove(coluna)
+                ultimo = MatrizCotas.ultimo_valor(self.matriz(coluna, self.cnpjs))
+                valores.append(ultimo.rename(coluna))
+        if (rentabilidade and self.retornos is None) or (
+            risco and self.retornos is None and self.matrizes is None
+        ):
+            colunas.append("VL_QUOTA")
+
+        if colunas:
+            cnpjs = self.cnpjs
+            if risco and self.referencia is not None:
+                cnpjs = cnpjs.union([self.referencia])
+            self.informe.cria_df_informe(cnpjs=cnpjs, columns=list(colunas))
+            fundo_df = self.informe.pd_df.sort_index(
+                level="DT_COMPTC", sort_remaining=False, kind="mergesort"
+            )
+            valores.append(
+                fundo_df.groupby(level="CNPJ_FUNDO")[colunas]
+                .last()
+                .drop(columns="VL_QUOTA", errors="ignore")
+            )
+        if rentabilidade and self.retornos is None:
+            valores.append(self.calc_rentabilidade_periodo())
+        elif rentabilidade:
+            valores.append(self.calc_rank_rentabilidade(None))
+        if risco:
+            valores.append(
+                self.calc_metricas_risco()[[self.metricas_risco[m] for m in risco]]
+            )
+        valores_df = pd.concat(valores, axis=1)
+        valores_df["Classe"] = classe_s.reindex(valores_df.index)
+
+        ranks = []
+        for metrica in metricas:
+            coluna = self.metricas.get(metrica) or self.metricas_risco[metrica]
+            grupo = valores_df.dropna(subset=[coluna]).groupby("Classe")[coluna]
+            if metrica in self.menor_melhor:
+                top_s = grupo.nsmallest(top)
+            else:
+                top_s = grupo.nlargest(top)
+            rank_df = top_s.rename("Valor").reset_index()
+            rank_df.insert(1, "Metrica", metrica)
+            rank_df.insert(2, "Posicao", rank_df.groupby("Classe").cumcount() + 1)
+            ranks.append(rank_df)
+        rank_df = pd.concat(ranks, ignore_index=True)
+
+        cnpjs = pd.Index(rank_df["CNPJ_FUNDO"])
+        nomes = self.cadastral.nomes_por_cnpj(cnpjs.unique())
+        rank_df["Denominacao social"] = nomes.reindex(cnpjs).to_numpy()
+        return rank_df
+
+    @staticmethod
+    def rank_estruturado(rank_df):
+        """
+        Retorna o rank de calc_rank_classes como dicionario.
+
+        Parametro: DataFrame retornado por calc_rank_classes
+
+        Return: dict {classe: {metrica: [fundos em ordem do rank]}}
+        """
+        ranks = {}
+        rank_df = rank_df.astype(object).where(rank_df.notna(), None)
+        for (classe, metrica), grupo in rank_df.groupby(
+            ["Classe", "Metrica"], sort=False
+        ):
+            ranks.setdefault(classe, {})[metrica] = [
+                {
+                    "posicao": fundo["Posicao"],
+                    "cnpj": fundo["CNPJ_FUNDO"],
+                    "denominacao_social": fundo["Denominacao social"],
+                    "valor": fundo["Valor"],
+                }
+                for fundo in grupo.to_dict("records")
+            ]
+        return ranks
 
+    def rank_simples(self, top, col_filtro):
+        """
+        Retorna rank dos fundos considerando apenas o ultima posicao no informe.
+
+        Parametros:
+            top             (int): Numero de fundos no rank
+            col_filtro      (str): Coluna do informe para fazer o rank
+        """
+        fundo_df = self.calc_rank_simples(top, col_filtro)
         fundo_df = self.adiciona_denom_social(fundo_df)
 
         return fundo_df.rename(
@@ -671,28 +3489,395 @@ class Compara:
                 "NR_COTST": "Numero Cotistas",
                 "VL_PATRIM_LIQ": "Patrimonio liquido",
             }
-        ).to_string(formatters={"Patrimonio liquido": "R${:,.2f}".format})
+        ).to_string(
+            formatters={
+                "Patrimonio liquido": "R${:,.2f}".format,
+                "Numero Cotistas": "{:.0f}".format,
+            }
+        )
 
     def rank_rentabilidade(self, top):
         """Retorna rank dos fundos considerando a rentabilidade da cota."""
-        self.informe.cria_df_informe(
-            cnpj=",".join(set(self.cnpjs)), columns=["VL_QUOTA"]
-        )
-        fundo_df = self.calc_rentabilidade_periodo()
+        fundo_df = self.calc_rank_rentabilidade(top)
         fundo_df = self.adiciona_denom_social(fundo_df)
-        return (
-            fundo_df.sort_values(by="Rentabilidade", ascending=False)
-            .head(top)
-            .to_string(float_format="{:.2f}%".format)
+        return fundo_df.to_string(float_format="{:.2f}%".format)
+
+
+class Servidor:
+    """
+    Mantem os dados dos fundos em memoria e responde consultas em json.
+
+    O cadastro (com o indice de nomes) e os informes dos ultimos meses sao
+    carregados uma vez. Uma thread verifica periodicamente se ha arquivos
+    novos no site da CVM e recarrega apenas os arquivos modificados. As
+    consultas usam sempre a ultima versao carregada.
+
+    Consultas (GET, parametros na query string):
+        /busca     nome, tipo, todos, limite ou cnpj
+        /informe   cnpj, datainicio, datafim, mensal
+        /compara   cnpj (separados por ','), datainicio, datafim
+        /rank      tipo, metrica, top, datainicio, datafim
+        /janelas   cnpj (separados por ','). Default todos os fundos
+        /status
+    """
+
+    def __init__(self, meses=SERVE_MESES):
+        """
+        Initialize Servidor class.
+
+        Parametros:
+            meses   (int): Meses de informe mantidos em memoria
+        """
+        self.meses = meses
+        self.cadastral = None
+        self.memoria = {}
+        self.checksums = {}
+        self.atualizado = None
+        self.armazem = ArmazemCnpj()
+        self.retornos = TabelaRetornos()
+        self.matrizes = MatrizCotas()
+        # Janelas moveis atualizadas com os dias novos de cada informe
+        self.janelas = JanelasMoveis()
+        self.lock_janelas = threading.Lock()
+        # Serializa a escrita nos armazenamentos em disco (armazem, retornos e
+        # matrizes)
+        self.lock_disco = threading.Lock()
+        self.parar = threading.Event()
+
+    def datas_memoria(self):
+        """Retorna os meses (YYYYMM) mantidos em memoria."""
+        fim = pd.Period(datetime.datetime.now(), freq="M")
+        return pd.period_range(end=fim, periods=self.meses).strftime("%Y%m").to_list()
+
+    def atualiza(self):
+        """
+        Baixa e carrega os arquivos novos ou modificados.
+
+        Return: True se algum arquivo foi carregado
+        """
+        create_dir(CSV_FILES_DIR)
+        cadastral = Cadastral()
+        cadastral.download_inf_cadastral()
+        informe = Informe()
+        informe.download_informes_mensais(self.datas_memoria())
+        checksums = {
+            file_mes: file_checksum(file_mes)
+            for file_mes in [cadastral.filename] + sorted(informe.filenames)
+        }
+        if checksums == self.checksums:
+            log.debug("Dados do serve sem alteracao")
+            return False
+
+        if self.checksums.get(cadastral.filename) == checksums[cadastral.filename]:
+            cadastral = self.cadastral
+        else:
+            cadastral.cria_df_cadastral_unico()
+            cadastral.cria_indice_nomes()
+
+        memoria = {}
+        for file_mes in sorted(informe.filenames):
+            if self.checksums.get(file_mes) == checksums[file_mes]:
+                memoria[file_mes] = self.memoria[file_mes]
+            else:
+                log.debug("Carregando informe em memoria: %s", file_mes)
+                memoria[file_mes] = informe.le_informe_mensal(file_mes).sort_index()
+
+        with self.lock_disco:
+            self.armazem.atualiza(informe.filenames, informe)
+            self.retornos.atualiza(informe.filenames, informe)
+            self.matrizes.atualiza(informe.filenames, informe)
+        with self.lock_janelas:
+            try:
+                # Depois de um mes revisado, os meses seguintes sao refeitos
+                revisado = False
+                for file_mes in sorted(memoria):
+                    novo = self.checksums.get(file_mes) != checksums[file_mes]
+                    revisao = novo and file_mes in self.checksums
+                    if novo or revisado:
+                        self.janelas.atualiza(memoria[file_mes], revisao)
+                    revisado = revisado or revisao
+            except ValueError as error:
+                log.debug("Recalculando janelas moveis: %s", error)
+                self.janelas = JanelasMoveis()
+                for file_mes in sorted(memoria):
+                    self.janelas.atualiza(memoria[file_mes])
+
+        # Troca os dados de uma vez. Consultas em andamento usam a versao anterior
+        self.cadastral, self.memoria = cadastral, memoria
+        self.checksums = checksums
+        self.atualizado = datetime.datetime.now()
+        return True
+
+    def atualiza_periodicamente(self, intervalo):
+        """Atualiza os dados a cada intervalo segundos ate self.parar."""
+        while not self.parar.wait(intervalo):
+            try:
+                self.atualiza()
+            except (Exception, SystemExit) as error:
+                log.debug("Erro ao atualizar dados do serve: %s", error)
+
+    @staticmethod
+    def para_json(pd_obj, orient="records"):
+        """Retorna DataFrame ou Series convertido para tipos do json."""
+        return json.loads(pd_obj.to_json(orient=orient, date_format="iso"))
+
+    @staticmethod
+    def parametro(params, nome):
+        """Retorna parametro obrigatorio da consulta."""
+        if not params.get(nome):
+            raise ValueError("Parametro obrigatorio: {}".format(nome))
+        return params[nome]
+
+    def informe_periodo(self, params):
+        """Retorna Informe com os arquivos do periodo da consulta."""
+        datas = valida_datas(
+            int(params.get("datainicio", 0)), int(params.get("datafim", 0))
+        )
+        memoria = self.memoria
+        arquivos = {Informe.data_informe(f): f for f in memoria}
+        informe = Informe(memoria=memoria)
+        informe.filenames = {arquivos[data] for data in datas if data in arquivos}
+        fora = [data for data in datas if data not in arquivos]
+        if fora:
+            informe.download_informes_mensais(fora)
+        return informe
+
+    def atualiza_disco(self, informe, armazenamentos):
+        """
+        Atualiza os armazenamentos em disco com os meses fora da memoria.
+
+        Os meses em memoria ja foram gravados por self.atualiza. Apenas a
+        escrita eh serializada: a leitura dos armazenamentos ja atualizados
+        eh feita em paralelo com outras consultas.
+
+        Parametros:
+            informe         (obj): Instancia da classe Informe do periodo
+            armazenamentos (list): Instancias de ArmazemCnpj, TabelaRetornos
+                                   ou MatrizCotas
+        """
+        if informe.filenames <= set(informe.memoria):
+            return
+        with self.lock_disco:
+            for armazenamento in armazenamentos:
+                armazenamento.atualiza(informe.filenames, informe)
+
+    def consulta_busca(self, params):
+        """Busca fundos por nome e tipo ou o cadastro de um cnpj."""
+        cadastral = self.cadastral
+        if params.get("cnpj"):
+            fundo = cadastral.busca_fundo_cnpj(params["cnpj"])
+            return {"fundo": self.para_json(fundo, "index")}
+
+        tipo = params.get("tipo")
+        if tipo and tipo not in Cadastral.classes:
+            raise ValueError("Tipo invalido: {}".format(tipo))
+        fundo_df = cadastral.busca_fundos(
+            params.get("nome"), tipo, params.get("todos") == "1"
+        )
+        limite = int(params.get("limite", 100))
+        fundos = fundo_df[["DENOM_SOCIAL", "SIT", "CLASSE"]].head(limite)
+        return {"total": len(fundo_df), "fundos": self.para_json(fundos.reset_index())}
+
+    def consulta_informe(self, params):
+        """
+        Informes e saldo do periodo de um fundo.
+
+        Retorna os meses do periodo com informe do fundo. Apenas se o fundo
+        nao tem informe em nenhum mes a consulta retorna 404.
+        """
+        cnpj = self.parametro(params, "cnpj")
+        cadastral = self.cadastral
+        cadastral.busca_fundo_cnpj(cnpj)
+        informe = self.informe_periodo(params)
+        self.atualiza_disco(informe, [self.armazem])
+        informe.cria_df_informe(cnpjs=[cnpj], armazem=self.armazem)
+        if informe.pd_df.empty:
+            raise KeyError(cnpj)
+
+        resposta = {
+            "cnpj": cnpj,
+            "denominacao_social": cadastral.fundo_social_nome(cnpj),
+            "gestor": cadastral.fundo_gestor_nome(cnpj),
+            "saldo": informe.calc_saldo_periodo(),
+            "informes": self.para_json(informe.remove_index_cnpj().reset_index()),
+        }
+        if params.get("mensal") == "1":
+            mes_df = informe.estatistica_mensal()
+            resposta["mensal"] = self.para_json(mes_df.reset_index())
+        return resposta
+
+    def consulta_compara(self, params):
+        """Rentabilidade do periodo e mensal de varios fundos."""
+        cnpj = self.parametro(params, "cnpj")
+        informe = self.informe_periodo(params)
+        self.atualiza_disco(informe, [self.retornos])
+        # As rentabilidades sao lidas da tabela de retornos, sem ler os informes
+        compara = Compara(self.cadastral, informe, self.retornos)
+        compara.cnpjs = list(dict.fromkeys(cnpj.split(",")))
+        rent_periodo_df = compara.calc_rentabilidade_periodo()
+        faltando = [c for c in compara.cnpjs if c not in rent_periodo_df.index]
+        if faltando:
+            raise KeyError(",".join(faltando))
+
+        rent_periodo_df = compara.adiciona_denom_social(rent_periodo_df)
+        rent_mensal_df = compara.calc_rentabilidade_mensal()
+        return {
+            "rentabilidade_periodo": self.para_json(rent_periodo_df, "index"),
+            "rentabilidade_mensal": self.para_json(rent_mensal_df, "index"),
+        }
+
+    def consulta_rank(self, params):
+        """Rank dos fundos por classe e metrica."""
+        tipo = params.get("tipo", "todos")
+        metrica = params.get("metrica", "todas")
+        if tipo != "todos" and tipo not in Cadastral.classes:
+            raise ValueError("Tipo invalido: {}".format(tipo))
+        if (
+            metrica != "todas"
+            and metrica not in Compara.metricas
+            and metrica not in Compara.metricas_risco
+        ):
+            raise ValueError("Metrica invalida: {}".format(metrica))
+
+        top = int(params.get("top", 10))
+        informe = self.informe_periodo(params)
+        compara = Compara(self.cadastral, informe, self.retornos, self.matrizes)
+        compara.taxa_diaria = (
+            float(params.get("taxa", TAXA_DIARIA_BENCHMARK * 100)) / 100
+        )
+        compara.referencia = params.get("referencia")
+        # O rank apenas le a tabela de retornos e as matrizes ja atualizadas
+        self.atualiza_disco(informe, [self.retornos, self.matrizes])
+        rank_df = compara.calc_rank_classes(
+            top,
+            None if metrica == "todas" else [metrica],
+            None if tipo == "todos" else [tipo],
         )
+        return {
+            "datas": sorted(informe.data_informe(f) for f in informe.filenames),
+            "top": top,
+            "ranks": compara.rank_estruturado(rank_df),
+        }
+
+    def consulta_janelas(self, params):
+        """Retorno, volatilidade e captacao liquida em janelas moveis."""
+        with self.lock_janelas:
+            janelas_df = self.janelas.resultado()
+            data = self.janelas.ultima_data
+        if params.get("cnpj"):
+            janelas_df = janelas_df.loc[pd.Index(params["cnpj"].split(",")).unique()]
+        return {
+            "data": data.isoformat() if data is not None else None,
+            "janelas": self.para_json(janelas_df, "index"),
+        }
+
+    def consulta_status(self, params):
+        """Estado dos dados carregados."""
+        return {
+            "atualizado": self.atualizado.isoformat() if self.atualizado else None,
+            "meses": sorted(Informe.data_informe(f) for f in self.memoria),
+        }
+
+    def consulta(self, caminho, params):
+        """
+        Responde uma consulta.
+
+        Parametros:
+            caminho     (str): Caminho da url (ex: /busca)
+            params     (dict): Parametros da consulta
+
+        Return: tupla (status http, resposta)
+        """
+        consultas = {
+            "/busca": self.consulta_busca,
+            "/informe": self.consulta_informe,
+            "/compara": self.consulta_compara,
+            "/rank": self.consulta_rank,
+            "/janelas": self.consulta_janelas,
+            "/status": self.consulta_status,
+        }
+        if caminho not in consultas:
+            return 404, {"erro": "Consulta nao encontrada: {}".format(caminho)}
+        if self.cadastral is None:
+            return 503, {"erro": "Dados ainda nao carregados"}
+        try:
+            return 200, consultas[caminho](params)
+        except KeyError as error:
+            return 404, {"erro": "Nao encontrado: {}".format(error)}
+        except (ValueError, SystemExit) as error:
+            return 400, {"erro": str(error)}
+
+
+def cria_servidor(fundos, host="127.0.0.1", port=8080, socket_file=None):
+    """
+    Cria o servidor http das consultas.
+
+    Parametros:
+        fundos      (obj): Instancia da classe Servidor
+        host        (str): Endereco
+        port        (int): Porta
+        socket_file (str): Unix socket. Se especificado, host e port sao ignorados
+
+    Return: Servidor http (socketserver)
+    """
+    # Importados apenas pelo comando serve
+    import http.server
+    import socketserver
+
+    class ServidorHandler(http.server.BaseHTTPRequestHandler):
+        """Handler http das consultas do Servidor."""
+
+        def do_GET(self):
+            """Responde consulta GET em json."""
+            url = urllib.parse.urlsplit(self.path)
+            params = dict(urllib.parse.parse_qsl(url.query))
+            status, resposta = self.server.fundos.consulta(url.path, params)
+            corpo = json.dumps(resposta, default=str).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+        def address_string(self):
+            """Endereco do cliente (unix socket nao tem endereco)."""
+            return self.client_address[0] if self.client_address else "unix"
+
+        def log_message(self, format, *args):
+            """Log das requisicoes no debug."""
+            log.debug("serve %s - %s", self.address_string(), format % args)
+
+    class ServidorUnix(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        """Servidor http em um unix socket."""
+
+        daemon_threads = True
+
+    if socket_file:
+        if os.path.exists(socket_file):
+            os.remove(socket_file)
+        servidor = ServidorUnix(socket_file, ServidorHandler)
+    else:
+        servidor = http.server.ThreadingHTTPServer((host, port), ServidorHandler)
+    servidor.fundos = fundos
+    return servidor
 
 
 ##############################################################################
 # Valida as datas passadas na linha de comando
 # Retorna lista com todos os meses entre as datas no formato YYYYMM
 ##############################################################################
-def retorna_datas(datainicio=None, datafim=None):
-    """Valida datas."""
+def valida_datas(datainicio=None, datafim=None):
+    """
+    Valida datas e retorna todos os meses entre elas.
+
+    Parametros:
+        datainicio  (int): Data inicio (YYYYMM). Default mes atual
+        datafim     (int): Data fim (YYYYMM). Default mes atual
+
+    Return: Lista com os meses (YYYYMM)
+
+    Raises: ValueError se as datas forem invalidas
+    """
     # Menor data com dados disponiveis pela CVM
     menor_data_disp = 200501
     # Ano e mes corrente
@@ -704,15 +3889,33 @@ def retorna_datas(datainicio=None, datafim=None):
     log.debug("data inicio: %s, data fim: %s", datainicio, datafim)
 
     if int(d_ini) > int(d_fim):
-        msg("red", "Erro: Data de inicio maior que data fim", 1)
+        raise ValueError("Erro: Data de inicio maior que data fim")
 
     if int(d_ini) < menor_data_disp or int(d_fim) < menor_data_disp:
-        msg("red", "Erro data de inicio menor que: {}".format(menor_data_disp), 1)
+        raise ValueError("Erro data de inicio menor que: {}".format(menor_data_disp))
 
     if int(d_ini) > ano_mes or int(d_fim) > ano_mes:
-        msg("red", "Erro data de inicio ou fim maior que data de hoje", 1)
+        raise ValueError("Erro data de inicio ou fim maior que data de hoje")
+
+    # Meses contados a partir do ano zero. Evita importar o pandas
+    meses = []
+    for data in (int(d_ini), int(d_fim)):
+        ano, mes = divmod(data, 100)
+        if not 1 <= mes <= 12:
+            raise ValueError("Erro: Data invalida: {}".format(data))
+        meses.append(ano * 12 + mes - 1)
+    return [
+        "{:04d}{:02d}".format(mes // 12, mes % 12 + 1)
+        for mes in range(meses[0], meses[1] + 1)
+    ]
 
-    return pd.period_range(d_ini, d_fim, freq="M").strftime("%Y%m").to_list()
+
+def retorna_datas(datainicio=None, datafim=None):
+    """Valida datas."""
+    try:
+        return valida_datas(datainicio, datafim)
+    except ValueError as error:
+        msg("red", str(error), 1)
 
 
 ##############################################################################
@@ -724,18 +3927,14 @@ def cmd_rank_fundo(args):
 
     inf_cadastral = Cadastral()
     informe = Informe()
-    compara = Compara(inf_cadastral, informe)
+    compara = Compara(inf_cadastral, informe, TabelaRetornos(), MatrizCotas())
 
-    for data in range_datas:
-        compara.informe.download_informe_mensal(data)
+    compara.informe.download_informes_mensais(range_datas)
 
-    # Buscando cnpj dos fundos
-    cadastral_df = compara.cadastral.busca_fundos(fundo_classe=args.tipo)
-    # Apenas cnpj dos fundos em funcionamento
-    compara.cnpjs = cadastral_df.loc[
-        cadastral_df["SIT"] == "EM FUNCIONAMENTO NORMAL"
-    ].index.values.tolist()
-    log.debug("lista dos cnpjs carregado com sucesso")
+    if args.tipo != "todos":
+        # Apenas cnpj dos fundos em funcionamento
+        compara.cnpjs = compara.cadastral.cnpjs_em_funcionamento(args.tipo)
+        log.debug("lista dos cnpjs carregado com sucesso")
 
     if args.cotistas:
         col_filtro = "NR_COTST"
@@ -745,12 +3944,78 @@ def cmd_rank_fundo(args):
     pd.set_option("max_colwidth", None)
     pd.set_option("max_rows", None)
     pd.set_option("display.width", None)
-    if args.rentabilidade:
+    compara.taxa_diaria = args.taxa / 100
+    compara.referencia = args.referencia
+    if args.tipo == "todos" or args.todas or args.output or args.risco:
+        rank_classes(compara, args)
+    elif args.rentabilidade:
         print(compara.rank_rentabilidade(args.top))
     else:
         print(compara.rank_simples(args.top, col_filtro))
 
 
+def rank_classes(compara, args):
+    """Mostra (ou grava em arquivo) o rank de varias classes e metricas."""
+    if args.todas:
+        metricas = list(compara.metricas)
+    else:
+        metricas = [
+            metrica
+            for metrica, selecionada in [
+                ("cotistas", args.cotistas),
+                ("patrimonio", args.patrimonio),
+                ("rentabilidade", args.rentabilidade),
+                (args.risco, args.risco),
+            ]
+            if selecionada
+        ]
+    classes = None if args.tipo == "todos" else [args.tipo]
+    try:
+        rank_df = compara.calc_rank_classes(args.top, metricas, classes)
+    except ValueError as error:
+        msg("red", "Erro: {}".format(error), 1)
+    except KeyError:
+        msg(
+            "red",
+            "Erro: fundo de referencia '{}' nao encontrado".format(args.referencia),
+            1,
+        )
+
+    if args.output:
+        write_json(
+            args.output,
+            {
+                "datas": [
+                    compara.informe.data_informe(f)
+                    for f in sorted(compara.informe.filenames)
+                ],
+                "top": args.top,
+                "ranks": compara.rank_estruturado(rank_df),
+            },
+        )
+        msg("green", "Rank gravado no arquivo {}".format(args.output))
+        return
+
+    formato = {
+        "cotistas": "{:.0f}".format,
+        "patrimonio": "R${:,.2f}".format,
+        "rentabilidade": "{:.2f}%".format,
+        "volatilidade": "{:.2f}%".format,
+        "drawdown": "{:.2f}%".format,
+        "duracao_drawdown": "{:.0f} dias".format,
+        "sharpe": "{:.2f}".format,
+        "sortino": "{:.2f}".format,
+        "beta": "{:.2f}".format,
+    }
+    for (classe, metrica), grupo in rank_df.groupby(["Classe", "Metrica"], sort=False):
+        msg("cyan", "Rank {} por {}:".format(classe, metrica))
+        print(
+            grupo.set_index("CNPJ_FUNDO")[["Valor", "Denominacao social"]].to_string(
+                formatters={"Valor": formato[metrica]}
+            )
+        )
+
+
 ##############################################################################
 # Comando compara
 ##############################################################################
@@ -760,13 +4025,18 @@ def cmd_compara_fundo(args):
 
     inf_cadastral = Cadastral()
     informe = Informe()
-    compara = Compara(inf_cadastral, informe)
+    compara = Compara(inf_cadastral, informe, matrizes=MatrizCotas())
+    compara.taxa_diaria = args.taxa / 100
+    compara.referencia = args.referencia
 
-    for data in range_datas:
-        compara.informe.download_informe_mensal(data)
+    compara.informe.download_informes_mensais(range_datas)
 
-    if not compara.informe.cria_df_informe(cnpj=args.cnpj):
-        msg("red", "Erro: algum dos cnpjs '{}' nao encontrado".format(args.cnpj), 1)
+    cnpj = args.cnpj
+    compara.cnpjs = cnpj.split(",")
+    if args.referencia and args.referencia not in cnpj.split(","):
+        cnpj = "{},{}".format(cnpj, args.referencia)
+    if not compara.informe.cria_df_informe(cnpj=cnpj, armazem=ArmazemCnpj()):
+        msg("red", "Erro: algum dos cnpjs '{}' nao encontrado".format(cnpj), 1)
 
     compara.compara_fundos()
 
@@ -774,31 +4044,61 @@ def cmd_compara_fundo(args):
 ##############################################################################
 # Comando informe
 ##############################################################################
+def lista_cnpjs(cnpjs, arquivo=None):
+    """
+    Retorna a lista de cnpjs da linha de comando e do arquivo.
+
+    Parametros:
+        cnpjs      (list): Cnpjs. Cada item pode ter varios separados por ','
+        arquivo     (str): Arquivo com os cnpjs. Um ou mais por linha, linhas
+                           comecando com '#' sao ignoradas
+
+    Return: Lista de cnpjs sem repeticao, na ordem em que aparecem
+    """
+    texto = [",".join(cnpjs)]
+    if arquivo:
+        try:
+            with open(arquivo) as fd:
+                texto += [linha for linha in fd if not linha.startswith("#")]
+        except OSError as error:
+            msg("red", "Erro ao ler arquivo de cnpjs: {}".format(error), 1)
+    cnpj_list = re.split(r"[\s,;]+", ",".join(texto))
+    return list(dict.fromkeys(cnpj for cnpj in cnpj_list if cnpj))
+
+
 def cmd_informes_fundo(args):
     """Busa informes dos fundos."""
+    cnpjs = lista_cnpjs(args.cnpj, args.arquivo)
+    if not cnpjs:
+        msg("red", "Erro: informe o cnpj do fundo ou um arquivo com cnpjs", 1)
     range_datas = retorna_datas(args.datainicio, args.datafim)
+    if len(cnpjs) == 1:
+        informe_fundo(cnpjs[0], range_datas, args.mensal)
+    else:
+        informe_fundos(cnpjs, range_datas, args.mensal)
 
+
+def informe_fundo(cnpj, range_datas, mensal):
+    """Mostra cadastro, informes, saldo e estatistica mensal de um fundo."""
     # Mostra informacoes cadastral do fundo
     inf_cadastral = Cadastral()
-    inf_cadastral.cria_df_cadastral()
     try:
-        inf_cadastral.busca_fundo_cnpj(args.cnpj)
+        inf_cadastral.busca_fundo_cnpj(cnpj)
     except KeyError:
-        msg("red", "Erro: Fundo com cnpj {} nao encontrado".format(args.cnpj), 1)
+        msg("red", "Erro: Fundo com cnpj {} nao encontrado".format(cnpj), 1)
     msg("cyan", "Denominacao Social: ", end="")
-    msg("nocolor", inf_cadastral.fundo_social_nome(args.cnpj))
+    msg("nocolor", inf_cadastral.fundo_social_nome(cnpj))
     msg("cyan", "Nome do Gestor: ", end="")
-    msg("nocolor", inf_cadastral.fundo_gestor_nome(args.cnpj))
+    msg("nocolor", inf_cadastral.fundo_gestor_nome(cnpj))
     msg("", "")
 
     # Informes
     informe = Informe()
-    for data in range_datas:
-        informe.download_informe_mensal(data)
+    informe.download_informes_mensais(range_datas)
 
     # Carrega arquivo csv e cria o dataframe
-    if not informe.cria_df_informe(cnpj=args.cnpj):
-        msg("red", "Erro: cnpj '{}' nao encontrado".format(args.cnpj), 1)
+    if not informe.cria_df_informe(cnpj=cnpj, armazem=ArmazemCnpj()):
+        msg("red", "Erro: cnpj '{}' nao encontrado".format(cnpj), 1)
 
     print(informe.mostra_informe_fundo())
 
@@ -809,18 +4109,58 @@ def cmd_informes_fundo(args):
         msg("nocolor", "{}".format(value))
 
     # Rentabilidade mensal
-    if args.mensal:
+    if mensal:
         msg("cyan", "Estatistica mensal:")
         print(informe.calc_estatistica_mensal())
 
 
+def informe_fundos(cnpjs, range_datas, mensal):
+    """
+    Mostra saldo e estatistica mensal de varios fundos.
+
+    Os informes de todos os fundos sao carregados uma unica vez e as
+    medidas sao calculadas agrupadas por cnpj.
+    """
+    informe = Informe()
+    informe.download_informes_mensais(range_datas)
+    informe.cria_df_informe(cnpjs=cnpjs, armazem=ArmazemCnpj())
+    if informe.pd_df.empty:
+        msg("red", "Erro: nenhum dos cnpjs encontrado nos informes", 1)
+
+    encontrados = set(informe.pd_df.index.unique(level="CNPJ_FUNDO"))
+    inval_cnpjs = [cnpj for cnpj in cnpjs if cnpj not in encontrados]
+    if inval_cnpjs:
+        msg(
+            "yellow",
+            "cnpj(s) {} nao encontrado(s) nos informes".format(", ".join(inval_cnpjs)),
+        )
+
+    pd.set_option("display.max_rows", None)
+    pd.set_option("display.width", None)
+    saldo_df = informe.saldo_periodo()
+    nomes = Cadastral().nomes_por_cnpj(saldo_df.index)
+    saldo_df["Denominacao social"] = nomes.reindex(saldo_df.index).to_numpy()
+    msg("cyan", "Saldo no periodo:")
+    print(
+        saldo_df.to_string(
+            formatters={
+                medida: formato.format
+                for medida, formato in informe.saldo_format.items()
+            }
+        )
+    )
+
+    if mensal:
+        msg("cyan", "\nEstatistica mensal:")
+        print(informe.calc_estatistica_mensal())
+
+
 ##############################################################################
 # Comando busca
 ##############################################################################
 def cmd_busca_fundo(args):
     """Busca informacoes cadastral sobre os fundos."""
     inf_cadastral = Cadastral()
-    inf_cadastral.cria_df_cadastral()
     if args.cnpj:
         inf_cadastral.mostra_detalhes_fundo(args.cnpj)
     else:
@@ -838,15 +4178,83 @@ def cmd_busca_fundo(args):
         )
 
 
+##############################################################################
+# Comando serve
+##############################################################################
+def cmd_serve(args):
+    """Servidor de consultas com os dados em memoria."""
+    fundos = Servidor(args.meses)
+    msg("cyan", "Carregando dados...")
+    fundos.atualiza()
+    threading.Thread(
+        target=fundos.atualiza_periodicamente, args=(args.intervalo,), daemon=True
+    ).start()
+
+    servidor = cria_servidor(fundos, args.host, args.port, args.socket)
+    endereco = args.socket or "http://{}:{}".format(*servidor.server_address[:2])
+    msg("green", "Servidor em {}".format(endereco))
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        fundos.parar.set()
+        servidor.server_close()
+
+
+##############################################################################
+# Comando cache
+##############################################################################
+def cmd_cache(args):
+    """Mostra e gerencia o cache do diretorio de dados."""
+    cache = CacheDados()
+    if args.aquece:
+        range_datas = retorna_datas(args.datainicio, args.datafim)
+        arquivos = cache.aquece(range_datas)
+        msg("green", "Informes preparados: {}".format(len(arquivos)))
+
+    if args.limite:
+        for acao, chave, liberado in cache.aplica_limite(args.limite * 1024 * 1024):
+            msg(
+                "yellow", "Item {} {} ({:.1f} MB)".format(chave, acao, liberado / 2**20)
+            )
+
+    itens = cache.itens()
+    if itens.empty:
+        msg("yellow", "Cache vazio: {}".format(cache.diretorio))
+        return
+
+    tamanho = "{:.1f} MB".format
+    pd.set_option("display.max_rows", None)
+    pd.set_option("display.width", None)
+    msg("cyan", "Diretorio: ", end="")
+    msg("nocolor", cache.diretorio)
+    print(
+        itens.to_string(
+            formatters={
+                "Informe": lambda b: tamanho(b / 2**20),
+                "Derivados": lambda b: tamanho(b / 2**20),
+                "Ultimo acesso": "{:%Y-%m-%d %H:%M}".format,
+            }
+        )
+    )
+    msg("cyan", "Total: ", end="")
+    msg("nocolor", tamanho(itens[["Informe", "Derivados"]].to_numpy().sum() / 2**20))
+
+
 ##############################################################################
 # Main function
 ##############################################################################
 def main():
     """Command line execution."""
-    global log
+    global log, CSV_FILES_DIR, CSV_ENGINE, INFORME_WORKERS, DOWNLOAD_LIMITE
 
     # Parser da linha de comando
     args = parse_parameters()
+    CSV_FILES_DIR = os.path.expanduser(args.dados)
+    CSV_ENGINE = args.csv_engine
+    INFORME_WORKERS = args.workers
+    DOWNLOAD_LIMITE = args.limite_download
     # Configura log --debug
     log = setup_logging() if args.debug else logging
     log.debug("CMD line args: %s", vars(args))
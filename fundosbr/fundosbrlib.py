@@ -1,16 +1,121 @@
 # -*- coding: utf-8 -*-
 """Biblioteca com funcoes do fundobr."""
 
+import collections
+import concurrent.futures
+import configparser
+import contextlib
+import glob
+import hashlib
+import importlib
+import importlib.util
+import io
+import json
 import logging
 import os
-import shutil
+import pickle
+import random
+import re
 import sys
+import threading
+import time
+import types
+import zipfile
 
-import requests
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class LazyModule(types.ModuleType):
+    """
+    Module imported only when one of its attributes is first used.
+
+    Heavy modules (pandas, requests, ...) are imported only by the commands
+    that use them. The module attributes are copied on the first use, so
+    the following uses do not pay any overhead.
+    """
+
+    def __getattr__(self, name):
+        """Import the module and return the attribute."""
+        module = importlib.import_module(self.__name__)
+        self.__dict__.update(module.__dict__)
+        return getattr(module, name)
+
+
+def lazy_import(name):
+    """
+    Return a module that is only imported when it is used.
+
+    Example:
+        pd = lazy_import("pandas")
+        pd.DataFrame()  # pandas is imported here
+    """
+    return sys.modules.get(name) or LazyModule(name)
+
+
+requests = lazy_import("requests")
+
+# pyarrow eh opcional. Verifica se esta instalado sem importar o modulo
+if importlib.util.find_spec("pyarrow") is None:
+    COLUMNAR_FORMAT = "pickle"
+    CSV_ENGINE_DEFAULT = "pandas"
+else:
+    COLUMNAR_FORMAT = "parquet"
+    CSV_ENGINE_DEFAULT = "pyarrow"
+
+# Engines available to read csv files ("auto" uses CSV_ENGINE_DEFAULT)
+CSV_ENGINES = ["auto", "pandas", "pyarrow"]
+
+# Strings read as missing values. Same default list used by pandas.read_csv
+CSV_NA_VALUES = [
+    "",
+    "#N/A",
+    "#N/A N/A",
+    "#NA",
+    "-1.#IND",
+    "-1.#QNAN",
+    "-NaN",
+    "-nan",
+    "1.#IND",
+    "1.#QNAN",
+    "<NA>",
+    "N/A",
+    "NA",
+    "NULL",
+    "NaN",
+    "None",
+    "n/a",
+    "nan",
+    "null",
+]
 
 
 log = logging.getLogger(__name__)
 
+# Resultado do download de um arquivo. attempts: numero de tentativas
+DownloadResult = collections.namedtuple(
+    "DownloadResult",
+    ["url", "local_file", "status_code", "error", "attempts"],
+    defaults=[1],
+)
+
+# Status http de falhas temporarias do servidor, que podem ser repetidas
+RETRY_STATUS = {408, 429, 500, 502, 503, 504}
+
+# Separa o arquivo zip do membro no nome de um arquivo dentro de um zip
+# (ex: /dados/inf_diario_fi_2019.zip::inf_diario_fi_201901.csv)
+ARCHIVE_MEMBER_SEP = "::"
+
+# Tamanho dos blocos lidos e gravados nos downloads
+DOWNLOAD_BLOCK_SIZE = 1024 * 1024
+
+
+class DownloadError(OSError):
+    """Download interrupted or not matching the size informed by the server."""
+
 
 def msg(color, msg_text, exitcode=0, *, end="\n", flush=True, output=None):
     """
@@ -132,10 +237,442 @@ def create_dir(dir_name):
             msg("red", "Error: PermissionError to create dir {}".format(dir_name), 1)
 
 
-def download_file(url, local_file, *, allow_redirects=True, decode=True):
+def read_json(file_name):
+    """Return the content of a json file or an empty dictionary if it is invalid."""
+    try:
+        with open(file_name, "r") as fd:
+            return json.load(fd)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_json(file_name, data):
+    """Write a json file atomically, i.e, readers never see a partial file."""
+    tmp_file = "{}.{}.tmp".format(file_name, os.getpid())
+    with open(tmp_file, "w") as fd:
+        json.dump(data, fd)
+    os.replace(tmp_file, file_name)
+
+
+def read_config(config_file, section, defaults, env_prefix=""):
+    """
+    Read the options of a section of an ini config file.
+
+    Each option can be overridden by the environment variable env_prefix +
+    option name in upper case. Options missing in both use the default.
+
+    Arguments:
+        config_file    (str): Config filename. It is optional, i.e, if it
+                              does not exist only the environment and the
+                              defaults are used
+        section        (str): Section of the config file
+        defaults      (dict): Options and default values. The values read
+                              are converted to the type of the default value
+
+    Keyword arguments (opt):
+        env_prefix     (str): Prefix of the environment variables
+
+    Return:
+        Dictionary with the value of each option of "defaults"
+    """
+    parser = configparser.ConfigParser()
+    try:
+        parser.read(config_file)
+    except configparser.Error as error:
+        msg("red", "Error: invalid config file {}: {}".format(config_file, error), 1)
+
+    config = {}
+    for option, default in defaults.items():
+        value = os.environ.get(env_prefix + option.upper())
+        if value is None:
+            value = parser.get(section, option, fallback=None)
+        if value is None:
+            config[option] = default
+            continue
+        try:
+            config[option] = type(default)(value)
+        except ValueError:
+            msg("red", "Error: invalid value for {}: {}".format(option, value), 1)
+    return config
+
+
+class FileLock:
+    """
+    Inter-process exclusive lock on a lock file.
+
+    Processes and threads using the same lock file run the locked block one
+    at a time. The lock is released by the operating system if the process
+    dies, so a crashed process never leaves a stale lock. The lock file
+    itself is empty and is never removed.
+
+    Example:
+        with FileLock("/tmp/dados/inf.zip.lock") as lock:
+            if lock.contended:
+                # other process held the lock, the work may be done
+    """
+
+    poll_interval = 0.05
+
+    def __init__(self, lock_file, timeout=None):
+        """
+        Initialize the lock. It is not acquired.
+
+        Arguments:
+            lock_file      (str): Lock filename
+
+        Keyword arguments (opt):
+            timeout      (float): Max wait (seconds) to acquire the lock.
+                                  default: wait forever
+        """
+        self.lock_file = lock_file
+        self.timeout = timeout
+        self.contended = False
+        self._fd = None
+
+    @staticmethod
+    def _try_lock(fd):
+        """Return True if the lock of the file descriptor was acquired."""
+        try:
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        except OSError:
+            return False
+        return True
+
+    def acquire(self):
+        """
+        Acquire the lock, waiting for the other holders.
+
+        Raises:
+            TimeoutError if the lock was not acquired in "timeout" seconds
+        """
+        fd = os.open(self.lock_file, os.O_RDWR | os.O_CREAT, 0o666)
+        self.contended = not self._try_lock(fd)
+        if self.contended:
+            log.debug("Aguardando lock %s", self.lock_file)
+            if fcntl and self.timeout is None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            else:
+                deadline = None
+                if self.timeout is not None:
+                    deadline = time.monotonic() + self.timeout
+                while not self._try_lock(fd):
+                    if deadline is not None and time.monotonic() > deadline:
+                        os.close(fd)
+                        raise TimeoutError(
+                            "Timeout waiting for lock {}".format(self.lock_file)
+                        )
+                    time.sleep(self.poll_interval)
+        self._fd = fd
+
+    def release(self):
+        """Release the lock."""
+        if self._fd is None:
+            return
+        if fcntl:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        else:
+            msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        os.close(self._fd)
+        self._fd = None
+
+    def __enter__(self):
+        """Acquire the lock."""
+        self.acquire()
+        return self
+
+    def __exit__(self, *args):
+        """Release the lock."""
+        self.release()
+
+
+def lock_file_name(file_name):
+    """Return the name of the lock file used to write "file_name"."""
+    return "{}.lock".format(file_name)
+
+
+def cache_lock(cache_file, lock_dir=None):
+    """
+    Return the lock used to create a cache file (see columnar_file_name).
+
+    All versions (checksums) of a cache share the lock, so the number of
+    lock files does not grow with new versions.
+
+    Arguments:
+        cache_file     (str): Cache filename
+
+    Keyword arguments (opt):
+        lock_dir       (str): Directory of the lock files. It is created if
+                              it does not exist. default: cache_file directory
+    """
+    lock_dir = lock_dir or os.path.dirname(cache_file)
+    os.makedirs(lock_dir, exist_ok=True)
+    name = os.path.basename(cache_file).rsplit(".", 2)[0]
+    return FileLock(lock_file_name(os.path.join(lock_dir, name)))
+
+
+def file_meta_name(local_file):
+    """Return the name of the file storing the metadata of "local_file"."""
+    return "{}.meta".format(local_file)
+
+
+def read_file_meta(local_file):
+    """
+    Read the metadata (http validators) stored for a downloaded file.
+
+    Arguments:
+        local_file     (str): Local filename
+
+    Return:
+        Dictionary with the metadata. Empty if there is no metadata or if
+        the local file does not match the stored size. If the file was
+        modified after its checksum was stored, the checksum is verified
+        again and the metadata is empty if it does not match
+    """
+    meta = read_json(file_meta_name(local_file))
+    if not meta:
+        return {}
+
+    try:
+        stat = os.stat(local_file)
+    except OSError:
+        return {}
+    if stat.st_size != meta.get("size"):
+        log.debug("Arquivo %s com tamanho diferente do metadado", local_file)
+        return {}
+
+    if meta.get("sha1") and meta.get("mtime_ns") != stat.st_mtime_ns:
+        if _sha1_file(local_file).hexdigest() != meta["sha1"]:
+            log.debug("Arquivo %s com checksum diferente do metadado", local_file)
+            return {}
+        meta["mtime_ns"] = stat.st_mtime_ns
+        write_file_meta(local_file, meta)
+
+    return meta
+
+
+def write_file_meta(local_file, meta):
+    """
+    Store the metadata (http validators) of a downloaded file.
+
+    Arguments:
+        local_file     (str): Local filename
+        meta          (dict): Metadata to store
+    """
+    write_json(file_meta_name(local_file), meta)
+
+
+def mark_file_immutable(local_file):
+    """Mark a downloaded file as immutable, i.e, it never needs to be rechecked."""
+    meta = read_file_meta(local_file)
+    if not meta:
+        meta = {"size": os.path.getsize(local_file)}
+    meta["immutable"] = True
+    write_file_meta(local_file, meta)
+
+
+def is_file_immutable(local_file):
+    """Return True if local file exists and is marked as immutable."""
+    return bool(read_file_meta(local_file).get("immutable"))
+
+
+def archive_member(archive, member):
+    """Return the name of a member of a zip archive, used as a file name."""
+    return "{}{}{}".format(archive, ARCHIVE_MEMBER_SEP, member)
+
+
+def split_archive_member(file_name):
+    """
+    Split the name of a member of a zip archive (see archive_member).
+
+    Return:
+        Tuple (archive, member). member is None if file_name is not a member
+    """
+    archive, sep, member = file_name.partition(ARCHIVE_MEMBER_SEP)
+    return (archive, member) if sep else (file_name, None)
+
+
+def is_archive(file_name):
+    """Return True if the file is a zip archive or a member of one."""
+    archive, member = split_archive_member(file_name)
+    return member is not None or archive.lower().endswith(".zip")
+
+
+def archive_members(archive, extension=".csv"):
+    """Return the names of the members of a zip archive with an extension."""
+    with zipfile.ZipFile(archive) as zip_file:
+        return [
+            name
+            for name in zip_file.namelist()
+            if name.lower().endswith(extension) and not name.endswith("/")
+        ]
+
+
+def open_data_file(file_name):
+    """
+    Open a data file for reading in binary mode.
+
+    Members of zip archives are decompressed while they are read, without
+    extracting them to disk. A zip archive without member name opens its
+    only csv member.
+
+    Arguments:
+        file_name      (str): File name, zip archive or archive member
+
+    Return:
+        File object
+    """
+    archive, member = split_archive_member(file_name)
+    if not is_archive(file_name):
+        return open(file_name, "rb")
+
+    with zipfile.ZipFile(archive) as zip_file:
+        if member is None:
+            members = [n for n in zip_file.namelist() if n.lower().endswith(".csv")]
+            if len(members) != 1:
+                raise ValueError(
+                    "Zip archive {} has {} csv files".format(archive, len(members))
+                )
+            member = members[0]
+        # O membro continua aberto depois de fechar o ZipFile
+        return zip_file.open(member)
+
+
+def _sha1_file(local_file, sha1=None):
+    """Return the sha1 object updated with the content of a local file."""
+    sha1 = sha1 or hashlib.sha1()
+    with open(local_file, "rb") as fd:
+        for block in iter(lambda: fd.read(DOWNLOAD_BLOCK_SIZE), b""):
+            sha1.update(block)
+    return sha1
+
+
+def file_checksum(local_file):
+    """
+    Return the sha1 checksum of a local file.
+
+    The checksum is stored in the metadata file, so it is only calculated
+    again if the file size or modification time changes. The checksum of a
+    member of a zip archive (see archive_member) is derived from the
+    checksum of the archive. A file compressed by compress_file keeps the
+    checksum of the original file, so caches keyed by it stay valid.
+    """
+    archive, member = split_archive_member(local_file)
+    if member is not None:
+        key = "{}{}{}".format(file_checksum(archive), ARCHIVE_MEMBER_SEP, member)
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    stat = os.stat(local_file)
+    meta = read_file_meta(local_file)
+    if meta.get("sha1") and meta.get("mtime_ns") == stat.st_mtime_ns:
+        return meta.get("content_sha1", meta["sha1"])
+
+    meta.update({"size": stat.st_size, "mtime_ns": stat.st_mtime_ns})
+    meta["sha1"] = _sha1_file(local_file).hexdigest()
+    write_file_meta(local_file, meta)
+    return meta.get("content_sha1", meta["sha1"])
+
+
+def compress_file(local_file, archive_file):
+    """
+    Compress a local file into a zip archive and remove the original file.
+
+    The archive keeps the access time, the immutable flag and the checksum
+    (see file_checksum) of the original file. It is written atomically.
+
+    Arguments:
+        local_file     (str): Local filename
+        archive_file   (str): Zip archive filename
+
+    Return:
+        Size of the archive (bytes)
+    """
+    checksum = file_checksum(local_file)
+    meta = read_file_meta(local_file)
+    atime_ns = os.stat(local_file).st_atime_ns
+    tmp_file = "{}.{}.tmp".format(archive_file, os.getpid())
+    with zipfile.ZipFile(tmp_file, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        zip_file.write(local_file, os.path.basename(local_file))
+    os.replace(tmp_file, archive_file)
+
+    stat = os.stat(archive_file)
+    write_file_meta(
+        archive_file,
+        {
+            "immutable": bool(meta.get("immutable")),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha1": _sha1_file(archive_file).hexdigest(),
+            "content_sha1": checksum,
+        },
+    )
+    os.utime(archive_file, ns=(atime_ns, stat.st_mtime_ns))
+    for file_name in [local_file, file_meta_name(local_file)]:
+        if os.path.exists(file_name):
+            os.remove(file_name)
+    return stat.st_size
+
+
+def touch_access(file_name):
+    """
+    Set the last access time of a file to now, keeping its modification time.
+
+    The access time is set explicitly because file systems mounted with
+    noatime or relatime do not update it on every read. The archive of a
+    zip archive member is updated.
+    """
+    archive, _ = split_archive_member(file_name)
+    try:
+        os.utime(archive, ns=(time.time_ns(), os.stat(archive).st_mtime_ns))
+    except OSError as error:
+        log.debug("Erro ao atualizar acesso de %s: %s", archive, error)
+
+
+def conditional_headers(local_file):
+    """
+    Return http headers to make a conditional request for a local file.
+
+    If-None-Match and If-Modified-Since are built from the validators stored
+    by the last download. Empty dictionary if the file has no validators.
+    """
+    if not os.path.exists(local_file):
+        return {}
+
+    meta = read_file_meta(local_file)
+    headers = {}
+    if meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+    return headers
+
+
+def download_file(
+    url,
+    local_file,
+    *,
+    allow_redirects=True,
+    decode=True,
+    session=None,
+    conditional=False,
+    resume=True,
+    timeout=None,
+    throttle=None,
+):
     """
     Download a file.
 
+    The file is written to a temporary file (local_file.part) and renamed to
+    local_file only after the whole content was received and its size
+    matches the Content-Length, so an interrupted download never leaves a
+    truncated local_file. An interrupted download is resumed with a Range
+    request, if the file was not modified on the server (If-Range).
+
+    The server validators (ETag, Last-Modified), the file size and its sha1
+    checksum are stored in a metadata file next to the downloaded file.
+
     Arguments:
         url                    (str): URL to download
         local_file             (str): Local filename to store the downloaded
@@ -146,20 +683,854 @@ def download_file(url, local_file, *, allow_redirects=True, decode=True):
                                       default: True
         decode          (True/False): Decode compressed responses like gzip
                                       default: True
+        session   (requests.Session): Session used to make the request.
+                                      It allows reusing keep-alive connections
+                                      default: a new connection per request
+        conditional     (True/False): Make a conditional request using the
+                                      validators of the local file. If the
+                                      file was not modified, server returns
+                                      304 and the local file is kept
+                                      default: False
+        resume          (True/False): Resume a partial download left by an
+                                      interrupted transfer
+                                      default: True
+        timeout      (float or tuple): Connect and read timeouts in seconds
+                                      (see requests). default: no timeout
+        throttle          (callable): Called with the size of each block
+                                      received. It may sleep to limit the
+                                      transfer rate (see DownloadScheduler)
+                                      default: None
 
     Return:
-        Request response
+        Request response. status_code is 200 when a resumed download (206)
+        completes
+
+    Raises:
+        DownloadError if the transfer is interrupted or incomplete. The
+        partial file is kept to be resumed
     """
-    with requests.get(url, stream=True, allow_redirects=allow_redirects) as res:
+    part_file = "{}.part".format(local_file)
+    part_meta = read_json(file_meta_name(part_file)) if resume else {}
+    offset = 0
+    if part_meta.get("url") == url and os.path.exists(part_file):
+        offset = os.path.getsize(part_file)
+        headers = {
+            "Range": "bytes={}-".format(offset),
+            "If-Range": part_meta.get("etag") or part_meta["last_modified"],
+            "Accept-Encoding": "identity",
+        }
+        log.debug("Continuando download de %s a partir de %s bytes", url, offset)
+    else:
+        headers = conditional_headers(local_file) if conditional else {}
+
+    http = session if session else requests
+    with http.get(
+        url,
+        stream=True,
+        allow_redirects=allow_redirects,
+        headers=headers,
+        timeout=timeout,
+    ) as res:
         if decode:
             res.raw.decode_content = True
 
-        if res.status_code == 200:
+        if res.status_code == 416 and offset:
+            # Arquivo parcial invalido. Baixa o arquivo completo novamente
+            _remove_part_file(part_file)
+        elif res.status_code in (200, 206):
             msg("nocolor", "Downloading arquivo: {}...".format(local_file))
-            with open(local_file, "wb") as fd:
-                shutil.copyfileobj(res.raw, fd)
+            sha1 = _receive_file(url, res, part_file, offset, throttle)
+            os.replace(part_file, local_file)
+            _remove_part_file(part_file)
+            stat = os.stat(local_file)
+            write_file_meta(
+                local_file,
+                {
+                    "url": url,
+                    "etag": res.headers.get("ETag"),
+                    "last_modified": res.headers.get("Last-Modified"),
+                    "size": stat.st_size,
+                    "mtime_ns": stat.st_mtime_ns,
+                    "sha1": sha1,
+                },
+            )
+            res.status_code = 200
+        elif res.status_code == 304:
+            log.debug("Arquivo %s nao modificado no servidor", local_file)
 
+    if res.status_code == 416 and offset:
+        return download_file(
+            url,
+            local_file,
+            allow_redirects=allow_redirects,
+            decode=decode,
+            session=session,
+            conditional=conditional,
+            resume=False,
+            timeout=timeout,
+            throttle=throttle,
+        )
     return res
 
 
+def _remove_part_file(part_file):
+    """Remove a partial download and its metadata."""
+    for file_name in [part_file, file_meta_name(part_file)]:
+        if os.path.exists(file_name):
+            os.remove(file_name)
+
+
+def _receive_file(url, res, part_file, offset, throttle=None):
+    """
+    Write the content of a response to the partial download file.
+
+    Arguments:
+        url                  (str): URL requested
+        res    (requests.Response): Response with status 200 or 206
+        part_file            (str): Partial download file
+        offset               (int): Size of the partial file requested
+                                    with Range (0 for a new download)
+        throttle        (callable): Called with the size of each block
+
+    Return:
+        sha1 checksum (hex) of the whole file
+    """
+    import urllib3
+
+    size = None
+    encoded = res.headers.get("Content-Encoding", "identity") != "identity"
+    if res.status_code == 206:
+        content_range = re.match(
+            r"bytes (\d+)-\d+/(\d+|\*)", res.headers.get("Content-Range", "")
+        )
+        if not content_range or int(content_range.group(1)) != offset:
+            _remove_part_file(part_file)
+            raise DownloadError(
+                "Content-Range invalido em {}: {}".format(
+                    url, res.headers.get("Content-Range")
+                )
+            )
+        if content_range.group(2) != "*":
+            size = int(content_range.group(2))
+    elif res.headers.get("Content-Length") and not encoded:
+        size = int(res.headers["Content-Length"])
+
+    # Validadores permitem continuar o download se ele for interrompido
+    if res.status_code == 200:
+        _remove_part_file(part_file)
+        if not encoded and (
+            res.headers.get("ETag") or res.headers.get("Last-Modified")
+        ):
+            write_json(
+                file_meta_name(part_file),
+                {
+                    "url": url,
+                    "etag": res.headers.get("ETag"),
+                    "last_modified": res.headers.get("Last-Modified"),
+                },
+            )
+
+    sha1 = hashlib.sha1()
+    if offset and res.status_code == 206:
+        _sha1_file(part_file, sha1)
+    # read1 retorna os bytes ja recebidos. Com read, o ultimo bloco eh
+    # perdido se a conexao cair no meio dele
+    read = getattr(res.raw, "read1", res.raw.read)
+    try:
+        with open(part_file, "ab" if res.status_code == 206 else "wb") as fd:
+            for block in iter(lambda: read(DOWNLOAD_BLOCK_SIZE), b""):
+                fd.write(block)
+                sha1.update(block)
+                if throttle:
+                    throttle(len(block))
+    except (requests.RequestException, urllib3.exceptions.HTTPError) as error:
+        raise DownloadError(
+            "Download interrompido {}: {}".format(url, error)
+        ) from error
+
+    received = os.path.getsize(part_file)
+    if size is not None and received != size:
+        if received > size:
+            _remove_part_file(part_file)
+        raise DownloadError(
+            "Download incompleto {}: {} de {} bytes".format(url, received, size)
+        )
+    return sha1.hexdigest()
+
+
+def columnar_file_name(local_file, cache_dir, name=None, extension=None, version=None):
+    """
+    Return the name of the columnar cache file of a local file.
+
+    The name contains the checksum of the local file, so a new version of
+    the file never uses an outdated cache.
+
+    Arguments:
+        local_file     (str): Local filename (source of the cache)
+        cache_dir      (str): Directory to store the cache files
+        name           (str): Name of the cache. Default local_file basename
+                              (member basename for a zip archive member)
+        extension      (str): Extension of the cache file. Default COLUMNAR_FORMAT
+        version   (int/str): Version of the cache content (ex: schema). A new
+                             version never uses an outdated cache
+    """
+    key = file_checksum(local_file)[:16]
+    if version is not None:
+        key = "{}v{}".format(key, version)
+    return os.path.join(
+        cache_dir,
+        "{}.{}.{}".format(
+            name or os.path.basename(split_archive_member(local_file)[1] or local_file),
+            key,
+            extension or COLUMNAR_FORMAT,
+        ),
+    )
+
+
+def remove_old_versions(cache_file):
+    """Remove the versions of a cache file created from other checksums."""
+    parts = os.path.basename(cache_file).rsplit(".", 2)
+    if len(parts) < 3:
+        return
+    pattern = os.path.join(
+        glob.escape(os.path.dirname(cache_file)),
+        "{}.*.{}".format(glob.escape(parts[0]), parts[2]),
+    )
+    for old_file in glob.glob(pattern):
+        if old_file != cache_file:
+            log.debug("Removendo cache antigo: %s", old_file)
+            os.remove(old_file)
+
+
+def write_pickle(obj, cache_file):
+    """Store a python object in a cache file (see columnar_file_name)."""
+    tmp_file = "{}.{}.tmp".format(cache_file, os.getpid())
+    with open(tmp_file, "wb") as fd:
+        pickle.dump(obj, fd, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_file, cache_file)
+    remove_old_versions(cache_file)
+
+
+def read_pickle(cache_file):
+    """Read a python object stored by write_pickle."""
+    with open(cache_file, "rb") as fd:
+        return pickle.load(fd)
+
+
+def write_columnar(pd_df, columnar_file):
+    """
+    Store a DataFrame in a columnar file (parquet if pyarrow is available).
+
+    Old versions of the cache file, i.e, with other checksums, are removed.
+
+    Arguments:
+        pd_df    (DataFrame): DataFrame to store
+        columnar_file  (str): Columnar filename (see columnar_file_name)
+    """
+    tmp_file = "{}.{}.tmp".format(columnar_file, os.getpid())
+    if COLUMNAR_FORMAT == "parquet":
+        pd_df.to_parquet(tmp_file, index=False)
+    else:
+        pd_df.to_pickle(tmp_file)
+    os.replace(tmp_file, columnar_file)
+    remove_old_versions(columnar_file)
+
+
+def write_columnar_chunks(chunks, columnar_file):
+    """
+    Store DataFrames (chunks of the same table) in a columnar file.
+
+    Only one chunk is kept in memory at a time. With parquet, each chunk is
+    a row group. Otherwise, the chunks are pickled one after the other in
+    the same file (see read_columnar).
+
+    Old versions of the cache file, i.e, with other checksums, are removed.
+
+    Arguments:
+        chunks        (iter): DataFrames with the same columns and types
+        columnar_file  (str): Columnar filename (see columnar_file_name)
+    """
+    tmp_file = "{}.{}.tmp".format(columnar_file, os.getpid())
+    if COLUMNAR_FORMAT == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = None
+        try:
+            for chunk in chunks:
+                if writer is None:
+                    # Categories change from chunk to chunk. Use the same
+                    # dictionary type in all row groups
+                    schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+                    for num, field in enumerate(schema):
+                        if pa.types.is_dictionary(field.type):
+                            schema = schema.set(
+                                num,
+                                field.with_type(pa.dictionary(pa.int32(), pa.string())),
+                            )
+                    writer = pq.ParquetWriter(tmp_file, schema)
+                writer.write_table(
+                    pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+                )
+        finally:
+            if writer is not None:
+                writer.close()
+    else:
+        with open(tmp_file, "wb") as fd:
+            for chunk in chunks:
+                pickle.dump(chunk, fd, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_file, columnar_file)
+    remove_old_versions(columnar_file)
+
+
+def read_columnar(columnar_file, columns=None, filters=None):
+    """
+    Read a DataFrame stored by write_columnar or write_columnar_chunks.
+
+    Arguments:
+        columnar_file  (str): Columnar filename
+        columns       (list): Only read these columns. Default all columns
+        filters       (list): Only read rows matching all filters. List of
+                              tuples (column, "in", values). With parquet,
+                              filters are applied while reading the file.
+                              With pickle, to each chunk as it is read
+
+    Return:
+        DataFrame
+    """
+    import pandas as pd
+
+    if COLUMNAR_FORMAT == "parquet":
+        return pd.read_parquet(columnar_file, columns=columns, filters=filters)
+
+    chunks = []
+    categories = {}
+    with open(columnar_file, "rb") as fd:
+        while True:
+            try:
+                pd_df = pickle.load(fd)
+            except EOFError:
+                break
+            for column, _, values in filters or []:
+                pd_df = pd_df[pd_df[column].isin(values)]
+            pd_df = pd_df[columns] if columns else pd_df
+            categories.update(
+                (column, "category")
+                for column, col_type in pd_df.dtypes.items()
+                if col_type == "category"
+            )
+            chunks.append(pd_df)
+    if len(chunks) == 1:
+        return chunks[0]
+    # Chunks com categorias diferentes sao concatenados como object
+    return _sort_categories(pd.concat(chunks, ignore_index=True), categories)
+
+
+def parse_date_columns(pd_df, columns, date_format="%Y-%m-%d"):
+    """
+    Convert date columns of a DataFrame to datetime64 using a fixed format.
+
+    Columns not in the DataFrame are ignored. Invalid dates become NaT.
+
+    Arguments:
+        pd_df    (DataFrame): DataFrame to convert (in place)
+        columns       (list): Date columns
+        date_format    (str): Date format in strftime format
+                              default %Y-%m-%d
+    Return:
+        DataFrame
+    """
+    import pandas as pd
+
+    for column in columns:
+        if column in pd_df.columns:
+            pd_df[column] = pd.to_datetime(
+                pd_df[column], format=date_format, errors="coerce"
+            )
+    return pd_df
+
+
+def csv_engine(engine="auto"):
+    """
+    Return the engine used to read csv files.
+
+    "auto" selects pyarrow if it is installed and pandas otherwise. If
+    pyarrow is requested but not installed, pandas is used.
+
+    Arguments:
+        engine         (str): auto, pandas or pyarrow
+    Return:
+        str (pandas or pyarrow)
+    """
+    if engine not in CSV_ENGINES:
+        raise ValueError("Invalid csv engine: {}".format(engine))
+    if engine == "auto":
+        return CSV_ENGINE_DEFAULT
+    if engine == "pyarrow" and CSV_ENGINE_DEFAULT != "pyarrow":
+        log.debug("pyarrow is not installed. Using pandas to read csv files")
+        return "pandas"
+    return engine
+
+
+def read_csv(
+    csv_file,
+    columns=None,
+    dtype=None,
+    dates=None,
+    filters=None,
+    *,
+    engine="auto",
+    sep=";",
+    encoding="ISO-8859-1",
+    chunksize=100000,
+):
+    """
+    Read a csv file into a DataFrame.
+
+    Both engines return the same DataFrame: columns in the file order,
+    categorical columns with sorted categories and a RangeIndex.
+
+    Arguments:
+        csv_file       (str): csv filename. Zip archives and archive members
+                              (see open_data_file) are read without
+                              extracting them to disk
+        columns       (list): Only read these columns. Default all columns
+        dtype         (dict): Type of the columns ({column: dtype}). Columns not
+                              in dtype have their type inferred
+        dates         (list): Date columns, converted with parse_date_columns
+        filters       (list): Only read rows matching all filters. List of
+                              tuples (column, "in", values)
+
+    Keyword arguments (opt):
+        engine         (str): auto, pandas or pyarrow (see csv_engine).
+                              pyarrow parses the file using several threads
+                              default auto
+        sep            (str): field delimiter. default ;
+        encoding       (str): file encoding. default ISO-8859-1
+        chunksize      (int): with pandas and filters, number of lines read
+                              and filtered at a time. default 100000
+    Return:
+        DataFrame
+    """
+    dtype = dict(dtype or {})
+    dates = list(dates or [])
+    if csv_engine(engine) == "pyarrow":
+        pd_df = _read_csv_pyarrow(
+            csv_file, columns, dtype, dates, filters, sep, encoding
+        )
+    else:
+        pd_df = _read_csv_pandas(
+            csv_file, columns, dtype, filters, sep, encoding, chunksize
+        )
+    return parse_date_columns(pd_df, dates)
+
+
+def read_csv_chunks(
+    csv_file,
+    columns=None,
+    dtype=None,
+    dates=None,
+    *,
+    sep=";",
+    encoding="ISO-8859-1",
+    chunksize=100000,
+):
+    """
+    Read a csv file in chunks with pandas.
+
+    Only one chunk is in memory at a time. Each chunk has the same columns
+    and types as read_csv (categories sorted within the chunk).
+
+    Arguments:
+        csv_file       (str): csv filename (see read_csv)
+        columns       (list): Only read these columns. Default all columns
+        dtype         (dict): Type of the columns ({column: dtype})
+        dates         (list): Date columns, converted with parse_date_columns
+
+    Keyword arguments (opt):
+        sep            (str): field delimiter. default ;
+        encoding       (str): file encoding. default ISO-8859-1
+        chunksize      (int): number of lines of each chunk. default 100000
+    Return:
+        Generator of DataFrames
+    """
+    import pandas as pd
+
+    dtype = dict(dtype or {})
+    with _csv_source(csv_file) as source:
+        for chunk in pd.read_csv(
+            source,
+            sep=sep,
+            encoding=encoding,
+            usecols=columns,
+            dtype=dtype,
+            chunksize=chunksize,
+        ):
+            chunk = _sort_categories(chunk, dtype)
+            yield parse_date_columns(chunk, list(dates or []))
+
+
+def _csv_source(csv_file):
+    """Return a context manager with the csv file name or the open zip member."""
+    if is_archive(csv_file):
+        return open_data_file(csv_file)
+    return contextlib.nullcontext(csv_file)
+
+
+def _read_csv_pandas(csv_file, columns, dtype, filters, sep, encoding, chunksize):
+    """Read a csv file with pandas (see read_csv)."""
+    import pandas as pd
+
+    read_csv_args = {
+        "sep": sep,
+        "encoding": encoding,
+        "usecols": columns,
+        "dtype": dtype,
+    }
+    if not filters:
+        with _csv_source(csv_file) as source:
+            return pd.read_csv(source, **read_csv_args)
+
+    def _filter(pd_df):
+        for column, _, values in filters:
+            pd_df = pd_df[pd_df[column].isin(values)]
+        return pd_df
+
+    with _csv_source(csv_file) as source:
+        blocos = [
+            _filter(bloco)
+            for bloco in pd.read_csv(source, chunksize=chunksize, **read_csv_args)
+        ]
+    # Blocos com categorias diferentes sao concatenados como object
+    return _sort_categories(pd.concat(blocos, ignore_index=True), dtype)
+
+
+def _read_csv_pyarrow(csv_file, columns, dtype, dates, filters, sep, encoding):
+    """Read a csv file with the multithreaded pyarrow csv reader (see read_csv)."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+
+    # Tipos do pyarrow equivalentes ao dtype. Floats sao lidos como float64 e
+    # convertidos depois, como faz o pandas
+    pa_types = {
+        "category": pa.dictionary(pa.int32(), pa.string()),
+        "object": pa.string(),
+    }
+    column_types = {column: pa.string() for column in dates}
+    for column, col_type in dtype.items():
+        column_types[column] = pa_types.get(col_type, pa.float64())
+
+    include_columns = None
+    if columns is not None:
+        with io.TextIOWrapper(open_data_file(csv_file), encoding=encoding) as fd:
+            header = fd.readline().rstrip("\r\n").split(sep)
+        include_columns = [column for column in header if column in columns]
+
+    with _csv_source(csv_file) as source:
+        table = pa_csv.read_csv(
+            source,
+            read_options=pa_csv.ReadOptions(encoding=encoding, use_threads=True),
+            parse_options=pa_csv.ParseOptions(delimiter=sep),
+            convert_options=pa_csv.ConvertOptions(
+                column_types=column_types,
+                include_columns=include_columns,
+                null_values=CSV_NA_VALUES,
+                strings_can_be_null=True,
+            ),
+        )
+    for column, _, values in filters or []:
+        mask = pc.is_in(table[column].cast(pa.string()), value_set=pa.array(values))
+        table = table.filter(mask)
+
+    pd_df = table.to_pandas()
+    for column, col_type in dtype.items():
+        if column in pd_df.columns and col_type not in pa_types:
+            pd_df[column] = pd_df[column].astype(col_type)
+    # O dicionario do pyarrow usa a ordem das linhas no arquivo
+    return _sort_categories(pd_df, dtype)
+
+
+def _sort_categories(pd_df, dtype):
+    """Keep only used categories, sorted as pandas.read_csv does."""
+    for column in pd_df.columns:
+        if dtype.get(column) == "category":
+            categorical = (
+                pd_df[column].astype("category").cat.remove_unused_categories()
+            )
+            pd_df[column] = categorical.cat.reorder_categories(
+                categorical.cat.categories.sort_values()
+            )
+    return pd_df
+
+
+def bytes_per_row(pd_df):
+    """Return the memory used by each row of a DataFrame (index included)."""
+    if not len(pd_df):
+        return 0.0
+    return pd_df.memory_usage(index=True, deep=True).sum() / len(pd_df)
+
+
+def create_session(pool_size=10):
+    """
+    Create a requests session with a connection pool.
+
+    Arguments (opt):
+        pool_size      (int): max number of keep-alive connections per host
+                              default 10
+    Return:
+        requests.Session
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=pool_size, pool_maxsize=pool_size
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class DownloadScheduler:
+    """
+    Run downloads with timeouts, retries and global limits.
+
+    The limits are shared by all downloads of the scheduler, even from
+    different threads or download_all calls:
+        - at most max_concurrent transfers at the same time
+        - at most max_bytes_per_sec received by all transfers together
+
+    Connection errors, timeouts, interrupted transfers and temporary server
+    errors (RETRY_STATUS) are retried with exponential backoff and full
+    jitter. Interrupted transfers are resumed (see download_file). A
+    conditional download of a file that already exists locally is not
+    retried after a connection error: the caller can use the local copy
+    right away (ex: offline).
+
+    Each local file is downloaded holding its lock file (see FileLock), so
+    processes sharing the data directory never write the same file at the
+    same time. A conditional download that waited for another process to
+    download the same file is not repeated (status 304).
+    """
+
+    def __init__(
+        self,
+        *,
+        max_concurrent=4,
+        max_bytes_per_sec=None,
+        retries=3,
+        backoff=1.0,
+        backoff_max=60.0,
+        timeout=(10, 60),
+    ):
+        """
+        Initialize the scheduler.
+
+        Keyword arguments (opt):
+            max_concurrent      (int): max number of simultaneous transfers
+                                       default 4
+            max_bytes_per_sec   (int): max transfer rate of all downloads
+                                       default: no limit
+            retries             (int): retries after the first attempt
+                                       default 3
+            backoff           (float): wait (seconds) before the first retry.
+                                       It doubles after each retry
+                                       default 1.0
+            backoff_max       (float): max wait (seconds) between retries
+                                       default 60.0
+            timeout  (float or tuple): connect and read timeouts (seconds)
+                                       default (10, 60)
+        """
+        self.max_concurrent = max_concurrent
+        self.max_bytes_per_sec = max_bytes_per_sec
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        # Momento (time.monotonic) em que termina a cota de bytes reservada
+        self._clock = 0.0
+
+    def throttle(self, size):
+        """Sleep as needed to keep all transfers under max_bytes_per_sec."""
+        if not self.max_bytes_per_sec:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._clock = max(self._clock, now) + size / self.max_bytes_per_sec
+            delay = self._clock - now
+        time.sleep(delay)
+
+    def wait_time(self, attempt, res=None):
+        """
+        Return the wait (seconds) before a retry.
+
+        Arguments:
+            attempt            (int): Number of the failed attempt (1, 2, ...)
+            res  (requests.Response): Failed response. A numeric Retry-After
+                                      header is used as the minimum wait
+        """
+        wait = random.uniform(
+            0, min(self.backoff_max, self.backoff * 2 ** (attempt - 1))
+        )
+        retry_after = res.headers.get("Retry-After", "") if res is not None else ""
+        if retry_after.isdigit():
+            wait = max(wait, min(self.backoff_max, int(retry_after)))
+        return wait
+
+    def download(self, url, local_file, **kwargs):
+        """
+        Download a file, retrying temporary failures.
+
+        Arguments:
+            url                    (str): URL to download
+            local_file             (str): Local filename
+            kwargs                (dict): Arguments of download_file
+
+        Return:
+            DownloadResult. status_code is None if the last attempt failed
+            without a response (error has the reason)
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            res = None
+            meta = read_json(file_meta_name(local_file))
+            try:
+                with FileLock(lock_file_name(local_file)) as lock:
+                    if (
+                        lock.contended
+                        and kwargs.get("conditional")
+                        and read_json(file_meta_name(local_file)) != meta
+                        and read_file_meta(local_file)
+                    ):
+                        log.debug("Arquivo %s baixado por outro processo", local_file)
+                        return DownloadResult(url, local_file, 304, None, attempt)
+                    with self._slots:
+                        res = download_file(
+                            url,
+                            local_file,
+                            timeout=self.timeout,
+                            throttle=self.throttle,
+                            **kwargs,
+                        )
+            except (requests.RequestException, OSError) as error:
+                log.debug("Erro ao baixar %s (tentativa %s): %s", url, attempt, error)
+                result = DownloadResult(url, local_file, None, str(error), attempt)
+                if (
+                    isinstance(error, requests.ConnectionError)
+                    and kwargs.get("conditional")
+                    and os.path.exists(local_file)
+                ):
+                    return result
+            else:
+                result = DownloadResult(url, local_file, res.status_code, None, attempt)
+                if res.status_code not in RETRY_STATUS:
+                    return result
+                log.debug(
+                    "Status %s ao baixar %s (tentativa %s)",
+                    res.status_code,
+                    url,
+                    attempt,
+                )
+
+            if attempt > self.retries:
+                return result
+            time.sleep(self.wait_time(attempt, res))
+
+    def download_all(self, downloads, *, max_workers=None, **kwargs):
+        """
+        Download several files concurrently sharing one HTTP session.
+
+        Arguments:
+            downloads     (list): list of tuples (url, local_file)
+
+        Keyword arguments (opt):
+            max_workers    (int): threads used by this call. The number of
+                                  simultaneous transfers is also limited by
+                                  max_concurrent. default max_concurrent
+            kwargs        (dict): Arguments of download_file
+
+        Return:
+            List of DownloadResult, in the same order of "downloads"
+        """
+        if not downloads:
+            return []
+
+        max_workers = max_workers or self.max_concurrent
+        with create_session(max_workers) as session:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as pool:
+                futures = [
+                    pool.submit(
+                        self.download, url, local_file, session=session, **kwargs
+                    )
+                    for url, local_file in downloads
+                ]
+                return [future.result() for future in futures]
+
+
+def download_failures(results):
+    """
+    Return a summary of the failed downloads.
+
+    Files not found (404) and not modified (304) are not failures.
+
+    Arguments:
+        results       (list): list of DownloadResult
+
+    Return:
+        List of dictionaries with url, local_file, status_code, error and
+        attempts of each failed download
+    """
+    return [
+        result._asdict()
+        for result in results
+        if result.status_code not in (200, 304, 404)
+    ]
+
+
+def download_files(
+    downloads,
+    *,
+    max_workers=4,
+    allow_redirects=True,
+    decode=True,
+    conditional=False,
+    scheduler=None,
+):
+    """
+    Download several files concurrently sharing one HTTP session.
+
+    Arguments:
+        downloads     (list): list of tuples (url, local_file)
+
+    Keyword arguments (opt):
+        max_workers    (int): max number of simultaneous downloads
+                              default 4
+        allow_redirects (True/False): Allow request to redirect url
+                                      default: True
+        decode          (True/False): Decode compressed responses like gzip
+                                      default: True
+        conditional     (True/False): Make conditional requests (see download_file)
+                                      default: False
+        scheduler (DownloadScheduler): Scheduler with the retries and limits.
+                                       default: a scheduler without retries
+                                       limited to max_workers transfers
+
+    Return:
+        List of DownloadResult, in the same order of "downloads".
+        status_code is None if the request failed (error has the reason)
+    """
+    scheduler = scheduler or DownloadScheduler(
+        max_concurrent=max_workers, retries=0, timeout=None
+    )
+    return scheduler.download_all(
+        downloads,
+        max_workers=max_workers,
+        allow_redirects=allow_redirects,
+        decode=decode,
+        conditional=conditional,
+    )
+
+
 # vim: ts=4
@@ -34,6 +34,7 @@ setuptools.setup(
     long_description=read_file("README.md"),
     long_description_content_type="text/markdown",
     install_requires=read_file("requirements.txt").splitlines(),
+    extras_require={"arrow": ["pyarrow"]},
     packages=setuptools.find_packages(
         exclude=(["tests", "*.tests", "*.tests.*", "tests.*"])
     ),
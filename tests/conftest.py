@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""Shared pytest fixtures."""
+
+import functools
+import http.server
+import threading
+import time
+from unittest.mock import Mock
+import pytest
+from fundosbr import fundosbr
+
+INFORME_HEADER = (
+    "CNPJ_FUNDO;DT_COMPTC;VL_TOTAL;VL_QUOTA;VL_PATRIM_LIQ;CAPTC_DIA;RESG_DIA;NR_COTST"
+)
+INFORME_ROWS = {
+    "202002": [
+        "11.000.000/0000-00;2020-02-03;1234.52;12.00000;1111111113.62;2.00;0.00;11",
+        "11.000.000/0000-00;2020-02-21;1234.55;16.00000;1111111113.65;1.00;2.00;14",
+        "22.000.000/0000-00;2020-02-03;1234.52;22.00000;1111111113.62;2.00;0.00;11",
+        "22.000.000/0000-00;2020-02-21;1234.55;26.00000;1111111113.65;1.00;2.00;14",
+        "33.000.000/0000-00;2020-02-03;1234.52;5.00000;1111111113.62;2.00;0.00;3",
+    ],
+    "202003": [
+        "11.000.000/0000-00;2020-03-02;1234.51;10.00000;1111111113.61;1.00;0.00;15",
+        "11.000.000/0000-00;2020-03-31;1234.51;18.00000;1111111113.61;1.00;0.00;18",
+        "22.000.000/0000-00;2020-03-02;1234.51;20.00000;1111111113.61;1.00;0.00;15",
+        "22.000.000/0000-00;2020-03-31;1234.51;28.00000;1111111113.61;1.00;0.00;18",
+        "33.000.000/0000-00;2020-03-31;1234.51;6.00000;1111111113.61;1.00;0.00;4",
+    ],
+    "202004": [
+        "11.000.000/0000-00;2020-04-01;1234.51;16.00000;1111111113.61;0.00;0.00;17",
+        "11.000.000/0000-00;2020-04-30;1234.51;28.00000;1111111113.61;1.00;0.00;25",
+        "22.000.000/0000-00;2020-04-01;1234.51;26.00000;1111111113.61;0.00;0.00;17",
+        "22.000.000/0000-00;2020-04-30;1234.51;12.00000;1111111113.61;1.00;0.00;25",
+    ],
+}
+
+
+@pytest.fixture
+def http_server(tmp_path):
+    """Local http server serving files from a temporary directory."""
+    www_dir = tmp_path / "www"
+    www_dir.mkdir()
+    handler = functools.partial(
+        http.server.SimpleHTTPRequestHandler, directory=str(www_dir)
+    )
+    handler.log_message = lambda *args: None
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield "http://127.0.0.1:{}".format(server.server_address[1]), www_dir
+    server.shutdown()
+    server.server_close()
+
+
+class HandlerFalhas(http.server.BaseHTTPRequestHandler):
+    """
+    Serve arquivos com suporte a Range (If-Range) e falhas programadas.
+
+    server.falhas: {caminho: lista de falhas das proximas requisicoes}. Cada
+    falha eh um status http (ex: 503) ou ("corta", bytes) para fechar a
+    conexao depois de enviar alguns bytes do arquivo ou ("lento", segundos)
+    para esperar antes de responder.
+    server.requisicoes: lista de (caminho, headers) recebidos.
+    server.max_simultaneas: maior numero de requisicoes atendidas ao mesmo tempo.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        """Nao mostra o log das requisicoes."""
+
+    def envia_status(self, status, headers=None):
+        """Envia uma resposta sem corpo."""
+        self.send_response(status)
+        for header, valor in (headers or {}).items():
+            self.send_header(header, valor)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        """Responde o GET de um arquivo."""
+        with self.server.lock:
+            self.server.simultaneas += 1
+            self.server.max_simultaneas = max(
+                self.server.max_simultaneas, self.server.simultaneas
+            )
+        try:
+            self.responde()
+        finally:
+            with self.server.lock:
+                self.server.simultaneas -= 1
+
+    def responde(self):
+        """Responde a requisicao aplicando a proxima falha programada."""
+        self.server.requisicoes.append((self.path, dict(self.headers)))
+        falhas = self.server.falhas.get(self.path)
+        falha = falhas.pop(0) if falhas else None
+        if isinstance(falha, tuple) and falha[0] == "lento":
+            time.sleep(falha[1])
+        if isinstance(falha, int):
+            self.envia_status(falha)
+            return
+
+        arquivo = self.server.www_dir / self.path.lstrip("/")
+        if not arquivo.is_file():
+            self.envia_status(404)
+            return
+        dados = arquivo.read_bytes()
+        stat = arquivo.stat()
+        etag = '"{:x}-{:x}"'.format(stat.st_size, stat.st_mtime_ns)
+        headers = {"ETag": etag, "Accept-Ranges": "bytes"}
+        if self.headers.get("If-None-Match") == etag:
+            self.envia_status(304, headers)
+            return
+
+        inicio = 0
+        intervalo = self.headers.get("Range")
+        if intervalo and self.headers.get("If-Range", etag) == etag:
+            inicio = int(intervalo.split("=")[1].split("-")[0])
+            if inicio >= len(dados):
+                self.envia_status(
+                    416, {"Content-Range": "bytes */{}".format(len(dados))}
+                )
+                return
+            self.send_response(206)
+            headers["Content-Range"] = "bytes {}-{}/{}".format(
+                inicio, len(dados) - 1, len(dados)
+            )
+        else:
+            self.send_response(200)
+        for header, valor in headers.items():
+            self.send_header(header, valor)
+        self.send_header("Content-Length", str(len(dados) - inicio))
+        self.end_headers()
+
+        corpo = dados[inicio:]
+        if isinstance(falha, tuple) and falha[0] == "corta":
+            self.wfile.write(corpo[: falha[1]])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(corpo)
+
+
+@pytest.fixture
+def http_server_falhas(tmp_path):
+    """Local http server with Range support and programmed failures."""
+    www_dir = tmp_path / "www_falhas"
+    www_dir.mkdir()
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), HandlerFalhas)
+    server.www_dir = www_dir
+    server.falhas = {}
+    server.requisicoes = []
+    server.lock = threading.Lock()
+    server.simultaneas = 0
+    server.max_simultaneas = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield "http://127.0.0.1:{}".format(server.server_address[1]), server
+    server.shutdown()
+    server.server_close()
+
+
+CADASTRAL_ROWS = [
+    "CNPJ_FUNDO;DENOM_SOCIAL;DT_REG;DT_CONST;DT_CANCEL;SIT;DT_INI_SIT;CLASSE;GESTOR;ADMIN",
+    "11.000.000/0000-00;FUNDO ANTIGO CANCELADO;2001-05-10;2001-05-01;2005-01-01;"
+    "CANCELADA;2005-01-01;Fundo de Ações;GESTOR A;ADMIN A",
+    "11.000.000/0000-00;VERDE AÇÕES FUNDO DE INVESTIMENTO;2010-01-15;2010-01-10;;"
+    "EM FUNCIONAMENTO NORMAL;2010-01-15;Fundo de Ações;GESTOR A;ADMIN A",
+    "22.000.000/0000-00;AZUL MULTIMERCADO FUNDO DE INVESTIMENTO;2012-03-01;"
+    "2012-02-20;;EM FUNCIONAMENTO NORMAL;2012-03-01;Fundo Multimercado;"
+    "GESTOR B;ADMIN B",
+    "33.000.000/0000-00;VERDE CAMBIAL FUNDO;2015-07-01;2015-06-01;2019-01-01;"
+    "CANCELADA;2019-01-01;Fundo Cambial;GESTOR C;ADMIN A",
+    "33.000.000/0000-00;VERDE CAMBIAL FUNDO II;2016-07-01;2016-06-01;2019-02-01;"
+    "CANCELADA;2019-02-01;Fundo Cambial;GESTOR C;ADMIN A",
+    "44.000.000/0000-00;IP PARTICIPAÇÕES AÇÕES FIA;2018-01-01;2017-12-01;;"
+    "EM FUNCIONAMENTO NORMAL;2018-01-01;Fundo de Ações;GESTOR D;ADMIN B",
+]
+
+
+@pytest.fixture
+def cadastral(tmp_path, monkeypatch):
+    """Instancia da classe Cadastral com um arquivo cad_fi.csv local."""
+    csv_dir = tmp_path / "fundosbr_cadastral"
+    csv_dir.mkdir()
+    cad_file = csv_dir / "cad_fi.csv"
+    cad_file.write_text("\n".join(CADASTRAL_ROWS) + "\n", encoding="ISO-8859-1")
+    monkeypatch.setattr(fundosbr, "CSV_FILES_DIR", str(csv_dir))
+    fundosbr.log = Mock()
+
+    inf_cadastral = fundosbr.Cadastral()
+    inf_cadastral.download_inf_cadastral = Mock()
+    inf_cadastral.filename = str(cad_file)
+    return inf_cadastral
+
+
+@pytest.fixture
+def informe_csv_dir(tmp_path, monkeypatch):
+    """Diretorio de dados com arquivos csv de informe (202002 a 202004)."""
+    csv_dir = tmp_path / "fundosbr_dados"
+    csv_dir.mkdir()
+    for data, rows in INFORME_ROWS.items():
+        (csv_dir / "inf_diario_fi_{}.csv".format(data)).write_text(
+            "\n".join([INFORME_HEADER] + rows) + "\n", encoding="ISO-8859-1"
+        )
+    monkeypatch.setattr(fundosbr, "CSV_FILES_DIR", str(csv_dir))
+    return csv_dir
+
+
+# vim: ts=4
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""Test ArmazemCnpj class."""
+
+from unittest.mock import Mock
+import pandas as pd
+from fundosbr import fundosbr
+
+
+def test_historico(informe_csv_dir):
+    """Test historico do armazem igual ao lido dos informes."""
+    fundosbr.log = Mock()
+    filenames = {str(f) for f in informe_csv_dir.glob("*.csv")}
+    armazem = fundosbr.ArmazemCnpj()
+
+    assert armazem.atualiza(filenames) == ["202002", "202003", "202004"]
+    assert armazem.atualiza(filenames) == []
+
+    informe = fundosbr.Informe()
+    informe.filenames = filenames
+    informe.cria_df_informe(cnpj="33.000.000/0000-00")
+    historico = armazem.historico(
+        ["33.000.000/0000-00"], ["202002", "202003", "202004"]
+    )
+    pd.testing.assert_frame_equal(historico, informe.pd_df.sort_index())
+
+    historico = armazem.historico(["33.000.000/0000-00"], ["202002"], ["VL_QUOTA"])
+    assert historico["VL_QUOTA"].tolist() == [5.0]
+
+    assert armazem.historico(["99.000.000/0000-00"], ["202002"]).empty
+
+
+def test_atualiza_nova_versao(informe_csv_dir):
+    """Test nova versao de um informe eh ingerida novamente."""
+    fundosbr.log = Mock()
+    filenames = {str(f) for f in informe_csv_dir.glob("*.csv")}
+    armazem = fundosbr.ArmazemCnpj()
+    armazem.atualiza(filenames)
+
+    with open(str(informe_csv_dir / "inf_diario_fi_202004.csv"), "a") as fd:
+        fd.write(
+            "33.000.000/0000-00;2020-04-30;1.0;7.00000;1111111113.61;0.00;0.00;5\n"
+        )
+    assert armazem.atualiza(filenames) == ["202004"]
+    historico = armazem.historico(["33.000.000/0000-00"], ["202003", "202004"])
+    assert historico["VL_QUOTA"].tolist() == [6.0, 7.0]
+
+
+def test_cria_df_informe_armazem(informe_csv_dir):
+    """Test cria_df_informe lendo do armazem particionado por cnpj."""
+    fundosbr.log = Mock()
+    fundosbr.msg = Mock()
+    filenames = {str(f) for f in informe_csv_dir.glob("*.csv")}
+    cnpjs = "11.000.000/0000-00,33.000.000/0000-00"
+
+    informe = fundosbr.Informe()
+    informe.filenames = filenames
+    ret = informe.cria_df_informe(cnpj=cnpjs)
+
+    informe_armazem = fundosbr.Informe()
+    informe_armazem.filenames = filenames
+    ret_armazem = informe_armazem.cria_df_informe(
+        cnpj=cnpjs, armazem=fundosbr.ArmazemCnpj()
+    )
+
+    assert ret == ret_armazem == 0
+    pd.testing.assert_frame_equal(
+        informe_armazem.pd_df.sort_index(), informe.pd_df.sort_index()
+    )
+
+
+# vim: ts=4
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""Test CacheDados class."""
+
+import argparse
+import os
+import time
+from unittest.mock import Mock, patch
+import pytest
+from fundosbr import fundosbr
+from fundosbr.fundosbrlib import file_checksum
+from fundosbr.fundosbrlib import mark_file_immutable
+from fundosbr.fundosbrlib import read_json
+from fundosbr.fundosbrlib import touch_access
+from conftest import INFORME_ROWS
+
+DATAS = ["202002", "202003", "202004"]
+
+
+@pytest.fixture
+def cache_dados(informe_csv_dir):
+    """Diretorio de dados com informes, caches, particoes e retornos."""
+    fundosbr.log = Mock()
+    filenames = {str(f) for f in informe_csv_dir.glob("*.csv")}
+    informe = fundosbr.Informe()
+    for file_mes in filenames:
+        informe.le_informe_mensal(file_mes)
+    fundosbr.ArmazemCnpj().atualiza(filenames, informe)
+    fundosbr.TabelaRetornos().atualiza(filenames, informe)
+
+    # Ultimo acesso: 202002 ha mais tempo, 202004 mais recente
+    agora = time.time()
+    for num, data in enumerate(DATAS):
+        arquivo = informe_csv_dir / "inf_diario_fi_{}.csv".format(data)
+        os.utime(str(arquivo), (agora - 3600 * (3 - num), arquivo.stat().st_mtime))
+    (informe_csv_dir / "locks" / "x.lock").write_text("")
+    return fundosbr.CacheDados()
+
+
+def test_itens(cache_dados, informe_csv_dir):
+    """Test tamanho e ultimo acesso de cada mes."""
+    itens = cache_dados.itens()
+    assert itens.index.tolist() == DATAS
+    for data in DATAS:
+        csv_file = informe_csv_dir / "inf_diario_fi_{}.csv".format(data)
+        assert itens.loc[data, "Informe"] >= csv_file.stat().st_size
+    assert (itens["Derivados"] > 0).all()
+    assert itens["Ultimo acesso"].is_monotonic_increasing
+    assert not itens["Imutavel"].any()
+    assert not itens["Compactado"].any()
+
+    arquivos = cache_dados.arquivos()["202003"]["derivado"]
+    relativos = sorted(os.path.relpath(a, str(informe_csv_dir)) for a in arquivos)
+    assert [r.split(os.sep)[0] for r in relativos][:1] == ["cache"]
+    assert {r.split(os.sep)[0] for r in relativos} == {"cache", "por_cnpj", "retornos"}
+
+    csv_file = informe_csv_dir / "inf_diario_fi_202002.csv"
+    mtime_ns = csv_file.stat().st_mtime_ns
+    touch_access(str(csv_file))
+    assert csv_file.stat().st_mtime_ns == mtime_ns
+    assert cache_dados.itens()["Ultimo acesso"].idxmax() == "202002"
+
+
+def test_compacta(cache_dados, informe_csv_dir, http_server):
+    """Test informe compactado mantem o cache e nao eh baixado de novo."""
+    url, _ = http_server
+    csv_file = informe_csv_dir / "inf_diario_fi_202002.csv"
+    checksum = file_checksum(str(csv_file))
+    mark_file_immutable(str(csv_file))
+
+    assert cache_dados.compacta("202002") > 0
+    zip_file = informe_csv_dir / "inf_diario_fi_202002.zip"
+    assert not csv_file.exists()
+    assert file_checksum(str(zip_file)) == checksum
+    assert cache_dados.itens().loc["202002", "Compactado"]
+
+    informe = fundosbr.Informe()
+    with patch.object(fundosbr, "URL_INFORME_DIARIO", url):
+        assert informe.download_informes_mensais(["202002"]) == {"202002": "local"}
+    assert informe.filenames == {str(zip_file)}
+    with patch.object(fundosbr.Informe, "le_csv_informe") as mock_le_csv:
+        informe.cria_df_informe()
+    mock_le_csv.assert_not_called()
+    assert informe.pd_df.shape[0] == len(INFORME_ROWS["202002"])
+    assert fundosbr.ArmazemCnpj().atualiza(informe.filenames) == []
+
+
+def test_aplica_limite(cache_dados, informe_csv_dir):
+    """Test compacta os meses imutaveis e remove os usados ha mais tempo."""
+    for data in ["202002", "202003"]:
+        mark_file_immutable(str(informe_csv_dir / "inf_diario_fi_{}.csv".format(data)))
+    itens = cache_dados.itens()
+    total = int(itens[["Informe", "Derivados"]].to_numpy().sum())
+
+    assert cache_dados.aplica_limite(total) == []
+    acoes = cache_dados.aplica_limite(total - 1)
+    assert [acao[:2] for acao in acoes] == [("compactado", "202002")]
+
+    acoes = cache_dados.aplica_limite(1, protegidos={"202004"})
+    assert [acao[:2] for acao in acoes] == [
+        ("compactado", "202003"),
+        ("removido", "202002"),
+        ("removido", "202003"),
+    ]
+    assert cache_dados.itens().index.tolist() == ["202004"]
+    for diretorio in ["por_cnpj", "retornos"]:
+        indice = read_json(str(informe_csv_dir / diretorio / "indice.json"))
+        assert list(indice["meses"]) == ["202004"]
+
+    # Meses removidos sao processados de novo quando usados
+    fundosbr.TabelaRetornos().atualiza(
+        [str(informe_csv_dir / "inf_diario_fi_202004.csv")]
+    )
+
+
+def test_cmd_cache(cache_dados, capsys):
+    """Test listagem do comando cache."""
+    fundosbr.msg = Mock()
+    args = argparse.Namespace(aquece=False, limite=0, datainicio=None, datafim=None)
+    fundosbr.cmd_cache(args)
+    saida = capsys.readouterr().out
+    for data in DATAS:
+        assert data in saida
+    assert "MB" in saida
+
+
+# vim: ts=4
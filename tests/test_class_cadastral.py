@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""Test Cadastral class."""
+
+import os
+from unittest.mock import patch
+import pytest
+import pandas as pd
+from fundosbr import fundosbr
+
+
+def test_busca_fundo_cnpj_registro_unico(cadastral):
+    """Test registro nao cancelado e mais recente prevalece."""
+    fundo = cadastral.busca_fundo_cnpj("11.000.000/0000-00")
+    assert fundo["DENOM_SOCIAL"] == "VERDE AÇÕES FUNDO DE INVESTIMENTO"
+    fundo = cadastral.busca_fundo_cnpj("33.000.000/0000-00")
+    assert fundo["DENOM_SOCIAL"] == "VERDE CAMBIAL FUNDO II"
+
+    assert cadastral.df_unico.index.is_unique
+    assert cadastral.df_unico.index.is_monotonic_increasing
+    assert len(cadastral.df_unico) == 4
+
+    with pytest.raises(KeyError):
+        cadastral.busca_fundo_cnpj("99.000.000/0000-00")
+
+
+def test_cadastro_unico_persistido(cadastral):
+    """Test cadastro unico eh criado apenas uma vez por versao do csv."""
+    cadastral.cria_df_cadastral_unico()
+    cache_dir = os.path.join(fundosbr.CSV_FILES_DIR, "cache")
+    assert len(os.listdir(cache_dir)) == 1
+
+    novo_cadastral = fundosbr.Cadastral()
+    novo_cadastral.filename = cadastral.filename
+    with patch.object(novo_cadastral, "cria_df_cadastral") as mock_cria:
+        novo_cadastral.cria_df_cadastral_unico()
+    mock_cria.assert_not_called()
+    assert novo_cadastral.df_unico.equals(cadastral.df_unico)
+
+
+def test_nomes_por_cnpj(cadastral):
+    """Test busca de nomes de varios fundos."""
+    nomes = cadastral.nomes_por_cnpj(
+        ["44.000.000/0000-00", "11.000.000/0000-00", "44.000.000/0000-00"]
+    )
+    assert nomes.index.tolist() == ["44.000.000/0000-00", "11.000.000/0000-00"]
+    assert nomes.tolist() == [
+        "IP PARTICIPAÇÕES AÇÕES FIA",
+        "VERDE AÇÕES FUNDO DE INVESTIMENTO",
+    ]
+
+
+@pytest.mark.parametrize(
+    "consulta, esperado",
+    [
+        ("verde", ["33", "33", "11"]),
+        ("acoes", ["44", "11"]),
+        ("AÇÕES verde", ["11"]),
+        ("ip participa", ["44"]),
+        ("cambial ii", ["33"]),
+        ("inexistente", []),
+    ],
+)
+def test_busca_fundos_nome(cadastral, consulta, esperado):
+    """Test busca por nome sem acentos e com varias palavras."""
+    fundo_df = cadastral.busca_fundos(consulta, all_situacoes=True)
+    assert [cnpj[:2] for cnpj in fundo_df.index] == esperado
+
+
+def test_busca_fundos_relevancia(cadastral):
+    """Test palavra completa eh mais relevante que parte da palavra."""
+    indice = fundosbr.IndiceNomes(["FUNDO VERDEJANTE", "FUNDO VERDE", "VERDE FUNDO"])
+    assert indice.busca("verde") == [2, 1, 0]
+    assert indice.busca("fundo verde") == [1, 0, 2]
+    assert indice.busca("verde", limite=1) == [2]
+
+
+def test_indice_nomes_persistido(cadastral):
+    """Test indice de nomes eh reutilizado por outra instancia."""
+    cadastral.cria_indice_nomes()
+    novo_cadastral = fundosbr.Cadastral()
+    novo_cadastral.filename = cadastral.filename
+    with patch.object(fundosbr.IndiceNomes, "__init__") as mock_init:
+        nomes = novo_cadastral.sugere_nomes("verde cam")
+    mock_init.assert_not_called()
+    assert nomes.tolist() == ["VERDE CAMBIAL FUNDO", "VERDE CAMBIAL FUNDO II"]
+
+
+def test_indice_nomes_versao(cadastral):
+    """Test nova versao do indice de nomes nao usa o indice persistido."""
+    cadastral.cria_indice_nomes()
+    novo_cadastral = fundosbr.Cadastral()
+    novo_cadastral.filename = cadastral.filename
+    with patch.object(fundosbr.IndiceNomes, "versao_schema", 2):
+        novo_cadastral.cria_indice_nomes()
+    assert novo_cadastral.indice_nomes.busca("verde cam")
+    caches = os.listdir(os.path.join(fundosbr.CSV_FILES_DIR, "cache"))
+    assert [f[-6:] for f in caches if f.startswith("cad_fi_indice_nomes.")] == [
+        "v2.pkl"
+    ]
+
+
+def test_cria_df_cadastral_schema(cadastral):
+    """Test tipos das colunas do DataFrame cadastral."""
+    cadastral.cria_df_cadastral()
+    dtypes = cadastral.pd_df.dtypes
+    assert dtypes["SIT"] == "category"
+    assert dtypes["CLASSE"] == "category"
+    assert dtypes["GESTOR"] == "category"
+    assert dtypes["DT_REG"] == "datetime64[ns]"
+    assert pd.isna(cadastral.pd_df.loc["22.000.000/0000-00", "DT_CANCEL"])
+    assert cadastral.busca_fundo_cnpj("44.000.000/0000-00")["DT_REG"] == (
+        pd.Timestamp("2018-01-01")
+    )
+
+
+# vim: ts=4
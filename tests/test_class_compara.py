@@ -91,9 +91,91 @@ def test_denom_social_cnpjs(df_informe):
 
     fundosbr.log = Mock()
     cadastral = Mock()
-    cadastral.fundo_social_nome = Mock(return_value=nome_fundo)
+    cadastral.nomes_por_cnpj = Mock(
+        side_effect=lambda cnpjs: pd.Series(nome_fundo, index=cnpjs)
+    )
     informe = Mock()
     compara = fundosbr.Compara(cadastral, informe)
 
     x = compara.adiciona_denom_social(df_informe)
     pd.testing.assert_frame_equal(x, expected_result)
+
+
+def test_denom_social_join(cadastral):
+    fundosbr.log = Mock()
+    compara = fundosbr.Compara(cadastral, Mock())
+    fundo_df = pd.DataFrame(
+        {"Rentabilidade": [1.0, 2.0, 3.0]},
+        index=pd.Index(
+            ["22.000.000/0000-00", "11.000.000/0000-00", "99.000.000/0000-00"],
+            name="CNPJ_FUNDO",
+        ),
+    )
+
+    x = compara.adiciona_denom_social(fundo_df)
+    assert x["Denominacao social"].tolist()[:2] == [
+        "AZUL MULTIMERCADO FUNDO DE INVESTIMENTO",
+        "VERDE AÇÕES FUNDO DE INVESTIMENTO",
+    ]
+    assert pd.isna(x["Denominacao social"].iloc[2])
+
+
+@pytest.mark.parametrize(
+    "col_filtro, expected_result",
+    [
+        ("NR_COTST", {"11.000.000/0000-00": 25.0, "33.000.000/0000-00": 4.0}),
+        ("VL_QUOTA", {"11.000.000/0000-00": 28.0, "33.000.000/0000-00": 6.0}),
+    ],
+)
+def test_calc_rank_simples(informe_csv_dir, col_filtro, expected_result):
+    fundosbr.log = Mock()
+    fundosbr.msg = Mock()
+    informe = fundosbr.Informe()
+    informe.filenames = {str(f) for f in informe_csv_dir.glob("*.csv")}
+    compara = fundosbr.Compara(Mock(), informe)
+    compara.cnpjs = pd.Index(
+        ["33.000.000/0000-00", "11.000.000/0000-00", "99.000.000/0000-00"]
+    )
+
+    x = compara.calc_rank_simples(2, col_filtro)
+    assert x[col_filtro].to_dict() == expected_result
+    # cnpjs sem informe (ex: 99) sao ignorados no rank
+    fundosbr.msg.assert_not_called()
+
+
+def test_cnpjs_em_funcionamento(cadastral):
+    fundosbr.log = Mock()
+    cnpjs = cadastral.cnpjs_em_funcionamento("acoes")
+    assert isinstance(cnpjs, pd.Index)
+    assert cnpjs.tolist() == ["11.000.000/0000-00", "44.000.000/0000-00"]
+
+
+@pytest.mark.parametrize("retornos", [False, True])
+def test_calc_rank_classes(informe_csv_dir, cadastral, retornos):
+    fundosbr.msg = Mock()
+    informe = fundosbr.Informe()
+    informe.filenames = {str(f) for f in informe_csv_dir.glob("*.csv")}
+    tabela = fundosbr.TabelaRetornos() if retornos else None
+    compara = fundosbr.Compara(cadastral, informe, tabela)
+
+    x = compara.calc_rank_classes(5)
+    assert x[["Classe", "Metrica", "Posicao", "CNPJ_FUNDO"]].values.tolist() == [
+        ["acoes", "cotistas", 1, "11.000.000/0000-00"],
+        ["multimercado", "cotistas", 1, "22.000.000/0000-00"],
+        ["acoes", "patrimonio", 1, "11.000.000/0000-00"],
+        ["multimercado", "patrimonio", 1, "22.000.000/0000-00"],
+        ["acoes", "rentabilidade", 1, "11.000.000/0000-00"],
+        ["multimercado", "rentabilidade", 1, "22.000.000/0000-00"],
+    ]
+    assert x["Valor"].tolist()[-2:] == pytest.approx([28 / 12 * 100 - 100, -500 / 11])
+
+    ranks = compara.rank_estruturado(x)
+    assert ranks["acoes"]["cotistas"] == [
+        {
+            "posicao": 1,
+            "cnpj": "11.000.000/0000-00",
+            "denominacao_social": "VERDE AÇÕES FUNDO DE INVESTIMENTO",
+            "valor": 25.0,
+        }
+    ]
+    assert list(ranks["multimercado"]) == ["cotistas", "patrimonio", "rentabilidade"]
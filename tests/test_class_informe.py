@@ -2,11 +2,17 @@
 """Test Informe class."""
 
 import pytest
+import os
+import pickle
+import sys
 from unittest.mock import patch, Mock
 from io import StringIO
 import pandas as pd
 from fundosbr import fundosbr
 
+# fundosbrlib como importado pelo fundosbr (ver sys.path em fundosbr.py)
+fundosbrlib = sys.modules[fundosbr.read_columnar.__module__]
+
 
 @pytest.fixture
 def df_informe():
@@ -84,3 +90,211 @@ ano  mes
     with patch.object(informe, "pd_df", df_informe):
         x = informe.calc_estatistica_mensal()
     assert x == expected_result
+
+
+def test_varios_fundos(informe_csv_dir):
+    """Test saldo e estatistica mensal de varios fundos iguais aos de cada fundo."""
+    fundosbr.log = Mock()
+    filenames = {str(f) for f in informe_csv_dir.glob("*.csv")}
+    informe = fundosbr.Informe()
+    informe.filenames = filenames
+    informe.cria_df_informe()
+    saldo_df = informe.saldo_periodo()
+    mes_df = informe.estatistica_mensal()
+    assert mes_df.index.names == ["CNPJ_FUNDO", "ano", "mes"]
+    assert "11.000.000/0000-00" in informe.mostra_informe_fundo()
+
+    cnpjs = ["11.000.000/0000-00", "22.000.000/0000-00", "33.000.000/0000-00"]
+    assert saldo_df.index.tolist() == cnpjs
+    for cnpj in cnpjs:
+        fundo = fundosbr.Informe()
+        fundo.filenames = filenames
+        fundo.cria_df_informe(cnpj=cnpj)
+        assert informe.remove_index_cnpj(saldo_df.loc[[cnpj]]).iloc[0].to_dict() == (
+            fundo.saldo_periodo().iloc[0].to_dict()
+        )
+        pd.testing.assert_frame_equal(
+            mes_df.loc[cnpj], fundo.estatistica_mensal(), check_dtype=False
+        )
+    assert saldo_df.loc["22.000.000/0000-00", "Rentabilidade cota"] == (
+        pytest.approx(-45.45, abs=0.01)
+    )
+    assert mes_df.loc["33.000.000/0000-00"].shape[0] == 1
+
+
+def test_cmd_informes_varios_fundos(informe_csv_dir, cadastral, tmp_path, capsys):
+    """Test comando informe com lista e arquivo de cnpjs."""
+    fundosbr.msg = Mock()
+    arquivo = tmp_path / "cnpjs.txt"
+    arquivo.write_text("# fundos\n22.000.000/0000-00\n99.000.000/0000-00\n")
+    filenames = {str(f) for f in informe_csv_dir.glob("*.csv")}
+
+    def download(informe, datas):
+        informe.filenames = filenames
+
+    args = Mock(
+        cnpj=["11.000.000/0000-00,22.000.000/0000-00"],
+        arquivo=str(arquivo),
+        datainicio=202002,
+        datafim=202004,
+        mensal=True,
+    )
+    assert fundosbr.lista_cnpjs(args.cnpj, args.arquivo) == [
+        "11.000.000/0000-00",
+        "22.000.000/0000-00",
+        "99.000.000/0000-00",
+    ]
+    with patch.object(fundosbr, "Cadastral", return_value=cadastral), patch.object(
+        fundosbr.Informe, "download_informes_mensais", download
+    ):
+        fundosbr.cmd_informes_fundo(args)
+    saida = capsys.readouterr().out
+    assert "AZUL MULTIMERCADO" in saida
+    # Uma linha no saldo e um grupo na estatistica mensal
+    assert saida.count("22.000.000/0000-00") == 2
+    assert "99.000.000/0000-00" in str(fundosbr.msg.call_args_list)
+
+
+def test_cria_df_informe_cache(informe_csv_dir):
+    """Test cache colunar gera o mesmo DataFrame que o csv."""
+    fundosbr.log = Mock()
+    filenames = {str(f) for f in informe_csv_dir.glob("*.csv")}
+
+    informe_csv = fundosbr.Informe(cache=False)
+    informe_csv.filenames = filenames
+    informe_csv.cria_df_informe()
+    assert not (informe_csv_dir / "cache").exists()
+
+    for _ in range(2):
+        informe = fundosbr.Informe()
+        informe.filenames = filenames
+        informe.cria_df_informe()
+        pd.testing.assert_frame_equal(
+            informe.pd_df.sort_index(), informe_csv.pd_df.sort_index()
+        )
+    assert len(os.listdir(str(informe_csv_dir / "cache"))) == 3
+
+    informe = fundosbr.Informe()
+    informe.filenames = filenames
+    informe.cria_df_informe(cnpj="22.000.000/0000-00", columns=["VL_QUOTA"])
+    assert list(informe.pd_df.columns) == ["VL_QUOTA"]
+    assert informe.pd_df.shape == (6, 1)
+
+
+def test_cache_em_blocos(informe_csv_dir):
+    """Test cache pickle criado e filtrado em blocos, sem ler o csv completo."""
+    fundosbr.log = Mock()
+    csv_file = str(informe_csv_dir / "inf_diario_fi_202002.csv")
+    esperado = fundosbr.Informe(cache=False).le_informe_mensal(
+        csv_file, cnpjs=["22.000.000/0000-00"]
+    )
+
+    informe = fundosbr.Informe()
+    with patch.object(fundosbr, "CSV_ENGINE", "pandas"), patch.object(
+        fundosbr, "CSV_CHUNKSIZE", 2
+    ), patch.object(fundosbrlib, "COLUMNAR_FORMAT", "pickle"), patch.object(
+        fundosbr.Informe, "le_csv_informe", side_effect=AssertionError
+    ):
+        for _ in range(2):
+            informe_mensal = informe.le_informe_mensal(
+                csv_file, cnpjs=["22.000.000/0000-00"]
+            )
+            pd.testing.assert_frame_equal(informe_mensal, esperado)
+
+    (cache_file,) = (informe_csv_dir / "cache").iterdir()
+    blocos = []
+    with open(str(cache_file), "rb") as fd:
+        while True:
+            try:
+                blocos.append(pickle.load(fd))
+            except EOFError:
+                break
+    assert [len(bloco) for bloco in blocos] == [2, 2, 1]
+
+
+def test_cria_df_informe_cache_nova_versao(informe_csv_dir):
+    """Test nova versao do csv nao usa cache antigo."""
+    fundosbr.log = Mock()
+    csv_file = informe_csv_dir / "inf_diario_fi_202004.csv"
+
+    informe = fundosbr.Informe()
+    informe.filenames = {str(csv_file)}
+    informe.cria_df_informe()
+    assert informe.pd_df.shape[0] == 4
+
+    with open(str(csv_file), "a") as fd:
+        fd.write(
+            "33.000.000/0000-00;2020-04-30;1.0;7.00000;1111111113.61;0.00;0.00;5\n"
+        )
+    informe = fundosbr.Informe()
+    informe.filenames = {str(csv_file)}
+    informe.cria_df_informe()
+    assert informe.pd_df.shape[0] == 5
+    assert len(os.listdir(str(informe_csv_dir / "cache"))) == 1
+
+
+def test_cria_df_informe_ordem_meses(informe_csv_dir):
+    """Test arquivos sao carregados em ordem de mes."""
+    fundosbr.log = Mock()
+    informe = fundosbr.Informe()
+    informe.filenames = {str(f) for f in informe_csv_dir.glob("*.csv")}
+    informe.cria_df_informe(cnpj="11.000.000/0000-00")
+
+    datas = informe.pd_df.index.get_level_values("DT_COMPTC")
+    assert datas.is_monotonic_increasing
+    assert len(datas) == 6
+
+
+@pytest.mark.parametrize("cache", [True, False])
+def test_cria_df_informe_filtra_cnpj(informe_csv_dir, cache):
+    """Test leitura filtrando cnpjs (csv em blocos ou cache colunar)."""
+    fundosbr.log = Mock()
+    fundosbr.msg = Mock()
+    informe = fundosbr.Informe(cache=cache)
+    informe.filenames = {str(f) for f in informe_csv_dir.glob("*.csv")}
+    with patch.object(fundosbr, "CSV_FILES_DIR", str(informe_csv_dir)), patch.object(
+        fundosbr, "CSV_CHUNKSIZE", 2
+    ):
+        # cnpj repetido eh carregado uma vez
+        ret = informe.cria_df_informe(
+            cnpj="33.000.000/0000-00,11.000.000/0000-00,33.000.000/0000-00"
+        )
+
+    cnpjs = informe.pd_df.index.get_level_values("CNPJ_FUNDO")
+    assert set(cnpjs) == {"11.000.000/0000-00", "33.000.000/0000-00"}
+    assert len(cnpjs) == 8
+    # cnpj 33.000.000/0000-00 nao existe no informe 202004
+    assert ret == 0
+    fundosbr.msg.assert_called_once()
+
+
+def test_le_csv_informe_schema(informe_csv_dir):
+    """Test tipos das colunas do informe."""
+    fundosbr.log = Mock()
+    informe_mensal = fundosbr.Informe.le_csv_informe(
+        str(informe_csv_dir / "inf_diario_fi_202002.csv")
+    )
+    dtypes = informe_mensal.dtypes
+    assert dtypes["CNPJ_FUNDO"] == "category"
+    assert dtypes["DT_COMPTC"] == "datetime64[ns]"
+    assert dtypes["VL_QUOTA"] == "float64"
+    assert dtypes["NR_COTST"] == "float32"
+
+
+@pytest.mark.parametrize("cnpj", [None, "22.000.000/0000-00,11.000.000/0000-00"])
+def test_cria_df_informe_processos(informe_csv_dir, cnpj):
+    """Test leitura dos meses em processos retorna o mesmo DataFrame."""
+    fundosbr.log = Mock()
+    filenames = {str(f) for f in informe_csv_dir.glob("*.csv")}
+    informes = []
+    for workers in [1, 2]:
+        informe = fundosbr.Informe(workers=workers)
+        informe.filenames = filenames
+        informe.cria_df_informe(cnpj=cnpj, columns=["VL_QUOTA"])
+        informes.append(informe.pd_df)
+
+    pd.testing.assert_frame_equal(*informes)
+    assert list(informes[1].columns) == ["VL_QUOTA"]
+
+
+# vim: ts=4
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""Test JanelasMoveis class."""
+
+from unittest.mock import Mock
+import numpy as np
+import pandas as pd
+import pytest
+from fundosbr import fundosbr
+
+
+@pytest.fixture
+def informe_df():
+    """Informe aleatorio de alguns fundos, com dias sem dados."""
+    rng = np.random.default_rng(1)
+    datas = pd.bdate_range("2021-01-01", periods=120)
+    cnpjs = ["A", "B", "C", "D"]
+    index = pd.MultiIndex.from_product(
+        [cnpjs, datas], names=["CNPJ_FUNDO", "DT_COMPTC"]
+    )
+    retornos = rng.normal(0.0005, 0.01, size=(len(cnpjs), len(datas)))
+    informe_df = pd.DataFrame(
+        {
+            "VL_QUOTA": np.cumprod(1 + retornos, axis=1).ravel(),
+            "CAPTC_DIA": rng.uniform(0, 100, len(index)),
+            "RESG_DIA": rng.uniform(0, 100, len(index)),
+        },
+        index=index,
+    )
+    # B comeca depois, C tem dias sem informe e D uma cota zerada
+    sem_dados = [("B", data) for data in datas[:30]] + [
+        ("C", datas[50]),
+        ("C", datas[51]),
+    ]
+    informe_df = informe_df.drop(sem_dados)
+    informe_df.loc[("D", datas[70]), "VL_QUOTA"] = 0.0
+    return informe_df
+
+
+def test_atualiza_igual_calculo_completo(informe_df):
+    """Test versao incremental igual ao rolling sobre a matriz."""
+    janelas = fundosbr.JanelasMoveis([5, 21])
+    cotas, captacao = fundosbr.JanelasMoveis.matrizes(informe_df)
+    matrizes = fundosbr.JanelasMoveis.calcula(cotas, captacao, [5, 21])
+
+    # Dias chegam em blocos, como os informes mensais
+    datas = cotas.index
+    for inicio in range(0, len(datas), 20):
+        bloco = informe_df[
+            informe_df.index.get_level_values("DT_COMPTC").isin(
+                datas[inicio : inicio + 25]
+            )
+        ]
+        janelas.atualiza(bloco)
+        data = janelas.ultima_data
+        esperado = pd.DataFrame(
+            {coluna: matriz.loc[data] for coluna, matriz in matrizes.items()}
+        )
+        esperado.index.name = "CNPJ_FUNDO"
+        resultado = janelas.resultado()
+        # Fundos que ainda nao apareceram nao fazem parte do estado
+        assert esperado.drop(resultado.index).isna().all(axis=None)
+        pd.testing.assert_frame_equal(
+            resultado, esperado.loc[resultado.index], rtol=1e-8
+        )
+
+    assert janelas.ultima_data == datas[-1]
+    assert janelas.atualiza(informe_df) == []
+
+
+def resultado_esperado(informe_df, janelas):
+    """Janelas moveis do ultimo dia calculadas com rolling."""
+    cotas, captacao = fundosbr.JanelasMoveis.matrizes(informe_df)
+    matrizes = fundosbr.JanelasMoveis.calcula(cotas, captacao, janelas)
+    esperado = pd.DataFrame(
+        {coluna: matriz.iloc[-1] for coluna, matriz in matrizes.items()}
+    )
+    esperado.index.name = "CNPJ_FUNDO"
+    return esperado
+
+
+def test_atualiza_mes_revisado(informe_df):
+    """Test nova versao do ultimo mes refaz os dias do mes."""
+    janelas = fundosbr.JanelasMoveis([5, 21])
+    datas = informe_df.index.get_level_values("DT_COMPTC")
+    meses = datas.to_period("M")
+    for mes in meses.unique():
+        janelas.atualiza(informe_df[meses == mes])
+
+    # Nova versao do ultimo mes com cotas e captacoes diferentes
+    revisado_df = informe_df.copy()
+    ultimo = meses == meses.max()
+    revisado_df.loc[ultimo, "VL_QUOTA"] *= np.linspace(0.9, 1.1, ultimo.sum())
+    revisado_df.loc[ultimo, "CAPTC_DIA"] += 10.0
+    linhas = janelas.linhas
+    janelas.atualiza(revisado_df[ultimo], revisao=True)
+    assert janelas.linhas == linhas
+    pd.testing.assert_frame_equal(
+        janelas.resultado(), resultado_esperado(revisado_df, [5, 21]), rtol=1e-8
+    )
+
+    # Mes antigo nao esta mais no buffer
+    with pytest.raises(ValueError):
+        janelas.atualiza(informe_df[meses == meses.min()], revisao=True)
+
+
+def test_calc_janelas_moveis(informe_csv_dir):
+    """Test janelas moveis dos fundos carregados no informe."""
+    fundosbr.log = Mock()
+    informe = fundosbr.Informe()
+    informe.filenames = {str(f) for f in informe_csv_dir.glob("*.csv")}
+    informe.cria_df_informe(columns=["VL_QUOTA", "CAPTC_DIA", "RESG_DIA"])
+    compara = fundosbr.Compara(Mock(), informe)
+
+    janelas_df = compara.calc_janelas_moveis([2])
+    assert janelas_df.columns.tolist() == [
+        "Retorno 2d",
+        "Volatilidade 2d",
+        "Captacao 2d",
+    ]
+    fundo = janelas_df.loc["11.000.000/0000-00"]
+    assert fundo["Retorno 2d"] == pytest.approx((28 / 18 - 1) * 100)
+    assert fundo["Captacao 2d"] == 1.0
+    retornos = np.array([16 / 18 - 1, 28 / 16 - 1])
+    assert fundo["Volatilidade 2d"] == pytest.approx(
+        retornos.std(ddof=1) * np.sqrt(252) * 100
+    )
+    assert janelas_df.loc["33.000.000/0000-00"].isna().all()
+
+
+def test_calc_janelas_moveis_sem_informe():
+    """Test janelas moveis sem informes carregados."""
+    fundosbr.log = Mock()
+    compara = fundosbr.Compara(Mock(), fundosbr.Informe())
+    janelas_df = compara.calc_janelas_moveis([2])
+    assert janelas_df.empty
+    assert janelas_df.index.name == "CNPJ_FUNDO"
+    assert janelas_df.columns.tolist() == fundosbr.JanelasMoveis.nomes_colunas(2)
+
+
+# vim: ts=4
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""Test MatrizCotas class."""
+
+from unittest.mock import Mock
+import numpy as np
+import pandas as pd
+import pytest
+from fundosbr import fundosbr
+
+DATAS = ["202002", "202003", "202004"]
+
+
+@pytest.fixture
+def matrizes(informe_csv_dir):
+    """Matrizes criadas a partir dos informes de teste."""
+    fundosbr.log = Mock()
+    filenames = {str(f) for f in informe_csv_dir.glob("*.csv")}
+    matrizes = fundosbr.MatrizCotas()
+    assert matrizes.atualiza(filenames) == DATAS
+    assert matrizes.atualiza(filenames) == []
+    return matrizes
+
+
+def informe_df(informe_csv_dir, datas):
+    """Informe carregado dos csv dos meses."""
+    informe = fundosbr.Informe()
+    informe.filenames = {
+        str(informe_csv_dir / "inf_diario_fi_{}.csv".format(data)) for data in datas
+    }
+    informe.cria_df_informe(columns=list(fundosbr.MatrizCotas.colunas))
+    return informe.pd_df
+
+
+@pytest.mark.parametrize("coluna", fundosbr.MatrizCotas.colunas)
+def test_matriz_igual_informe(matrizes, informe_csv_dir, coluna):
+    """Test matriz igual ao pivot do informe."""
+    esperado = fundosbr.MatrizCotas.de_informe(
+        informe_df(informe_csv_dir, DATAS), coluna
+    )
+    matriz = matrizes.matriz(coluna, DATAS)
+    pd.testing.assert_frame_equal(matriz, esperado, check_names=False)
+    assert matriz.index.name == "DT_COMPTC"
+    assert matriz.columns.name == "CNPJ_FUNDO"
+
+
+def test_matriz_memory_map(matrizes):
+    """Test matriz de um mes usa o arquivo sem copia."""
+    mes = matrizes.carrega_mes("202003", matrizes.carrega_indice()["meses"]["202003"])
+    assert isinstance(mes["VL_QUOTA"], np.memmap)
+    # Uma copia da matriz seria gravavel, o memory map eh somente leitura
+    matriz = matrizes.matriz("VL_QUOTA", ["202003"])
+    assert not matriz.to_numpy().flags.writeable
+    np.testing.assert_array_equal(matriz.to_numpy(), mes["VL_QUOTA"])
+    assert matrizes.matriz("VL_QUOTA", DATAS).to_numpy().flags.writeable
+
+
+def test_matriz_selecao_fundos(matrizes, informe_csv_dir):
+    """Test selecao de fundos em varios meses, com NaN quando nao ha informe."""
+    cnpjs = ["33.000.000/0000-00", "11.000.000/0000-00", "99.000.000/0000-00"]
+    matriz = matrizes.matriz("VL_QUOTA", ["202004", "202002"], cnpjs)
+    assert matriz.columns.tolist() == sorted(cnpjs)
+    assert matriz["99.000.000/0000-00"].isna().all()
+
+    esperado = fundosbr.MatrizCotas.de_informe(
+        informe_df(informe_csv_dir, ["202002", "202004"]), "VL_QUOTA"
+    )
+    pd.testing.assert_frame_equal(
+        matriz[sorted(cnpjs)[:2]],
+        esperado[sorted(cnpjs)[:2]].dropna(how="all"),
+        check_names=False,
+    )
+    assert matrizes.matriz("VL_QUOTA", ["201901"]).empty
+
+
+def test_atualiza_nova_versao(matrizes, informe_csv_dir):
+    """Test nova versao de um mes substitui apenas os arquivos do mes."""
+    csv_file = informe_csv_dir / "inf_diario_fi_202003.csv"
+    with open(str(csv_file), "a") as fd:
+        fd.write("77.000.000/0000-00;2020-03-31;1.0;10.00000;1.0;0.00;0.00;5\n")
+    assert matrizes.atualiza([str(csv_file)]) == ["202003"]
+
+    matriz = matrizes.matriz("VL_QUOTA", ["202003"], ["77.000.000/0000-00"])
+    assert matriz.dropna().to_numpy().tolist() == [[10.0]]
+    assert len(list((informe_csv_dir / "matriz").glob("202003.*.npy"))) == 4
+
+
+def test_ultimo_valor():
+    """Test ultimo valor de cada fundo ignorando NaN."""
+    matriz = pd.DataFrame(
+        {"A": [1.0, 2.0, np.nan], "B": [np.nan, np.nan, np.nan], "C": [3.0, 0.0, 5.0]}
+    )
+    ultimo = fundosbr.MatrizCotas.ultimo_valor(matriz)
+    assert ultimo["A"] == 2.0
+    assert np.isnan(ultimo["B"])
+    assert ultimo["C"] == 5.0
+
+
+def test_rank_com_matrizes(informe_csv_dir, cadastral):
+    """Test rank e metricas de risco iguais com e sem as matrizes."""
+    fundosbr.log = Mock()
+    filenames = {str(f) for f in informe_csv_dir.glob("*.csv")}
+    ranks = []
+    for matrizes in [None, fundosbr.MatrizCotas()]:
+        informe = fundosbr.Informe()
+        informe.filenames = set(filenames)
+        compara = fundosbr.Compara(cadastral, informe, matrizes=matrizes)
+        compara.referencia = "11.000.000/0000-00"
+        ranks.append(
+            compara.calc_rank_classes(
+                10, ["patrimonio", "rentabilidade", "volatilidade", "beta"]
+            )
+        )
+        compara.cnpjs = ["11.000.000/0000-00", "22.000.000/0000-00"]
+        ranks.append(compara.rank_simples(2, "VL_PATRIM_LIQ"))
+    pd.testing.assert_frame_equal(ranks[0], ranks[2])
+    assert ranks[1] == ranks[3]
+
+
+def test_compara_sem_criar_matrizes(informe_csv_dir, cadastral):
+    """Test compara de poucos fundos ja carregados nao cria as matrizes."""
+    fundosbr.log = Mock()
+    filenames = {str(f) for f in informe_csv_dir.glob("*.csv")}
+    cnpjs = ["33.000.000/0000-00", "11.000.000/0000-00", "99.000.000/0000-00"]
+    matrizes = fundosbr.MatrizCotas()
+    informe = fundosbr.Informe()
+    informe.filenames = set(filenames)
+    informe.cria_df_informe(cnpjs=cnpjs[:2], columns=list(fundosbr.MatrizCotas.colunas))
+    compara = fundosbr.Compara(cadastral, informe, matrizes=matrizes)
+
+    matriz = compara.matriz("VL_QUOTA", cnpjs)
+    assert matrizes.carrega_indice()["meses"] == {}
+    assert not matrizes.completo(filenames)
+
+    # Com as matrizes ja criadas, a matriz eh lida delas
+    matrizes.atualiza(filenames)
+    assert matrizes.completo(filenames)
+    pd.testing.assert_frame_equal(matriz, compara.matriz("VL_QUOTA", cnpjs))
+    assert matriz["99.000.000/0000-00"].isna().all()
+
+
+# vim: ts=4
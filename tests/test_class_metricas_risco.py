@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""Test MetricasRisco class."""
+
+from unittest.mock import Mock
+import numpy as np
+import pandas as pd
+import pytest
+from fundosbr import fundosbr
+
+
+@pytest.fixture
+def cotas():
+    """Cotas aleatorias de alguns fundos, com dias sem cota."""
+    rng = np.random.default_rng(0)
+    datas = pd.bdate_range("2021-01-01", periods=80)
+    retornos = rng.normal(0.0005, 0.01, size=(len(datas), 4))
+    cotas_df = pd.DataFrame(
+        np.cumprod(1 + retornos, axis=0),
+        index=datas,
+        columns=["A", "B", "C", "D"],
+    )
+    cotas_df.iloc[:10, 1] = np.nan
+    cotas_df.iloc[[20, 21, 40], 2] = np.nan
+    cotas_df.iloc[50, 3] = 0.0
+    return cotas_df
+
+
+def metricas_fundo(cota_s, taxa):
+    """Metricas de um fundo calculadas com pandas, um fundo por vez."""
+    cota_s = cota_s[cota_s > 0].dropna()
+    retorno_s = cota_s.pct_change().dropna()
+    excesso = retorno_s - taxa
+    queda = cota_s / cota_s.cummax() - 1
+    return {
+        "Rentabilidade": (cota_s.iloc[-1] / cota_s.iloc[0] - 1) * 100,
+        "Volatilidade": retorno_s.std() * np.sqrt(252) * 100,
+        "Max drawdown": queda.min() * 100,
+        "Sharpe": excesso.mean() / excesso.std() * np.sqrt(252),
+        "Sortino": excesso.mean()
+        / np.sqrt((excesso.clip(upper=0) ** 2).mean())
+        * np.sqrt(252),
+    }
+
+
+def test_calcula(cotas):
+    """Test metricas vetorizadas iguais as calculadas fundo a fundo."""
+    risco_df = fundosbr.MetricasRisco(cotas).calcula(taxa_diaria=0.0002)
+    esperado = pd.DataFrame(
+        {cnpj: metricas_fundo(cotas[cnpj], 0.0002) for cnpj in cotas.columns}
+    ).T
+    pd.testing.assert_frame_equal(
+        risco_df[esperado.columns], esperado, check_names=False
+    )
+    assert "Beta" not in risco_df
+
+
+def test_drawdown_duracao():
+    """Test maior drawdown e dias corridos abaixo do pico."""
+    datas = pd.to_datetime(
+        ["2021-01-04", "2021-01-05", "2021-01-08", "2021-01-11", "2021-01-20"]
+    )
+    cotas_df = pd.DataFrame(
+        {
+            "A": [10.0, 12.0, 9.0, 12.5, 12.0],
+            "B": [10.0, 11.0, 12.0, 13.0, 14.0],
+            "C": [np.nan, 10.0, 8.0, 6.0, 7.0],
+        },
+        index=datas,
+    )
+    risco_df = fundosbr.MetricasRisco(cotas_df).calcula()
+    np.testing.assert_allclose(risco_df["Max drawdown"], [-25.0, 0.0, -40.0])
+    # A: de 05/01 ate 08/01 e de 11/01 ate 20/01; C: nao recuperou
+    assert risco_df["Duracao drawdown"].tolist() == [9, 0, 15]
+
+
+def test_beta(cotas):
+    """Test beta em relacao a um fundo de referencia."""
+    retornos = cotas.pct_change()
+    cotas = cotas.assign(
+        ALAV=(1 + 2 * retornos["A"].fillna(0)).cumprod(),
+        CONTRA=(1 - retornos["A"].fillna(0)).cumprod(),
+    )
+    risco_df = fundosbr.MetricasRisco(cotas).calcula(referencia="A")
+    np.testing.assert_allclose(
+        risco_df.loc[["A", "ALAV", "CONTRA"], "Beta"], [1.0, 2.0, -1.0]
+    )
+    with pytest.raises(KeyError):
+        fundosbr.MetricasRisco(cotas).calcula(referencia="X")
+
+
+@pytest.mark.parametrize("fundos", [[], ["B", "A"]])
+def test_calcula_sem_cotas(fundos):
+    """Test matriz sem datas retorna metricas com NaN."""
+    cotas_df = pd.DataFrame(columns=fundos, index=pd.DatetimeIndex([]), dtype="float64")
+    risco_df = fundosbr.MetricasRisco(cotas_df).calcula(referencia="A")
+    assert risco_df.index.tolist() == sorted(fundos)
+    assert risco_df.columns.tolist() == list(fundosbr.MetricasRisco.colunas.values())
+    assert risco_df.isna().all().all()
+    assert "Beta" not in fundosbr.MetricasRisco(cotas_df).calcula()
+
+
+def test_calc_rank_classes_risco(informe_csv_dir, cadastral):
+    """Test rank por metricas de risco com e sem a tabela de retornos."""
+    fundosbr.log = Mock()
+    filenames = {str(f) for f in informe_csv_dir.glob("*.csv")}
+    ranks = []
+    for retornos in [None, fundosbr.TabelaRetornos()]:
+        informe = fundosbr.Informe()
+        informe.filenames = set(filenames)
+        compara = fundosbr.Compara(cadastral, informe, retornos)
+        compara.referencia = "11.000.000/0000-00"
+        ranks.append(compara.calc_rank_classes(10, ["volatilidade", "sharpe", "beta"]))
+    pd.testing.assert_frame_equal(ranks[0], ranks[1])
+
+    rank_df = ranks[0].set_index(["Classe", "Metrica"])
+    assert rank_df.loc[("acoes", "beta"), "Valor"] == pytest.approx(1.0)
+    assert rank_df.loc[("multimercado", "volatilidade"), "CNPJ_FUNDO"] == (
+        "22.000.000/0000-00"
+    )
+
+    compara.referencia = None
+    with pytest.raises(ValueError):
+        compara.calc_rank_classes(10, ["beta"])
+
+
+# vim: ts=4
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""Test TabelaRetornos class."""
+
+from unittest.mock import Mock
+import numpy as np
+import pandas as pd
+import pytest
+from fundosbr import fundosbr
+
+DATAS = ["202002", "202003", "202004"]
+
+
+def rentabilidade_informe(filenames, datas):
+    """Rentabilidade do periodo calculada a partir dos informes."""
+    informe = fundosbr.Informe()
+    informe.filenames = {
+        f for f in filenames if fundosbr.Informe.data_informe(f) in datas
+    }
+    informe.cria_df_informe(columns=["VL_QUOTA"])
+    return fundosbr.Compara(Mock(), informe).calc_rentabilidade_periodo()
+
+
+def test_retornos_diarios(informe_csv_dir):
+    """Test retorno, log-retorno e indice acumulado."""
+    fundosbr.log = Mock()
+    filenames = {str(f) for f in informe_csv_dir.glob("*.csv")}
+    tabela = fundosbr.TabelaRetornos()
+
+    assert tabela.atualiza(filenames) == DATAS
+    assert tabela.atualiza(filenames) == []
+
+    retornos = tabela.retornos(["22.000.000/0000-00"], DATAS)
+    cotas = [22.0, 26.0, 20.0, 28.0, 26.0, 12.0]
+    assert retornos["VL_QUOTA"].tolist() == cotas
+    np.testing.assert_allclose(retornos["INDICE"], np.array(cotas) / 22.0)
+    np.testing.assert_allclose(
+        retornos["RETORNO"].iloc[1:], np.array(cotas[1:]) / cotas[:-1] - 1
+    )
+    np.testing.assert_allclose(
+        retornos["LOG_RETORNO"].iloc[1:], np.log(np.array(cotas[1:]) / cotas[:-1])
+    )
+    assert np.isnan(retornos["RETORNO"].iloc[0])
+
+
+@pytest.mark.parametrize("datas", [DATAS, ["202003"], ["202003", "202004"]])
+def test_rentabilidade_periodo(informe_csv_dir, datas):
+    """Test rentabilidade pela tabela igual a calculada pelos informes."""
+    fundosbr.log = Mock()
+    filenames = {str(f) for f in informe_csv_dir.glob("*.csv")}
+    tabela = fundosbr.TabelaRetornos()
+    tabela.atualiza(filenames)
+
+    cnpjs = ["11.000.000/0000-00", "33.000.000/0000-00", "99.000.000/0000-00"]
+    esperado = rentabilidade_informe(filenames, datas)
+    esperado = esperado[esperado.index.isin(cnpjs)]
+    pd.testing.assert_frame_equal(tabela.rentabilidade_periodo(cnpjs, datas), esperado)
+
+
+def test_atualiza_incremental(informe_csv_dir):
+    """Test novo mes e nova versao de um mes recalculam apenas os meses seguintes."""
+    fundosbr.log = Mock()
+    filenames = {str(f) for f in informe_csv_dir.glob("*.csv")}
+    tabela = fundosbr.TabelaRetornos()
+    tabela.atualiza(filenames)
+
+    # Fundo 33 nao tem informe em 202004 e volta em 202005
+    novo_mes = informe_csv_dir / "inf_diario_fi_202005.csv"
+    novo_mes.write_text(
+        (informe_csv_dir / "inf_diario_fi_202004.csv").read_text()
+        + "33.000.000/0000-00;2020-05-04;1.0;9.00000;1111111113.61;0.00;0.00;5\n"
+    )
+    filenames.add(str(novo_mes))
+    assert tabela.atualiza(filenames) == ["202005"]
+    rent = tabela.rentabilidade_periodo(["33.000.000/0000-00"], DATAS + ["202005"])
+    assert rent["Rentabilidade"].tolist() == pytest.approx([80.0])
+
+    # Nova versao de 202003 recalcula os meses seguintes sem ler os csv
+    with open(str(informe_csv_dir / "inf_diario_fi_202003.csv"), "a") as fd:
+        fd.write("33.000.000/0000-00;2020-03-31;1.0;10.00000;1.0;0.00;0.00;5\n")
+    filenames.discard(str(informe_csv_dir / "inf_diario_fi_202004.csv"))
+    assert tabela.atualiza(filenames) == ["202003", "202004", "202005"]
+    retornos = tabela.retornos(["33.000.000/0000-00"], ["202005"])
+    assert retornos["INDICE"].tolist() == pytest.approx([9.0 / 5.0])
+    assert retornos["RETORNO"].tolist() == pytest.approx([9.0 / 10.0 - 1])
+
+
+def test_atualiza_mes_faltando(informe_csv_dir):
+    """Test retorno nao encadeado quando falta um mes na tabela."""
+    fundosbr.log = Mock()
+    filenames = {str(f) for f in informe_csv_dir.glob("*.csv")}
+    sem_202003 = {f for f in filenames if "202003" not in f}
+    tabela = fundosbr.TabelaRetornos()
+    assert tabela.atualiza(sem_202003) == ["202002", "202004"]
+
+    retornos = tabela.retornos(["22.000.000/0000-00"], DATAS)
+    assert retornos["VL_QUOTA"].tolist() == [22.0, 26.0, 26.0, 12.0]
+    assert np.isnan(retornos["RETORNO"].iloc[2])
+    assert np.isnan(retornos["LOG_RETORNO"].iloc[2])
+    assert retornos["RETORNO"].iloc[3] == pytest.approx(12.0 / 26.0 - 1)
+    # O indice continua acumulado desde a primeira cota
+    np.testing.assert_allclose(retornos["INDICE"], np.array([22, 26, 26, 12]) / 22.0)
+
+    # Com o mes que faltava o retorno volta a ser encadeado
+    assert tabela.atualiza(filenames) == ["202003", "202004"]
+    retornos = tabela.retornos(["22.000.000/0000-00"], ["202004"])
+    assert retornos["RETORNO"].iloc[0] == pytest.approx(26.0 / 28.0 - 1)
+
+
+def test_compara_com_tabela(informe_csv_dir, cadastral):
+    """Test rentabilidade do periodo e mensal pela tabela igual aos informes."""
+    fundosbr.log = Mock()
+    filenames = {str(f) for f in informe_csv_dir.glob("*.csv")}
+    cnpjs = ["22.000.000/0000-00", "11.000.000/0000-00"]
+    rentabilidades = []
+    for retornos in [None, fundosbr.TabelaRetornos(str(informe_csv_dir / "ret"))]:
+        informe = fundosbr.Informe()
+        informe.filenames = set(filenames)
+        compara = fundosbr.Compara(cadastral, informe, retornos)
+        compara.cnpjs = cnpjs
+        if retornos is None:
+            informe.cria_df_informe(cnpjs=cnpjs, columns=["VL_QUOTA"])
+        rentabilidades.append(
+            (compara.calc_rentabilidade_periodo(), compara.calc_rentabilidade_mensal())
+        )
+        # Com a tabela os informes nao sao carregados
+        assert retornos is None or informe.pd_df.empty
+
+    pd.testing.assert_frame_equal(rentabilidades[0][0], rentabilidades[1][0])
+    pd.testing.assert_frame_equal(rentabilidades[0][1], rentabilidades[1][1])
+
+
+def test_rank_rentabilidade(informe_csv_dir, cadastral):
+    """Test rank por rentabilidade com e sem a tabela de retornos."""
+    fundosbr.msg = Mock()
+    filenames = {str(f) for f in informe_csv_dir.glob("*.csv")}
+    ranks = []
+    for retornos in [None, fundosbr.TabelaRetornos(str(informe_csv_dir / "ret"))]:
+        informe = fundosbr.Informe()
+        informe.filenames = filenames
+        compara = fundosbr.Compara(cadastral, informe, retornos)
+        compara.cnpjs = ["11.000.000/0000-00", "22.000.000/0000-00", "44"]
+        ranks.append(compara.rank_rentabilidade(2))
+
+    assert ranks[0] == ranks[1]
+    assert "VERDE" in ranks[1]
+
+
+# vim: ts=4
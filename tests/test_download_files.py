@@ -0,0 +1,381 @@
+# -*- coding: utf-8 -*-
+"""Test concurrent downloads against a local http server."""
+
+import datetime
+import hashlib
+import os
+import time
+import zipfile
+from unittest.mock import patch, Mock
+import pytest
+from fundosbr import fundosbr
+from fundosbr.fundosbrlib import DownloadError
+from fundosbr.fundosbrlib import DownloadScheduler
+from fundosbr.fundosbrlib import archive_member
+from fundosbr.fundosbrlib import download_failures
+from fundosbr.fundosbrlib import download_file
+from fundosbr.fundosbrlib import download_files
+from fundosbr.fundosbrlib import file_checksum
+from fundosbr.fundosbrlib import is_file_immutable
+from fundosbr.fundosbrlib import read_file_meta
+from conftest import INFORME_HEADER, INFORME_ROWS
+
+
+def test_download_files(http_server, tmp_path):
+    """Test download of several files and the per-file report."""
+    url, www_dir = http_server
+    for num in range(5):
+        (www_dir / "file{}.csv".format(num)).write_text("data{}".format(num))
+
+    downloads = [
+        ("{}/file{}.csv".format(url, num), str(tmp_path / "file{}.csv".format(num)))
+        for num in range(6)
+    ]
+    results = download_files(downloads, max_workers=3)
+
+    assert [res.status_code for res in results] == [200] * 5 + [404]
+    assert [res.local_file for res in results] == [d[1] for d in downloads]
+    for num in range(5):
+        assert (tmp_path / "file{}.csv".format(num)).read_text() == "data{}".format(num)
+    assert not (tmp_path / "file5.csv").exists()
+
+
+def test_download_files_connection_error(tmp_path):
+    """Test connection error is reported and does not raise."""
+    results = download_files([("http://127.0.0.1:1/x.csv", str(tmp_path / "x.csv"))])
+    assert results[0].status_code is None
+    assert results[0].error
+
+
+def test_download_informes_mensais(http_server, tmp_path):
+    """Test concurrent download of informe files."""
+    url, www_dir = http_server
+    csv_dir = tmp_path / "csv"
+    csv_dir.mkdir()
+    (www_dir / "inf_diario_fi_202101.csv").write_text("202101")
+    (www_dir / "inf_diario_fi_202102.csv").write_text("202102")
+    (csv_dir / "inf_diario_fi_202103.csv").write_text("202103")
+
+    fundosbr.log = Mock()
+    informe = fundosbr.Informe()
+    with patch.object(fundosbr, "URL_INFORME_DIARIO", url), patch.object(
+        fundosbr, "CSV_FILES_DIR", str(csv_dir)
+    ):
+        relatorio = informe.download_informes_mensais(
+            ["202101", "202102", "202103", "202104"]
+        )
+
+    assert relatorio == {"202101": 200, "202102": 200, "202103": "local", "202104": 404}
+    assert informe.filenames == {
+        str(csv_dir / "inf_diario_fi_{}.csv".format(data))
+        for data in ["202101", "202102", "202103"]
+    }
+    assert (csv_dir / "inf_diario_fi_202102.csv").read_text() == "202102"
+    assert is_file_immutable(str(csv_dir / "inf_diario_fi_202101.csv"))
+
+
+def test_download_file_conditional(http_server, tmp_path):
+    """Test file not modified is not downloaded again."""
+    url, www_dir = http_server
+    (www_dir / "cad_fi.csv").write_text("cadastral")
+    local_file = str(tmp_path / "cad_fi.csv")
+
+    res = download_file(url + "/cad_fi.csv", local_file, conditional=True)
+    assert res.status_code == 200
+    meta = read_file_meta(local_file)
+    assert meta["size"] == len("cadastral")
+    assert meta["last_modified"]
+
+    res = download_file(url + "/cad_fi.csv", local_file, conditional=True)
+    assert res.status_code == 304
+
+    # Arquivo local diferente do baixado invalida os metadados
+    with open(local_file, "a") as fd:
+        fd.write("truncado")
+    assert read_file_meta(local_file) == {}
+    res = download_file(url + "/cad_fi.csv", local_file, conditional=True)
+    assert res.status_code == 200
+    assert open(local_file).read() == "cadastral"
+
+
+def test_download_informes_mensais_mes_corrente(http_server, tmp_path):
+    """Test informe do mes corrente eh revalidado e meses passados nao."""
+    url, www_dir = http_server
+    csv_dir = tmp_path / "csv"
+    csv_dir.mkdir()
+    mes_corrente = datetime.datetime.now().strftime("%Y%m")
+    for data in ["202101", mes_corrente]:
+        (www_dir / "inf_diario_fi_{}.csv".format(data)).write_text(data)
+
+    fundosbr.log = Mock()
+    informe = fundosbr.Informe()
+    with patch.object(fundosbr, "URL_INFORME_DIARIO", url), patch.object(
+        fundosbr, "CSV_FILES_DIR", str(csv_dir)
+    ):
+        relatorio = informe.download_informes_mensais(["202101", mes_corrente])
+        assert relatorio == {"202101": 200, mes_corrente: 200}
+
+        relatorio = informe.download_informes_mensais(["202101", mes_corrente])
+        assert relatorio == {"202101": "local", mes_corrente: 304}
+
+        # Nova versao do informe do mes corrente no servidor
+        arquivo = www_dir / "inf_diario_fi_{}.csv".format(mes_corrente)
+        arquivo.write_text("nova versao")
+        mtime = os.path.getmtime(str(arquivo)) + 10
+        os.utime(str(arquivo), (mtime, mtime))
+        relatorio = informe.download_informes_mensais([mes_corrente])
+        assert relatorio == {mes_corrente: 200}
+
+    assert not is_file_immutable(
+        str(csv_dir / "inf_diario_fi_{}.csv".format(mes_corrente))
+    )
+    assert (csv_dir / "inf_diario_fi_{}.csv".format(mes_corrente)).read_text() == (
+        "nova versao"
+    )
+
+
+def test_download_file_continua(http_server_falhas, tmp_path):
+    """Test download interrompido nao deixa arquivo truncado e eh continuado."""
+    url, server = http_server_falhas
+    conteudo = os.urandom(300000)
+    (server.www_dir / "inf.zip").write_bytes(conteudo)
+    local_file = tmp_path / "inf.zip"
+
+    server.falhas["/inf.zip"] = [("corta", 100000)]
+    with pytest.raises(DownloadError):
+        download_file(url + "/inf.zip", str(local_file))
+    assert not local_file.exists()
+    assert (tmp_path / "inf.zip.part").stat().st_size == 100000
+
+    res = download_file(url + "/inf.zip", str(local_file))
+    assert res.status_code == 200
+    assert server.requisicoes[-1][1]["Range"] == "bytes=100000-"
+    assert local_file.read_bytes() == conteudo
+    assert not (tmp_path / "inf.zip.part").exists()
+    assert read_file_meta(str(local_file))["sha1"] == hashlib.sha1(conteudo).hexdigest()
+    assert file_checksum(str(local_file)) == hashlib.sha1(conteudo).hexdigest()
+
+
+def test_download_file_parcial_desatualizado(http_server_falhas, tmp_path):
+    """Test arquivo modificado no servidor eh baixado do inicio."""
+    url, server = http_server_falhas
+    arquivo = server.www_dir / "inf.zip"
+    arquivo.write_bytes(b"a" * 1000)
+    local_file = tmp_path / "inf.zip"
+
+    server.falhas["/inf.zip"] = [("corta", 500)]
+    with pytest.raises(DownloadError):
+        download_file(url + "/inf.zip", str(local_file))
+
+    arquivo.write_bytes(b"b" * 2000)
+    mtime = arquivo.stat().st_mtime + 10
+    os.utime(str(arquivo), (mtime, mtime))
+    assert download_file(url + "/inf.zip", str(local_file)).status_code == 200
+    assert local_file.read_bytes() == b"b" * 2000
+
+
+def test_download_file_corrompido(http_server_falhas, tmp_path):
+    """Test arquivo local corrompido (checksum diferente) eh baixado novamente."""
+    url, server = http_server_falhas
+    (server.www_dir / "cad_fi.csv").write_bytes(b"cadastral")
+    local_file = tmp_path / "cad_fi.csv"
+    download_file(url + "/cad_fi.csv", str(local_file), conditional=True)
+    assert (
+        download_file(
+            url + "/cad_fi.csv", str(local_file), conditional=True
+        ).status_code
+        == 304
+    )
+
+    # Mesmo tamanho, conteudo diferente
+    local_file.write_bytes(b"cadastrox")
+    assert read_file_meta(str(local_file)) == {}
+    res = download_file(url + "/cad_fi.csv", str(local_file), conditional=True)
+    assert res.status_code == 200
+    assert local_file.read_bytes() == b"cadastral"
+
+
+def cria_zip(zip_file, datas):
+    """Cria um zip com o csv de informe de cada data."""
+    zip_file.parent.mkdir(exist_ok=True)
+    with zipfile.ZipFile(str(zip_file), "w", zipfile.ZIP_DEFLATED) as arquivo:
+        for data, origem in datas.items():
+            arquivo.writestr(
+                "inf_diario_fi_{}.csv".format(data),
+                "\n".join([INFORME_HEADER] + INFORME_ROWS[origem]) + "\n",
+            )
+
+
+def test_download_informes_mensais_removido_servidor(http_server, tmp_path):
+    """Test mes em cache local removido do servidor usa outro formato ou a copia."""
+    url, www_dir = http_server
+    csv_dir = tmp_path / "csv"
+    csv_dir.mkdir()
+    mes_corrente = datetime.datetime.now().strftime("%Y%m")
+    csv_servidor = www_dir / "inf_diario_fi_{}.csv".format(mes_corrente)
+    csv_servidor.write_text(mes_corrente)
+    csv_local = str(csv_dir / "inf_diario_fi_{}.csv".format(mes_corrente))
+
+    fundosbr.log = Mock()
+    with patch.object(fundosbr, "URL_INFORME_DIARIO", url), patch.object(
+        fundosbr, "CSV_FILES_DIR", str(csv_dir)
+    ):
+        informe = fundosbr.Informe()
+        assert informe.download_informes_mensais([mes_corrente]) == {mes_corrente: 200}
+
+        # Nenhum formato no servidor: usa a copia local
+        csv_servidor.unlink()
+        informe = fundosbr.Informe()
+        assert informe.download_informes_mensais([mes_corrente]) == {mes_corrente: 404}
+        assert informe.filenames == {csv_local}
+
+        # Mes publicado em outro formato
+        cria_zip(
+            www_dir / "inf_diario_fi_{}.zip".format(mes_corrente),
+            {mes_corrente: "202004"},
+        )
+        informe = fundosbr.Informe()
+        assert informe.download_informes_mensais([mes_corrente]) == {mes_corrente: 200}
+        assert informe.filenames == {
+            str(csv_dir / "inf_diario_fi_{}.zip".format(mes_corrente))
+        }
+
+
+def test_download_informes_mensais_zip(http_server, tmp_path):
+    """Test informes em zip mensal e anual sao lidos sem extrair os csv."""
+    url, www_dir = http_server
+    csv_dir = tmp_path / "csv"
+    csv_dir.mkdir()
+    cria_zip(www_dir / "inf_diario_fi_202004.zip", {"202004": "202004"})
+    cria_zip(
+        www_dir / "HIST" / "inf_diario_fi_2019.zip",
+        {"201911": "202002", "201912": "202003"},
+    )
+
+    fundosbr.log = Mock()
+    with patch.object(fundosbr, "URL_INFORME_DIARIO", url), patch.object(
+        fundosbr, "CSV_FILES_DIR", str(csv_dir)
+    ):
+        informe = fundosbr.Informe()
+        datas = ["201911", "201912", "202004", "202005"]
+        relatorio = informe.download_informes_mensais(datas)
+        assert relatorio == {"201911": 200, "201912": 200, "202004": 200, "202005": 404}
+
+        anual = str(csv_dir / "inf_diario_fi_2019.zip")
+        assert informe.filenames == {
+            archive_member(anual, "inf_diario_fi_201911.csv"),
+            archive_member(anual, "inf_diario_fi_201912.csv"),
+            str(csv_dir / "inf_diario_fi_202004.zip"),
+        }
+        assert not list(csv_dir.glob("*.csv"))
+        informe.cria_df_informe()
+        assert informe.pd_df.shape[0] == sum(
+            len(INFORME_ROWS[data]) for data in ["202002", "202003", "202004"]
+        )
+
+        informe = fundosbr.Informe()
+        relatorio = informe.download_informes_mensais(datas[:3])
+        assert relatorio == {"201911": "local", "201912": "local", "202004": "local"}
+
+
+def test_download_scheduler_retries(http_server_falhas, tmp_path):
+    """Test falhas temporarias sao repetidas e a transferencia continuada."""
+    url, server = http_server_falhas
+    conteudo = os.urandom(50000)
+    (server.www_dir / "inf.zip").write_bytes(conteudo)
+    local_file = tmp_path / "inf.zip"
+
+    server.falhas["/inf.zip"] = [503, 500, ("corta", 20000)]
+    scheduler = DownloadScheduler(retries=3, backoff=0.01)
+    res = scheduler.download(url + "/inf.zip", str(local_file))
+    assert res.status_code == 200
+    assert res.attempts == 4
+    assert server.requisicoes[-1][1]["Range"] == "bytes=20000-"
+    assert local_file.read_bytes() == conteudo
+    assert download_failures([res]) == []
+
+
+def test_download_scheduler_falhas(http_server_falhas, tmp_path):
+    """Test resumo das falhas depois de esgotar as tentativas."""
+    url, server = http_server_falhas
+    (server.www_dir / "a.csv").write_bytes(b"a")
+    (server.www_dir / "b.csv").write_bytes(b"b")
+    server.falhas["/b.csv"] = [503] * 3
+
+    scheduler = DownloadScheduler(retries=2, backoff=0.01)
+    downloads = [
+        (url + "/a.csv", str(tmp_path / "a.csv")),
+        (url + "/b.csv", str(tmp_path / "b.csv")),
+        (url + "/c.csv", str(tmp_path / "c.csv")),
+    ]
+    results = scheduler.download_all(downloads)
+    assert [res.status_code for res in results] == [200, 503, 404]
+    assert download_failures(results) == [
+        {
+            "url": url + "/b.csv",
+            "local_file": str(tmp_path / "b.csv"),
+            "status_code": 503,
+            "error": None,
+            "attempts": 3,
+        }
+    ]
+    assert not (tmp_path / "b.csv").exists()
+
+
+def test_download_scheduler_offline(tmp_path):
+    """Test revalidacao sem conexao nao espera as tentativas se ha copia local."""
+    url = "http://127.0.0.1:1/a.csv"
+    local_file = tmp_path / "a.csv"
+    scheduler = DownloadScheduler(retries=2, backoff=0.01)
+    assert scheduler.download(url, str(local_file), conditional=True).attempts == 3
+
+    local_file.write_text("a")
+    scheduler = DownloadScheduler(retries=3, backoff=60)
+    res = scheduler.download(url, str(local_file), conditional=True)
+    assert (res.status_code, res.attempts) == (None, 1)
+    assert local_file.read_text() == "a"
+
+
+def test_download_scheduler_timeout(http_server_falhas, tmp_path):
+    """Test servidor que nao responde no timeout eh tentado novamente."""
+    url, server = http_server_falhas
+    (server.www_dir / "a.csv").write_bytes(b"a")
+    server.falhas["/a.csv"] = [("lento", 1)]
+
+    scheduler = DownloadScheduler(retries=1, backoff=0.01, timeout=(1, 0.2))
+    res = scheduler.download(url + "/a.csv", str(tmp_path / "a.csv"))
+    assert res.status_code == 200
+    assert res.attempts == 2
+
+    server.falhas["/a.csv"] = [("lento", 1)]
+    scheduler = DownloadScheduler(retries=0, timeout=(1, 0.2))
+    res = scheduler.download(url + "/a.csv", str(tmp_path / "b.csv"))
+    assert res.status_code is None
+    assert res.error
+    assert download_failures([res])[0]["attempts"] == 1
+
+
+def test_download_scheduler_limites(http_server_falhas, tmp_path):
+    """Test limites de transferencias simultaneas e de bytes por segundo."""
+    url, server = http_server_falhas
+    downloads = []
+    for num in range(6):
+        (server.www_dir / "f{}.csv".format(num)).write_bytes(b"x")
+        server.falhas["/f{}.csv".format(num)] = [("lento", 0.1)]
+        downloads.append(
+            (url + "/f{}.csv".format(num), str(tmp_path / "f{}.csv".format(num)))
+        )
+    scheduler = DownloadScheduler(max_concurrent=2)
+    results = scheduler.download_all(downloads, max_workers=6)
+    assert [res.status_code for res in results] == [200] * 6
+    assert server.max_simultaneas == 2
+
+    (server.www_dir / "grande.zip").write_bytes(os.urandom(60000))
+    scheduler = DownloadScheduler(max_bytes_per_sec=100000)
+    inicio = time.monotonic()
+    res = scheduler.download(url + "/grande.zip", str(tmp_path / "grande.zip"))
+    assert res.status_code == 200
+    assert time.monotonic() - inicio >= 0.5
+
+
+# vim: ts=4
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""Test processos concorrentes compartilhando o diretorio de dados."""
+
+import multiprocessing
+import os
+import time
+from unittest.mock import Mock
+from fundosbr import fundosbr
+from fundosbr.fundosbrlib import DownloadScheduler
+from fundosbr.fundosbrlib import FileLock
+
+PROCESSOS = 4
+
+contexto = multiprocessing.get_context("fork")
+
+
+def incrementa(lock_file, contador):
+    """Incrementa o contador (arquivo texto) com uma janela de corrida."""
+    with FileLock(lock_file):
+        valor = int(open(contador).read())
+        time.sleep(0.05)
+        with open(contador, "w") as fd:
+            fd.write(str(valor + 1))
+
+
+def executa(target, args_processos):
+    """Executa target em um processo para cada tupla de args e aguarda."""
+    processos = [contexto.Process(target=target, args=args) for args in args_processos]
+    for processo in processos:
+        processo.start()
+    for processo in processos:
+        processo.join(30)
+    assert [processo.exitcode for processo in processos] == [0] * len(processos)
+
+
+def test_file_lock_processos(tmp_path):
+    """Test lock serializa processos concorrentes."""
+    contador = tmp_path / "contador"
+    contador.write_text("0")
+    lock_file = str(tmp_path / "contador.lock")
+    executa(incrementa, [(lock_file, str(contador))] * PROCESSOS)
+    assert contador.read_text() == str(PROCESSOS)
+
+
+def test_file_lock_timeout(tmp_path):
+    """Test timeout ao aguardar um lock de outro processo."""
+    lock_file = str(tmp_path / "arquivo.lock")
+    with FileLock(lock_file) as lock:
+        assert not lock.contended
+        processo = contexto.Process(
+            target=FileLock(lock_file, timeout=0.1).acquire,
+        )
+        processo.start()
+        processo.join(10)
+        assert processo.exitcode != 0
+
+    with FileLock(lock_file, timeout=0.1) as lock:
+        assert not lock.contended
+
+
+def baixa(url, local_file, fila):
+    """Baixa um arquivo e envia o status para a fila."""
+    fila.put(DownloadScheduler(retries=0).download(url, local_file, conditional=True))
+
+
+def test_download_processos(http_server_falhas, tmp_path):
+    """Test processos concorrentes baixam o arquivo uma unica vez."""
+    url, server = http_server_falhas
+    conteudo = os.urandom(100000)
+    (server.www_dir / "inf.zip").write_bytes(conteudo)
+    server.falhas["/inf.zip"] = [("lento", 0.5)]
+    local_file = tmp_path / "inf.zip"
+
+    fila = contexto.Queue()
+    executa(baixa, [(url + "/inf.zip", str(local_file), fila)] * PROCESSOS)
+    status = sorted(fila.get(timeout=5).status_code for _ in range(PROCESSOS))
+    assert status == [200] + [304] * (PROCESSOS - 1)
+    assert len(server.requisicoes) == 1
+    assert local_file.read_bytes() == conteudo
+
+
+def le_informe(file_mes):
+    """Le um informe usando o cache colunar."""
+    fundosbr.Informe().le_informe_mensal(file_mes)
+
+
+def test_cache_processos(informe_csv_dir, tmp_path, monkeypatch):
+    """Test processos concorrentes convertem cada informe uma unica vez."""
+    fundosbr.log = Mock()
+    conversoes = tmp_path / "conversoes"
+    cria_cache_informe = fundosbr.Informe.cria_cache_informe
+
+    def conta_conversao(file_mes, *args, **kwargs):
+        with open(str(conversoes), "a") as fd:
+            fd.write("{}\n".format(os.path.basename(file_mes)))
+        time.sleep(0.2)
+        return cria_cache_informe(file_mes, *args, **kwargs)
+
+    monkeypatch.setattr(
+        fundosbr.Informe, "cria_cache_informe", staticmethod(conta_conversao)
+    )
+    filenames = sorted(str(f) for f in informe_csv_dir.glob("*.csv"))[:2]
+    executa(le_informe, [(file_mes,) for file_mes in filenames] * PROCESSOS)
+
+    assert sorted(conversoes.read_text().split()) == sorted(
+        os.path.basename(file_mes) for file_mes in filenames
+    )
+    cache_dir = informe_csv_dir / "cache"
+    assert len(os.listdir(str(cache_dir))) == len(filenames)
+
+
+def test_armazem_processos(informe_csv_dir):
+    """Test processos concorrentes ingerem cada informe uma unica vez."""
+    fundosbr.log = Mock()
+    filenames = {str(f) for f in informe_csv_dir.glob("*.csv")}
+    fundosbr.Informe().le_informe_mensal(sorted(filenames)[0])
+
+    fila = contexto.Queue()
+    executa(
+        lambda: fila.put(fundosbr.ArmazemCnpj().atualiza(filenames)),
+        [()] * PROCESSOS,
+    )
+    ingeridos = [fila.get(timeout=5) for _ in range(PROCESSOS)]
+    assert sorted(ingeridos, key=len) == [[]] * (PROCESSOS - 1) + [
+        ["202002", "202003", "202004"]
+    ]
+
+
+# vim: ts=4
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""Test read_config function."""
+
+import pytest
+from fundosbr.fundosbrlib import read_config
+
+defaults = {"dados": "/tmp/fundosbr_dados", "workers": 1, "csv_engine": "auto"}
+
+
+def test_read_config(tmp_path, monkeypatch):
+    """Test precedencia: variavel de ambiente, arquivo e valor padrao."""
+    config_file = tmp_path / "fundosbr.ini"
+    config_file.write_text("[fundosbr]\ndados = /srv/fundosbr\nworkers = 4\n")
+    monkeypatch.delenv("FUNDOSBR_DADOS", raising=False)
+    monkeypatch.delenv("FUNDOSBR_CSV_ENGINE", raising=False)
+    monkeypatch.setenv("FUNDOSBR_WORKERS", "8")
+
+    config = read_config(str(config_file), "fundosbr", defaults, "FUNDOSBR_")
+    assert config == {"dados": "/srv/fundosbr", "workers": 8, "csv_engine": "auto"}
+
+    config = read_config(str(tmp_path / "nao_existe.ini"), "fundosbr", defaults)
+    assert config == defaults
+
+
+def test_read_config_invalido(tmp_path):
+    """Test valor invalido no arquivo de configuracao."""
+    config_file = tmp_path / "fundosbr.ini"
+    config_file.write_text("[fundosbr]\nworkers = quatro\n")
+    with pytest.raises(SystemExit):
+        read_config(str(config_file), "fundosbr", defaults)
+
+    config_file.write_text("workers = 4\n")
+    with pytest.raises(SystemExit):
+        read_config(str(config_file), "fundosbr", defaults)
+
+
+# vim: ts=4
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""Test csv engines (pandas and pyarrow) return the same DataFrame."""
+
+import zipfile
+from unittest.mock import Mock
+import pandas as pd
+import pytest
+from fundosbr import fundosbr
+from fundosbr.fundosbrlib import archive_member
+from fundosbr.fundosbrlib import csv_engine
+
+pytest.importorskip("pyarrow")
+
+
+def le_cadastral(cadastral, engine, monkeypatch):
+    """Carrega o csv cadastral com o engine informado."""
+    monkeypatch.setattr(fundosbr, "CSV_ENGINE", engine)
+    cadastral.cria_df_cadastral()
+    return cadastral.pd_df
+
+
+def test_csv_engine():
+    """Test engine selection."""
+    assert csv_engine("auto") == "pyarrow"
+    assert csv_engine("pandas") == "pandas"
+    with pytest.raises(ValueError):
+        csv_engine("polars")
+
+
+def test_paridade_cadastral(cadastral, monkeypatch):
+    """Test pyarrow and pandas engines read the same cadastral DataFrame."""
+    pd_df = le_cadastral(cadastral, "pandas", monkeypatch)
+    pa_df = le_cadastral(cadastral, "pyarrow", monkeypatch)
+    pd.testing.assert_frame_equal(pd_df, pa_df, check_exact=True)
+    assert pa_df["SIT"].dtype == "category"
+    assert pa_df["DT_REG"].dtype == "datetime64[ns]"
+
+
+@pytest.mark.parametrize(
+    "columns, cnpjs",
+    [
+        (None, None),
+        (["CNPJ_FUNDO", "DT_COMPTC", "VL_QUOTA"], None),
+        (["NR_COTST", "CNPJ_FUNDO", "DT_COMPTC"], ["11.000.000/0000-00", "99"]),
+        (None, ["22.000.000/0000-00", "33.000.000/0000-00"]),
+    ],
+)
+def test_paridade_informe(informe_csv_dir, monkeypatch, columns, cnpjs):
+    """Test pyarrow and pandas engines read the same informe DataFrame."""
+    fundosbr.log = Mock()
+    for file_mes in sorted(informe_csv_dir.glob("inf_diario_fi_*.csv")):
+        frames = []
+        for engine in ["pandas", "pyarrow"]:
+            monkeypatch.setattr(fundosbr, "CSV_ENGINE", engine)
+            frames.append(
+                fundosbr.Informe.le_csv_informe(str(file_mes), columns, cnpjs)
+            )
+        pd.testing.assert_frame_equal(*frames, check_exact=True)
+        assert frames[1]["CNPJ_FUNDO"].dtype == "category"
+        assert frames[1].dtypes.to_dict() == frames[0].dtypes.to_dict()
+
+
+@pytest.mark.parametrize("engine", ["pandas", "pyarrow"])
+def test_le_informe_zip(informe_csv_dir, tmp_path, monkeypatch, engine):
+    """Test csv lido direto do zip igual ao csv extraido."""
+    fundosbr.log = Mock()
+    monkeypatch.setattr(fundosbr, "CSV_ENGINE", engine)
+    csv_file = informe_csv_dir / "inf_diario_fi_202003.csv"
+    zip_file = tmp_path / "inf_diario_fi_2020.zip"
+    with zipfile.ZipFile(str(zip_file), "w", zipfile.ZIP_DEFLATED) as arquivo:
+        arquivo.write(str(csv_file), "inf_diario_fi_202003.csv")
+        arquivo.writestr("inf_diario_fi_202004.csv", "outro mes")
+
+    membro = archive_member(str(zip_file), "inf_diario_fi_202003.csv")
+    for columns, cnpjs in [
+        (None, None),
+        (["DT_COMPTC", "CNPJ_FUNDO"], ["22.000.000/0000-00"]),
+    ]:
+        pd.testing.assert_frame_equal(
+            fundosbr.Informe.le_csv_informe(membro, columns, cnpjs),
+            fundosbr.Informe.le_csv_informe(str(csv_file), columns, cnpjs),
+            check_exact=True,
+        )
+
+
+# vim: ts=4
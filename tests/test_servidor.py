@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""Test serve command (Servidor class and http api)."""
+
+import os
+import threading
+from unittest.mock import MagicMock, Mock
+import pytest
+import requests
+from fundosbr import fundosbr
+from conftest import CADASTRAL_ROWS, INFORME_HEADER, INFORME_ROWS
+
+DATAS = ["202002", "202003", "202004"]
+
+
+@pytest.fixture
+def servidor(http_server, tmp_path, monkeypatch):
+    """Servidor com os dados de teste servidos por um http server local."""
+    url, www_dir = http_server
+    (www_dir / "cad_fi.csv").write_text(
+        "\n".join(CADASTRAL_ROWS) + "\n", encoding="ISO-8859-1"
+    )
+    for data, rows in INFORME_ROWS.items():
+        (www_dir / "inf_diario_fi_{}.csv".format(data)).write_text(
+            "\n".join([INFORME_HEADER] + rows) + "\n", encoding="ISO-8859-1"
+        )
+    monkeypatch.setattr(fundosbr, "URL_CADASTRAL_DIARIO", url)
+    monkeypatch.setattr(fundosbr, "URL_INFORME_DIARIO", url)
+    monkeypatch.setattr(fundosbr, "CSV_FILES_DIR", str(tmp_path / "dados"))
+    fundosbr.log = Mock()
+    fundosbr.msg = Mock()
+
+    fundos = fundosbr.Servidor()
+    fundos.datas_memoria = Mock(return_value=DATAS)
+    assert fundos.atualiza()
+
+    servidor = fundosbr.cria_servidor(fundos, port=0)
+    thread = threading.Thread(target=servidor.serve_forever, daemon=True)
+    thread.start()
+    yield "http://127.0.0.1:{}".format(servidor.server_address[1]), fundos, www_dir
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def consulta(url, caminho, **params):
+    """Faz a consulta e retorna (status, json)."""
+    res = requests.get(url + caminho, params=params)
+    return res.status_code, res.json()
+
+
+def test_consultas(servidor):
+    """Test consultas com os dados em memoria."""
+    url, fundos, _ = servidor
+    periodo = {"datainicio": "202002", "datafim": "202004"}
+
+    assert consulta(url, "/status")[1]["meses"] == DATAS
+
+    status, resposta = consulta(url, "/busca", nome="verde")
+    assert status == 200
+    assert [f["CNPJ_FUNDO"] for f in resposta["fundos"]] == ["11.000.000/0000-00"]
+    status, resposta = consulta(url, "/busca", cnpj="22.000.000/0000-00")
+    assert (
+        resposta["fundo"]["DENOM_SOCIAL"] == "AZUL MULTIMERCADO FUNDO DE INVESTIMENTO"
+    )
+
+    status, resposta = consulta(
+        url, "/informe", cnpj="11.000.000/0000-00", mensal="1", **periodo
+    )
+    assert status == 200
+    assert [i["VL_QUOTA"] for i in resposta["informes"]] == [12, 16, 10, 18, 16, 28]
+    assert resposta["saldo"]["Saldo cotista"] == "14"
+    assert len(resposta["mensal"]) == 2
+
+    # Fundo sem informe em 202004: retorna os outros meses
+    status, resposta = consulta(url, "/informe", cnpj="33.000.000/0000-00", **periodo)
+    assert status == 200
+    assert [i["VL_QUOTA"] for i in resposta["informes"]] == [5, 6]
+    status, _ = consulta(url, "/informe", cnpj="44.000.000/0000-00", **periodo)
+    assert status == 404
+
+    status, resposta = consulta(
+        url, "/compara", cnpj="11.000.000/0000-00,22.000.000/0000-00", **periodo
+    )
+    rent = resposta["rentabilidade_periodo"]
+    assert rent["11.000.000/0000-00"]["Rentabilidade"] == pytest.approx(133.333333)
+
+    status, resposta = consulta(url, "/rank", metrica="cotistas", **periodo)
+    assert status == 200
+    assert resposta["ranks"]["acoes"]["cotistas"][0]["cnpj"] == "11.000.000/0000-00"
+    assert list(resposta["ranks"]) == ["acoes", "multimercado"]
+
+
+@pytest.mark.parametrize(
+    "caminho, params, status",
+    [
+        ("/nada", {}, 404),
+        ("/informe", {}, 400),
+        ("/busca", {"cnpj": "99.000.000/0000-00"}, 404),
+        ("/rank", {"tipo": "imobiliario"}, 400),
+        (
+            "/compara",
+            {
+                "cnpj": "11.000.000/0000-00,99.000.000/0000-00",
+                "datainicio": "202002",
+                "datafim": "202004",
+            },
+            404,
+        ),
+        ("/informe", {"cnpj": "11.000.000/0000-00", "datainicio": "2020"}, 400),
+    ],
+)
+def test_consultas_erro(servidor, caminho, params, status):
+    """Test erros das consultas."""
+    url, _, _ = servidor
+    resposta = consulta(url, caminho, **params)
+    assert resposta[0] == status
+    assert "erro" in resposta[1]
+
+
+def test_atualiza(servidor):
+    """Test atualizacao carrega apenas os arquivos novos."""
+    url, fundos, www_dir = servidor
+    memoria = dict(fundos.memoria)
+    assert not fundos.atualiza()
+
+    # Novo mes disponivel no site da CVM
+    (www_dir / "inf_diario_fi_202005.csv").write_text(
+        INFORME_HEADER + "\n44.000.000/0000-00;2020-05-04;1.0;3.00000;1.0;0.00;0.00;9\n"
+    )
+    fundos.datas_memoria.return_value = DATAS[1:] + ["202005"]
+    assert fundos.atualiza()
+
+    meses = {fundosbr.Informe.data_informe(f): f for f in fundos.memoria}
+    assert sorted(meses) == ["202003", "202004", "202005"]
+    assert fundos.memoria[meses["202004"]] is memoria[meses["202004"]]
+    status, resposta = consulta(
+        url,
+        "/informe",
+        cnpj="44.000.000/0000-00",
+        datainicio="202005",
+        datafim="202005",
+    )
+    assert status == 200
+    assert resposta["informes"][0]["NR_COTST"] == 9
+
+    # Mes fora da memoria eh lido das particoes por cnpj
+    status, resposta = consulta(
+        url,
+        "/informe",
+        cnpj="33.000.000/0000-00",
+        datainicio="202002",
+        datafim="202004",
+    )
+    assert status == 200
+    assert [i["VL_QUOTA"] for i in resposta["informes"]] == [5, 6]
+
+    # Janelas moveis recebem apenas o dia novo
+    assert fundos.janelas.linhas == 7
+    status, resposta = consulta(url, "/janelas", cnpj="44.000.000/0000-00")
+    assert status == 200
+    assert resposta["data"].startswith("2020-05-04")
+    assert resposta["janelas"]["44.000.000/0000-00"]["Retorno 21d"] is None
+    assert consulta(url, "/janelas", cnpj="99.000.000/0000-00")[0] == 404
+
+
+def test_consultas_sem_lock_disco(servidor):
+    """Test consultas dos meses em memoria nao usam o lock de escrita em disco."""
+    _, fundos, _ = servidor
+    fundos.lock_disco = MagicMock()
+    fundos.lock_disco.__enter__.side_effect = AssertionError("lock_disco")
+    periodo = {"datainicio": "202002", "datafim": "202004"}
+
+    status, _ = fundos.consulta(
+        "/compara", dict(cnpj="11.000.000/0000-00,22.000.000/0000-00", **periodo)
+    )
+    assert status == 200
+    status, _ = fundos.consulta("/informe", dict(cnpj="11.000.000/0000-00", **periodo))
+    assert status == 200
+    for metrica in ["rentabilidade", "patrimonio", "volatilidade"]:
+        status, resposta = fundos.consulta("/rank", dict(metrica=metrica, **periodo))
+        assert status == 200
+        assert resposta["ranks"]["acoes"][metrica]
+    fundos.lock_disco.__enter__.assert_not_called()
+
+
+# vim: ts=4
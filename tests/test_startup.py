@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""Test startup time (python -X importtime) of the command line."""
+
+import os
+import subprocess
+import sys
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+FUNDOSBR = os.path.join(ROOT_DIR, "fundosbr", "fundosbr.py")
+
+# Modulos importados apenas pelos comandos que os usam
+MODULOS_PESADOS = {"numpy", "pandas", "pyarrow", "requests"}
+
+# Tempo maximo (segundos) do import do fundosbr, ex: FUNDOSBR_TEMPO_IMPORT=0.3.
+# Com pandas e requests importados no inicio, o import levava mais de 0.7s.
+# O tempo depende da maquina, entao a verificacao eh feita apenas se definido
+TEMPO_MAXIMO = os.environ.get("FUNDOSBR_TEMPO_IMPORT")
+
+
+def importtime(*args):
+    """
+    Executa python -X importtime.
+
+    Return: tupla (returncode, {modulo: tempo cumulativo em segundos})
+    """
+    res = subprocess.run(
+        [sys.executable, "-X", "importtime"] + list(args),
+        cwd=ROOT_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    tempos = {}
+    for linha in res.stderr.splitlines():
+        if not linha.startswith("import time:"):
+            continue
+        _, cumulativo, modulo = linha.split("|")
+        if cumulativo.strip().isdigit():
+            tempos[modulo.strip()] = int(cumulativo) / 1e6
+    return res.returncode, tempos
+
+
+@pytest.mark.parametrize(
+    "args, returncode",
+    [
+        (["-c", "from fundosbr import fundosbr"], 0),
+        ([FUNDOSBR, "-h"], 0),
+        ([FUNDOSBR, "rank", "-h"], 0),
+        ([FUNDOSBR, "busca", "-t", "imobiliario"], 2),
+        ([FUNDOSBR, "informe", "11.000.000/0000-00", "-datainicio", "200001"], 1),
+        ([FUNDOSBR, "compara", "11", "-datainicio", "202002", "-datafim", "202001"], 1),
+    ],
+)
+def test_sem_modulos_pesados(args, returncode):
+    """Test ajuda e validacao dos parametros nao importam modulos pesados."""
+    ret, tempos = importtime(*args)
+    assert ret == returncode
+    assert tempos
+    assert not MODULOS_PESADOS & set(tempos)
+
+
+@pytest.mark.skipif(
+    TEMPO_MAXIMO is None, reason="defina FUNDOSBR_TEMPO_IMPORT para medir o tempo"
+)
+def test_tempo_import():
+    """Test tempo de import do fundosbr."""
+    _, tempos = importtime("-c", "from fundosbr import fundosbr")
+    print("Tempo de import do fundosbr: {:.3f}s".format(tempos["fundosbr.fundosbr"]))
+    assert tempos["fundosbr.fundosbr"] < float(TEMPO_MAXIMO)
+
+
+# vim: ts=4